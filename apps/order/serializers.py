@@ -1,28 +1,32 @@
 from rest_framework import serializers
 from apps.order.models import OrderInfo, OrderItem
-from django.conf import settings
+from utils import assets, image_variants
+from utils.serializers import SparseFieldsMixin
+
+class OrderItemSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    product_image_variants = serializers.SerializerMethodField()
 
-class OrderItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = OrderItem
         fields = [
-            'id', 'product_id', 'product_name', 'product_image', 'price', 'quantity', 'total_amount'
+            'id', 'product_id', 'product_name', 'product_image', 'product_image_variants',
+            'price', 'quantity', 'total_amount'
         ]
 
+    def get_product_image_variants(self, obj: OrderItem):
+        return image_variants.variant_urls(obj.product_image)
+
     def _add_prefix(self, path: str | None):
-        if not path:
-            return path
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = getattr(settings, 'IMAGE_URL', '') or ''
-        return base.rstrip('/') + '/' + path.lstrip('/')
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
-        data['product_image'] = self._add_prefix(data.get('product_image'))
+        if 'product_image' in data:
+            data['product_image'] = self._add_prefix(data['product_image'])
         return data
 
-class OrderInfoSerializer(serializers.ModelSerializer):
+class OrderInfoSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = OrderInfo
         fields = "__all__"
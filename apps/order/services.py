@@ -1,16 +1,106 @@
+"""
+订单服务
+
+库存扣减不再 select_for_update 锁商品后逐行 save：
+- 下单前的校验基于普通读取，只为尽早给出友好的错误信息
+- 扣减在事务末尾用一条带条件的 UPDATE 完成（每单一条语句）：
+  UPDATE product SET stock = stock - CASE id ... END WHERE id IN (...) AND stock >= CASE id ... END AND 可售，
+  命中行数少于商品数即有商品库存不足（或刚下架），抛出“库存不足”整单回滚；
+  行锁按主键顺序获取且只持有到提交，不同订单之间不会因加锁顺序相反而死锁
+- 仍遇到死锁 / 锁等待超时时整单重试（DEADLOCK_RETRIES 次）；处于外层事务中时不重试，直接抛出
+- 扣减不经过 save()，提交后手动失效商品详情缓存并广播搜索结果缓存变更
+"""
+import functools
+import logging
+import time
 from collections import defaultdict
-from typing import List
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 from decimal import Decimal
-from django.db import transaction
+from django.db import OperationalError, connection, transaction
+from django.db.models import Case, F, IntegerField, Value, When
 from django.utils import timezone
 
+from apps.product import detail_cache, search_cache
+from apps.shopping_cart import cart_store, versions
 from apps.shopping_cart.models import ShoppingCart
 from apps.order.models import OrderInfo, OrderItem
 from apps.product.models import Product
 
+logger = logging.getLogger(__name__)
+
+OFF_SHELF_STATUSES = ("off_sale", "out_of_stock")
+DEADLOCK_RETRIES = 3
+# MySQL：1213 死锁，1205 锁等待超时
+DEADLOCK_ERRORS = (1213, 1205)
+
 def _gen_order_no() -> str:
     return timezone.now().strftime("%Y%m%d%H%M%S%f")
 
+def _check_line(product: Optional[Product], quantity: int, direct: bool = False) -> Optional[str]:
+    """单行下单校验（下单与预览共用），返回错误信息，通过时返回 None。
+
+    direct=True 为直接购买：与原直购接口一致，先判下架再判库存（已下架且无库存时报“商品已下架”）；
+    购物车下单先判库存。
+    """
+    if not product:
+        return "商品不存在"
+    if quantity <= 0:
+        return "非法数量"
+    off_shelf = product.status in OFF_SHELF_STATUSES
+    if direct and off_shelf:
+        return "商品已下架"
+    if product.stock < quantity:
+        return "库存不足"
+    if off_shelf:
+        return "商品已下架"
+    return None
+
+def _freight(store_id: int, total_amount: Decimal) -> Decimal:
+    # 运费规则预留：目前统一包邮
+    return Decimal("0.00")
+
+def _store_amounts(store_id: int, lines: Iterable[Tuple[int, Product]]) -> Tuple[Decimal, Decimal, Decimal, Decimal]:
+    """单个店铺子订单的 (商品总额, 优惠, 运费, 实付)，lines 为 (数量, 商品)。"""
+    total_amount = sum((Decimal(p.price) * quantity for quantity, p in lines), Decimal("0.00"))
+    discount_amount = Decimal("0.00")
+    freight_amount = _freight(store_id, total_amount)
+    actual_amount = total_amount - discount_amount + freight_amount
+    if actual_amount < 0:
+        actual_amount = Decimal("0.00")
+    return total_amount, discount_amount, freight_amount, actual_amount
+
+def _retry_on_deadlock(func):
+    """死锁 / 锁等待超时时重试整个事务；已在外层事务中时无法单独回滚重试，直接抛出。"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        for attempt in range(DEADLOCK_RETRIES + 1):
+            try:
+                return func(*args, **kwargs)
+            except OperationalError as e:
+                if connection.in_atomic_block or not e.args or e.args[0] not in DEADLOCK_ERRORS or attempt == DEADLOCK_RETRIES:
+                    raise
+                logger.warning('下单遇到死锁，第 %s 次重试: %s', attempt + 1, e)
+                time.sleep(0.05 * (attempt + 1))
+    return wrapper
+
+def _deduct_stock(quantities: Dict[int, int]) -> None:
+    """按 {product_id: 数量} 一条语句条件扣减库存，任一商品不满足即抛出“库存不足”。须在事务内调用。"""
+    product_ids = sorted(quantities)
+    needed = Case(*[When(id=pid, then=Value(quantities[pid])) for pid in product_ids], output_field=IntegerField())
+    updated = (Product.objects
+               .filter(id__in=product_ids, stock__gte=needed)
+               .exclude(status__in=OFF_SHELF_STATUSES)
+               .update(stock=F("stock") - needed, update_time=timezone.now()))
+    if updated != len(product_ids):
+        raise ValueError("库存不足")
+
+    def after_commit():
+        detail_cache.invalidate_many(product_ids)
+        search_cache.publish(product_ids)
+
+    transaction.on_commit(after_commit)
+
+@_retry_on_deadlock
 @transaction.atomic
 def create_orders_from_cart(*, user_id: int, recipient: dict, remark: str = "") -> List[OrderInfo]:
     cart_qs = ShoppingCart.objects.select_related("product", "product__store").filter(user_id=user_id, selected=True)
@@ -18,35 +108,26 @@ def create_orders_from_cart(*, user_id: int, recipient: dict, remark: str = "")
     if not cart_items:
         raise ValueError("购物车为空")
 
-    product_ids = [ci.product_id for ci in cart_items]
-    products = {p.id: p for p in Product.objects.select_for_update().filter(id__in=product_ids)}
+    products = {ci.product_id: ci.product for ci in cart_items}
 
     store_groups = defaultdict(list)
     for ci in cart_items:
         p = products.get(ci.product_id)
-        if not p:
-            raise ValueError("商品不存在")
-        if ci.quantity <= 0:
-            raise ValueError("非法数量")
-        if p.stock < ci.quantity:
-            raise ValueError("库存不足")
-        if p.status in ("off_sale", "out_of_stock"):
-            raise ValueError("商品已下架")
+        error = _check_line(p, ci.quantity)
+        if error:
+            raise ValueError(error)
         store_groups[p.store_id].append((ci, p))
 
     orders = []
     now = timezone.now()
 
     for store_id, items in store_groups.items():
-        total_amount = Decimal("0.00")
-        discount_amount = Decimal("0.00")
-        freight_amount = Decimal("0.00")
+        total_amount, discount_amount, freight_amount, actual_amount = _store_amounts(store_id, [(ci.quantity, p) for ci, p in items])
         order_items = []
 
         for ci, p in items:
             price = Decimal(p.price)
             line_total = price * ci.quantity
-            total_amount += line_total
 
             order_items.append(OrderItem(
                 product_id=p.id,
@@ -58,14 +139,6 @@ def create_orders_from_cart(*, user_id: int, recipient: dict, remark: str = "")
                 create_time=now,
             ))
 
-            # 扣减库存
-            p.stock -= ci.quantity
-            p.save(update_fields=["stock"])
-
-        actual_amount = total_amount - discount_amount + freight_amount
-        if actual_amount < 0:
-            actual_amount = Decimal("0.00")
-
         order = OrderInfo.objects.create(
             order_no=_gen_order_no(),
             total_amount=total_amount,
@@ -93,33 +166,34 @@ def create_orders_from_cart(*, user_id: int, recipient: dict, remark: str = "")
 
         orders.append(order)
 
-    cart_qs.delete()
+    removed_ids = [ci.id for ci in cart_items]
+    ShoppingCart.objects.filter(id__in=removed_ids).delete()
+    # 扣减放在事务末尾，商品行锁只持有到提交
+    _deduct_stock({ci.product_id: ci.quantity for ci in cart_items})
+
+    def after_commit():
+        # 缓存存储下丢弃该用户的购物车缓存（调用方在 write_through 内下单，持有用户锁），并以新版本记入删除日志
+        cart_store.invalidate(user_id)
+        with versions.change(user_id) as version:
+            versions.record_removed(user_id, removed_ids, version)
+
+    transaction.on_commit(after_commit)
     return orders
 
+@_retry_on_deadlock
 @transaction.atomic
 def create_order_direct(user_id: int, product_id: int, quantity: int, recipient: dict, remark: str = "") -> OrderInfo:
     if quantity <= 0:
         raise ValueError("非法数量")
 
-    try:
-        product = Product.objects.select_for_update().get(id=product_id)
-    except Product.DoesNotExist:
-        raise ValueError("商品不存在")
-
-    if product.status in ("off_sale", "out_of_stock"):
-        raise ValueError("商品已下架")
-
-    if product.stock < quantity:
-        raise ValueError("库存不足")
+    product = Product.objects.filter(id=product_id).first()
+    error = _check_line(product, quantity, direct=True)
+    if error:
+        raise ValueError(error)
 
     now = timezone.now()
     price = Decimal(product.price)
-    total_amount = price * quantity
-    discount_amount = Decimal("0.00")
-    freight_amount = Decimal("0.00")
-    actual_amount = total_amount - discount_amount + freight_amount
-    if actual_amount < 0:
-        actual_amount = Decimal("0.00")
+    total_amount, discount_amount, freight_amount, actual_amount = _store_amounts(product.store_id, [(quantity, product)])
 
     order = OrderInfo.objects.create(
         order_no=_gen_order_no(),
@@ -153,7 +227,81 @@ def create_order_direct(user_id: int, product_id: int, quantity: int, recipient:
         create_time=now,
     )
 
-    product.stock -= quantity
-    product.save(update_fields=["stock"])
+    _deduct_stock({product.id: quantity})
+
+    return order
+
+def preview_order(*, user_id: int, cart_ids: Optional[List[int]] = None, items: Optional[List[Tuple[int, int]]] = None) -> Dict[str, Any]:
+    """下单预览：与下单相同的校验、按店铺拆单与金额计算，只做普通读取，不加锁、不写库。
+
+    items=[(product_id, quantity), ...] 时按直接购买预览；否则预览购物车中 cart_ids 指定（缺省为已选中）的条目，
+    缓存存储下直接读缓存中的条目（含尚未写回的修改），不触发写回。
+    库存是读取时刻的快照，提交时仍以下单事务内的校验为准。未通过校验的行放入 problems，不计入金额；
+    cart_ids 中不存在或不属于该用户的条目以 not_found 列入 problems。
+    """
+    products = None
+    if items is not None:
+        lines = [(None, product_id, quantity) for product_id, quantity in items]
+    elif cart_store.enabled():
+        wanted = set(cart_ids) if cart_ids is not None else None
+        cart_items = [i for i in cart_store.get_items(user_id) if (i.id in wanted if wanted is not None else i.selected)]
+        lines = [(i.id, i.product_id, i.quantity) for i in cart_items]
+        products = {i.product_id: i.product for i in cart_items}
+    else:
+        cart_qs = ShoppingCart.objects.filter(user_id=user_id)
+        cart_qs = cart_qs.filter(id__in=cart_ids) if cart_ids is not None else cart_qs.filter(selected=True)
+        lines = list(cart_qs.values_list("id", "product_id", "quantity"))
+    problems = []
+    if cart_ids is not None:
+        found = {cart_id for cart_id, _, _ in lines}
+        problems = [
+            {"cart_id": cart_id, "product_id": None, "quantity": None, "stock": None, "reason": "not_found"}
+            for cart_id in dict.fromkeys(cart_ids) if cart_id not in found
+        ]
+    if not lines and not problems:
+        raise ValueError("购物车为空")
+    if products is None:
+        products = Product.objects.select_related("store").in_bulk({product_id for _, product_id, _ in lines})
+
+    store_groups = defaultdict(list)
+    for cart_id, product_id, quantity in lines:
+        p = products.get(product_id)
+        error = _check_line(p, quantity, direct=items is not None)
+        if error:
+            problems.append({"cart_id": cart_id, "product_id": product_id, "quantity": quantity, "stock": p.stock if p else None, "reason": error})
+        else:
+            store_groups[p.store_id].append((cart_id, quantity, p))
 
-    return order
\ No newline at end of file
+    stores = []
+    grand = [Decimal("0.00")] * 4
+    for store_id, group in sorted(store_groups.items()):
+        amounts = _store_amounts(store_id, [(quantity, p) for _, quantity, p in group])
+        grand = [a + b for a, b in zip(grand, amounts)]
+        total_amount, discount_amount, freight_amount, actual_amount = amounts
+        stores.append({
+            "store_id": store_id,
+            "store_name": getattr(group[0][2].store, "store_name", None),
+            "items": [{
+                "cart_id": cart_id,
+                "product_id": p.id,
+                "product_name": p.name,
+                "product_image": p.thumbnail or "",
+                "price": str(p.price),
+                "quantity": quantity,
+                "total_amount": str(Decimal(p.price) * quantity),
+            } for cart_id, quantity, p in group],
+            "total_amount": str(total_amount),
+            "discount_amount": str(discount_amount),
+            "freight_amount": str(freight_amount),
+            "actual_amount": str(actual_amount),
+        })
+    total_amount, discount_amount, freight_amount, actual_amount = grand
+    return {
+        "stores": stores,
+        "problems": problems,
+        "total_amount": str(total_amount),
+        "discount_amount": str(discount_amount),
+        "freight_amount": str(freight_amount),
+        "actual_amount": str(actual_amount),
+        "can_submit": bool(stores) and not problems,
+    }
@@ -1,3 +1,154 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TransactionTestCase, override_settings
+from rest_framework.test import APIClient
+
+from apps.order import services
+from apps.order.models import OrderInfo, OrderItem
+from apps.order.services import create_order_direct
+from apps.product.models import Category, Product
+from apps.shopping_cart import cart_store
+from apps.shopping_cart.models import ShoppingCart
+from apps.store.models import Store
+from apps.user.models import User
+from utils.error_codes import Codes
+from utils.jwt_auth import generate_token
+
+RECIPIENT = {'name': '张三', 'phone': '13800000000', 'address': '北京市'}
+
+
+class OrderTestMixin:
+    """建用户、店铺与两件商品（库存 10），self.client 带登录令牌。"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='u1', phone='13800000000', password='x')
+        store = Store.objects.create(store_name='s1', owner=self.user, status='active')
+        category = Category.objects.create(name='手机', parent_id=0)
+        self.products = [
+            Product.objects.create(name=f'商品{i}', price='10.00', category=category, store=store, stock=10, status='on_sale')
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.credentials(HTTP_TOKEN=generate_token(self.user.id, self.user.username))
+
+
+class OrderListPaginationTests(OrderTestMixin, TransactionTestCase):
+    """订单列表：默认不分页，?page_size= 页码分页，?cursor= 游标分页。"""
+
+    def setUp(self):
+        super().setUp()
+        self.order_ids = [create_order_direct(self.user.id, self.products[0].id, 1, RECIPIENT).id for _ in range(5)]
+
+    def list(self, **params):
+        return self.client.get('/order/list/', params).json()['data']
+
+    def test_default_returns_all_orders(self):
+        data = self.list()
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(data['results']), 5)
+
+    def test_page_number(self):
+        data = self.list(page_size=2, page=3)
+        self.assertEqual(data['count'], 5)
+        self.assertEqual(len(data['results']), 1)
+
+    def test_cursor_walks_every_order_once(self):
+        seen, cursor = [], ''
+        while True:
+            data = self.list(cursor=cursor, page_size=2)
+            seen += [o['id'] for o in data['results']]
+            self.assertIsNone(data['count'])
+            if not data['has_next']:
+                break
+            cursor = data['next_cursor']
+        self.assertEqual(seen, sorted(self.order_ids, reverse=True))
+
+    def test_cursor_default_page_size_and_total(self):
+        data = self.list(cursor='', with_total=1)
+        self.assertEqual(data['page_size'], 20)
+        self.assertEqual((data['count'], len(data['results']), data['has_next']), (5, 5, False))
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/order/list/', {'cursor': 'bad'})
+        self.assertEqual(response.status_code, 400)
+
+
+class CreateOrderStockTests(OrderTestMixin, TransactionTestCase):
+    """下单扣减库存：校验之后库存被并发耗尽时整单回滚。"""
+
+    def setUp(self):
+        super().setUp()
+        for product in self.products:
+            ShoppingCart.objects.create(user=self.user, product=product, quantity=2, version=1)
+
+    def create(self):
+        return self.client.post('/order/create/', {'recipient': RECIPIENT}, format='json')
+
+    def test_stock_drained_after_validation_rolls_back(self):
+        real = services._check_line
+        drained = self.products[1]
+
+        def check_line(product, quantity, direct=False):
+            error = real(product, quantity, direct)
+            # 校验通过后库存被其它订单扣减到不足
+            Product.objects.filter(id=drained.id).update(stock=1)
+            return error
+
+        with mock.patch.object(services, '_check_line', side_effect=check_line):
+            response = self.create()
+        self.assertEqual(response.json()['code'], Codes.ORDER_STOCK_NOT_ENOUGH)
+        self.assertFalse(OrderInfo.objects.exists())
+        self.assertFalse(OrderItem.objects.exists())
+        self.assertEqual(ShoppingCart.objects.filter(user=self.user).count(), 2)
+        # 同一条扣减语句中另一件商品的扣减随事务回滚
+        self.assertEqual(Product.objects.get(id=self.products[0].id).stock, 10)
+
+    def test_create_deducts_stock(self):
+        response = self.create()
+        self.assertEqual(response.json()['code'], Codes.ORDER_CREATE_OK_ALIAS)
+        self.assertEqual([p.stock for p in Product.objects.order_by('id')], [8, 8])
+        self.assertFalse(ShoppingCart.objects.filter(user=self.user).exists())
+
+
+class OrderPreviewTests(OrderTestMixin, TransactionTestCase):
+    """下单预览：只读，不写回缓存存储；cart_ids 中缺失的条目列入 problems。"""
+
+    def setUp(self):
+        super().setUp()
+        other = User.objects.create(username='u2', phone='13900000000', password='x')
+        self.items = [ShoppingCart.objects.create(user=self.user, product=p, quantity=2) for p in self.products]
+        self.foreign = ShoppingCart.objects.create(user=other, product=self.products[0], quantity=1)
+
+    def preview(self, **body):
+        return self.client.post('/order/preview/', body, format='json').json()
+
+    def test_selected_items(self):
+        data = self.preview()['data']
+        self.assertEqual((data['total_amount'], data['problems'], data['can_submit']), ('40.00', [], True))
+
+    def test_missing_and_foreign_cart_ids(self):
+        response = self.preview(cart_ids=[self.items[0].id, self.foreign.id, 999999])
+        data = response['data']
+        self.assertEqual(data['total_amount'], '20.00')
+        self.assertEqual([(p['cart_id'], p['reason'], p['code']) for p in data['problems']], [
+            (self.foreign.id, 'not_found', Codes.CART_OR_ORDER_PARAM_ERROR),
+            (999999, 'not_found', Codes.CART_OR_ORDER_PARAM_ERROR),
+        ])
+        self.assertFalse(data['can_submit'])
+
+    def test_only_missing_cart_ids(self):
+        data = self.preview(cart_ids=[self.foreign.id])['data']
+        self.assertEqual(data['stores'], [])
+        self.assertEqual(len(data['problems']), 1)
+
+    @override_settings(SHOPPING_CART_STORE='cache', SHOPPING_CART_FLUSH_INTERVAL=3600)
+    def test_cache_store_reads_unflushed_changes_without_flushing(self):
+        response = self.client.patch(f'/shopping_cart/item/{self.items[0].id}/', {'quantity': 5}, format='json')
+        self.assertEqual(response.status_code, 200)
+        with mock.patch.object(cart_store, 'flush_user') as flush_user:
+            data = self.preview(cart_ids=[self.items[0].id])['data']
+        flush_user.assert_not_called()
+        self.assertEqual(data['stores'][0]['items'][0]['quantity'], 5)
+        self.assertEqual(ShoppingCart.objects.get(id=self.items[0].id).quantity, 2)
@@ -2,6 +2,7 @@ from django.urls import path
 from apps.order.views import (
     OrderCreateAPIView,
     DirectOrderCreateAPIView,
+    OrderPreviewAPIView,
     OrderListAPIView,
     OrderDetailAPIView,
 )
@@ -9,6 +10,7 @@ from apps.order.views import (
 urlpatterns = [
     path("create/", OrderCreateAPIView.as_view(), name="order-create"),
     path("direct/", DirectOrderCreateAPIView.as_view(), name="order-direct-create"),
+    path("preview/", OrderPreviewAPIView.as_view(), name="order-preview"),
     path("list/", OrderListAPIView.as_view(), name="order-list"),
     path("<int:pk>/", OrderDetailAPIView.as_view(), name="order-detail"),
 ]
\ No newline at end of file
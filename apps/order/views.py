@@ -2,6 +2,7 @@
 Order 模块视图
 
 - 创建订单（购物车 / 直接购买）
+- 下单预览：与下单相同的校验与按店铺拆单，不加锁、不写库
 - 新增：订单列表 & 订单详情
 - 使用 JWT 载荷中的 user_id（不再写死）
 - 统一错误码映射
@@ -20,8 +21,11 @@ from apps.order.serializers import (
     OrderItemSerializer,
 )
 from apps.order.models import OrderInfo, OrderItem
+from utils.pagination import CursorError, is_cursor_request, paginate_by_cursor, wants_total
 from utils.renderer import CustomResponse
-from .services import create_orders_from_cart, create_order_direct
+from utils.serializers import requested_fields, sparse_queryset
+from .services import create_orders_from_cart, create_order_direct, preview_order
+from apps.shopping_cart import cart_store
 from utils.error_codes import Codes
 
 # ================= 工具函数 =================
@@ -41,6 +45,8 @@ _ERROR_MAP = {
     '商品不存在': Codes.ORDER_PRODUCT_NOT_FOUND,
     '非法数量': Codes.CART_OR_ORDER_PARAM_ERROR,
     '商品已下架': Codes.PRODUCT_OFF_SHELF,
+    # 预览：cart_ids 中不存在或不属于当前用户的条目
+    'not_found': Codes.CART_OR_ORDER_PARAM_ERROR,
 }
 
 def _map_error(e: ValueError):
@@ -67,8 +73,11 @@ class OrderCreateAPIView(APIView):
             if not recipient.get(field):
                 return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg=f'收件人信息缺失: {field}', errors={field: 'required'}, status=HTTP_400_BAD_REQUEST)
         remark = data.get('remark', '')
+        # 持有用户购物车锁下单：缓存存储下先把尚未写回的数量/选中修改落库（订单服务只读数据库），
+        # 下单期间的购物车修改等待锁，结束后丢弃缓存
         try:
-            orders = create_orders_from_cart(user_id=user_id, recipient=recipient, remark=remark)
+            with cart_store.write_through(user_id):
+                orders = create_orders_from_cart(user_id=user_id, recipient=recipient, remark=remark)
         except ValueError as e:
             code, msg = _map_error(e)
             return CustomResponse(code=code, msg=msg, errors={'detail': msg}, status=HTTP_400_BAD_REQUEST)
@@ -112,6 +121,52 @@ class DirectOrderCreateAPIView(APIView):
         serialized = OrderInfoWithItemsSerializer(order).data
         return CustomResponse(code=Codes.ORDER_CREATE_OK_ALIAS, msg='订单创建成功', data=serialized, status=HTTP_201_CREATED)
 
+
+class OrderPreviewAPIView(APIView):
+    """下单预览（只读）：按店铺拆单并给出各店铺金额、运费与不可下单的行，不加行锁。
+
+    请求体三选一：
+    - {}                                        预览购物车中已选中的条目
+    - {"cart_ids": [1, 2]}                      预览指定的购物车条目
+    - {"items": [{"product_id": 1, "quantity": 2}]}  预览直接购买
+    库存为读取时刻的快照，真正提交时仍以下单接口的校验为准；缓存存储下读取缓存中的条目，不触发写回。
+    cart_ids 中不存在或不属于当前用户的条目以 reason=not_found 列入 problems。
+    """
+    permission_classes: List = []
+    MAX_LINES = 200
+
+    def post(self, request: Request):
+        user_id = _get_user_id(request)
+        if not user_id:
+            return _unauthorized()
+        data: Dict[str, Any] = request.data or {}
+        cart_ids = data.get('cart_ids')
+        entries = data.get('items')
+        if cart_ids is not None and entries is not None:
+            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='cart_ids 与 items 只能传一个', errors={'items': 'conflict'}, status=HTTP_400_BAD_REQUEST)
+        items = None
+        if entries is not None:
+            if not isinstance(entries, list) or not entries or len(entries) > self.MAX_LINES:
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg=f'items 应为 1~{self.MAX_LINES} 条的数组', errors={'items': 'invalid'}, status=HTTP_400_BAD_REQUEST)
+            try:
+                items = [(int(e['product_id']), int(e['quantity'])) for e in entries]
+            except (TypeError, ValueError, KeyError):
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='items 每项须包含整数 product_id 与 quantity', errors={'items': 'invalid'}, status=HTTP_400_BAD_REQUEST)
+            if len({product_id for product_id, _ in items}) != len(items):
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='items 中商品重复', errors={'items': 'duplicate'}, status=HTTP_400_BAD_REQUEST)
+        elif cart_ids is not None:
+            if (not isinstance(cart_ids, list) or not cart_ids or len(cart_ids) > self.MAX_LINES
+                    or any(isinstance(i, bool) or not isinstance(i, int) for i in cart_ids)):
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg=f'cart_ids 应为 1~{self.MAX_LINES} 个整数', errors={'cart_ids': 'invalid'}, status=HTTP_400_BAD_REQUEST)
+        try:
+            preview = preview_order(user_id=user_id, cart_ids=cart_ids, items=items)
+        except ValueError as e:
+            code, msg = _map_error(e)
+            return CustomResponse(code=code, msg=msg, errors={'detail': msg}, status=HTTP_400_BAD_REQUEST)
+        for problem in preview['problems']:
+            problem['code'] = _map_error(ValueError(problem['reason']))[0]
+        return CustomResponse(code=Codes.SUCCESS, msg='获取下单预览成功', data=preview, status=200)
+
 # ================= 查询相关 =================
 
 class OrderPagination(PageNumberPagination):
@@ -119,33 +174,70 @@ class OrderPagination(PageNumberPagination):
     max_page_size = 100
 
 class OrderListAPIView(APIView):
-    """订单列表（可按状态过滤）。"""
+    """订单列表（可按状态过滤）。
+
+    默认不分页、返回全部订单，传 ?page_size= 时页码分页；
+    传 ?cursor=（首页为空）启用游标分页，按 (create_time, id) 倒序翻页（每页默认 CURSOR_PAGE_SIZE 条），
+    返回 next_cursor，count 仅在 with_total=1 时统计。
+    支持 ?fields= 裁剪订单字段（不含 items 时不再预取明细）。
+    """
+    CURSOR_PAGE_SIZE = 20
+
     def get(self, request: Request):
         user_id = _get_user_id(request)
         if not user_id:
             return _unauthorized()
         status_filter = request.query_params.get('status')
+        fields = requested_fields(request)
         qs = OrderInfo.objects.filter(user_id=user_id).order_by('-create_time')
         if status_filter:
             qs = qs.filter(status=status_filter)
-        qs = qs.prefetch_related('orderitem_set')
+        # 游标排序依赖 create_time，始终保留该列
+        qs = sparse_queryset(qs, OrderInfoWithItemsSerializer, fields and [*fields, 'create_time'])
+        if not fields or 'items' in fields:
+            qs = qs.prefetch_related('orderitem_set')
         paginator = OrderPagination()
+        if is_cursor_request(request):
+            page_size = paginator.get_page_size(request) or self.CURSOR_PAGE_SIZE
+            try:
+                cursor_page = paginate_by_cursor(qs, ['-create_time', '-id'], request.query_params.get('cursor'), page_size)
+            except CursorError as e:
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg=str(e), errors={'cursor': 'invalid'}, status=HTTP_400_BAD_REQUEST)
+            data = {
+                'results': OrderInfoWithItemsSerializer(cursor_page.items, many=True, fields=fields).data,
+                'count': qs.count() if wants_total(request) else None,
+                'next_cursor': cursor_page.next_cursor,
+                'has_next': cursor_page.has_next,
+                'page_size': page_size,
+            }
+            return CustomResponse(code=Codes.SUCCESS, msg='获取订单列表成功', data=data, status=200)
         page = paginator.paginate_queryset(qs, request)
-        serializer = OrderInfoWithItemsSerializer(page, many=True)
+        if page is None:
+            # 未传 page_size：不分页
+            page = list(qs)
+            count = len(page)
+        else:
+            # 复用分页器已执行的 COUNT，避免重复统计
+            count = paginator.page.paginator.count
+        serializer = OrderInfoWithItemsSerializer(page, many=True, fields=fields)
         data = {
             'results': serializer.data,
-            'count': qs.count(),
+            'count': count,
             'page': paginator.page.number if hasattr(paginator, 'page') else 1,
             'page_size': paginator.get_page_size(request),
         }
         return CustomResponse(code=Codes.SUCCESS, msg='获取订单列表成功', data=data, status=200)
 
 class OrderDetailAPIView(APIView):
-    """订单详情（含明细）。"""
+    """订单详情（含明细），支持 ?fields= 裁剪字段。"""
     def get(self, request: Request, pk: int):
         user_id = _get_user_id(request)
         if not user_id:
             return _unauthorized()
-        order = get_object_or_404(OrderInfo.objects.prefetch_related('orderitem_set'), pk=pk, user_id=user_id)
-        serializer = OrderInfoWithItemsSerializer(order)
+        fields = requested_fields(request)
+        qs = sparse_queryset(OrderInfo.objects.all(), OrderInfoWithItemsSerializer, fields)
+        if not fields or 'items' in fields:
+            qs = qs.prefetch_related('orderitem_set')
+        order = get_object_or_404(qs, pk=pk, user_id=user_id)
+        serializer = OrderInfoWithItemsSerializer(order, fields=fields)
         return CustomResponse(code=Codes.SUCCESS, msg='获取订单详情成功', data=serializer.data, status=200)
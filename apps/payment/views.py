@@ -5,7 +5,8 @@ from django.db import transaction
 from django.utils import timezone
 from django.http import HttpResponse
 from apps.payment.alipay import Alpay
-from apps.order.models import OrderInfo
+from apps.order.models import OrderInfo, OrderItem
+from apps.product import counters
 from apps.payment.models import Payment
 from utils.renderer import CustomResponse
 from utils.error_codes import Codes
@@ -115,6 +116,9 @@ class AlipayNotifyAPIView(APIView):
                     order.payment_method = 'alipay'
                     order.payment_time = now
                     order.save(update_fields=['status', 'payment_method', 'payment_time'])
+                    # 销量计入缓冲，事务提交后生效
+                    sold = list(OrderItem.objects.filter(order_id=order.id).values_list('product_id', 'quantity'))
+                    transaction.on_commit(lambda: counters.incr_many('sales_count', sold))
         else:
             # 其它状态可按需扩展 failed 等
             pass
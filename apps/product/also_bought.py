@@ -0,0 +1,186 @@
+"""
+“买了还买”共购推荐（离线预计算）
+
+- build()：按 order_id 顺序流式读取有效订单（COUNTED_STATUSES）的 (order_id, product_id)，
+  每个订单去重后视为一个购物篮；商品数超过 max_basket 的订单（批发、团购）不参与计数，
+  避免一单拉高大量无关商品对
+- 计数：安装 NumPy/SciPy 时构造 订单×商品 的 0/1 稀疏矩阵 B，共现矩阵 C = BᵀB，
+  逐行以 partition 截取前 K；未安装时退化为纯 Python 逐篮计数，结果一致
+- 排序：共同购买订单数降序，并列按邻居 id 升序；低于 min_count 的邻居不收录
+- 结果整表替换写入 product_copurchase（见 ProductCoPurchase），随后递增缓存版本，
+  接口 /product/<id>/also_bought/ 只读预计算结果
+- 定时执行：python manage.py build_also_bought
+"""
+import heapq
+import time
+from array import array
+from collections import Counter, defaultdict
+from itertools import permutations
+from typing import Dict, Iterator, List, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from apps.order.models import OrderItem
+from apps.product.models import ProductCoPurchase
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # pragma: no cover - 可选依赖
+    np = sparse = None
+
+KEY_PREFIX = 'product:also_bought:'
+VERSION_KEY = f'{KEY_PREFIX}version'
+# 计入共购的订单状态：已支付及之后，不含取消/退款/待支付
+COUNTED_STATUSES = ('paid', 'shipped', 'delivered', 'completed')
+DEFAULT_TOP_K = 20
+DEFAULT_MIN_COUNT = 2
+DEFAULT_MAX_BASKET = 50
+
+Neighbors = Dict[int, List[Tuple[int, int]]]
+
+
+def vectorized() -> bool:
+    return sparse is not None
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PRODUCT_ALSO_BOUGHT_CACHE_TIMEOUT', 3600)
+
+
+# ---------------------------------------------------------------- 计算
+
+def iter_baskets(max_basket: int = DEFAULT_MAX_BASKET, chunk_size: int = 5000) -> Iterator[Tuple[int, ...]]:
+    """按订单流式产出去重、升序的商品 id 元组；单商品订单与超大订单跳过。"""
+    rows = (OrderItem.objects
+            .filter(order__status__in=COUNTED_STATUSES)
+            .order_by('order_id')
+            .values_list('order_id', 'product_id'))
+    current, basket = None, set()
+    for order_id, product_id in rows.iterator(chunk_size=chunk_size):
+        if order_id != current:
+            if 1 < len(basket) <= max_basket:
+                yield tuple(sorted(basket))
+            current, basket = order_id, set()
+        basket.add(product_id)
+    if 1 < len(basket) <= max_basket:
+        yield tuple(sorted(basket))
+
+
+def _top_k(counts: Counter, top_k: int, min_count: int) -> List[Tuple[int, int]]:
+    items = [(pid, n) for pid, n in counts.items() if n >= min_count]
+    return heapq.nsmallest(top_k, items, key=lambda item: (-item[1], item[0]))
+
+
+def count_python(baskets: Iterator[Tuple[int, ...]], top_k: int, min_count: int) -> Neighbors:
+    pairs: Dict[int, Counter] = defaultdict(Counter)
+    for basket in baskets:
+        for a, b in permutations(basket, 2):
+            pairs[a][b] += 1
+    result = {}
+    for pid, counts in pairs.items():
+        top = _top_k(counts, top_k, min_count)
+        if top:
+            result[pid] = top
+    return result
+
+
+def count_sparse(baskets: Iterator[Tuple[int, ...]], top_k: int, min_count: int) -> Neighbors:
+    # 直接以 CSR 三元组累积购物篮：indptr 为各篮起点，indices 为商品 id（稍后映射为列号）
+    indptr = array('q', [0])
+    product_ids = array('q')
+    for basket in baskets:
+        product_ids.extend(basket)
+        indptr.append(len(product_ids))
+    if not product_ids:
+        return {}
+    columns, inverse = np.unique(np.frombuffer(product_ids, dtype=np.int64), return_inverse=True)
+    basket_matrix = sparse.csr_matrix(
+        (np.ones(len(product_ids), dtype=np.int32), inverse, np.frombuffer(indptr, dtype=np.int64)),
+        shape=(len(indptr) - 1, len(columns)),
+    )
+    co = (basket_matrix.T.tocsr() @ basket_matrix).tocsr()
+    co.setdiag(0)
+    co.data[co.data < min_count] = 0
+    co.eliminate_zeros()
+
+    result = {}
+    for row in np.flatnonzero(np.diff(co.indptr)):
+        start, end = co.indptr[row], co.indptr[row + 1]
+        counts, neighbors = co.data[start:end], co.indices[start:end]
+        if len(counts) > top_k:
+            # 先取出第 K 大计数，保留 >= 它的全部邻居，再精确排序，保证并列时按 id 取舍
+            kth = np.partition(counts, len(counts) - top_k)[len(counts) - top_k]
+            keep = counts >= kth
+            counts, neighbors = counts[keep], neighbors[keep]
+        neighbor_ids = columns[neighbors]
+        order = np.lexsort((neighbor_ids, -counts))[:top_k]
+        result[int(columns[row])] = [(int(neighbor_ids[i]), int(counts[i])) for i in order]
+    return result
+
+
+def compute(top_k: int = DEFAULT_TOP_K, min_count: int = DEFAULT_MIN_COUNT,
+            max_basket: int = DEFAULT_MAX_BASKET) -> Neighbors:
+    """返回 {商品 id: [(邻居 id, 共同购买订单数), ...]}，每个商品至多 top_k 个邻居。"""
+    baskets = iter_baskets(max_basket)
+    if vectorized():
+        return count_sparse(baskets, top_k, min_count)
+    return count_python(baskets, top_k, min_count)
+
+
+def store(neighbors: Neighbors, batch_size: int = 5000) -> int:
+    """整表替换预计算结果并使接口缓存失效，返回写入行数。"""
+    rows = [
+        ProductCoPurchase(product_id=pid, neighbor_id=neighbor_id, co_count=n, rank=rank)
+        for pid, items in neighbors.items()
+        for rank, (neighbor_id, n) in enumerate(items, start=1)
+    ]
+    with transaction.atomic():
+        ProductCoPurchase.objects.all().delete()
+        ProductCoPurchase.objects.bulk_create(rows, batch_size=batch_size)
+        transaction.on_commit(_bump_version)
+    return len(rows)
+
+
+def build(top_k: int = DEFAULT_TOP_K, min_count: int = DEFAULT_MIN_COUNT,
+          max_basket: int = DEFAULT_MAX_BASKET) -> Tuple[int, int]:
+    """重新计算并写入，返回 (有推荐的商品数, 写入行数)。"""
+    neighbors = compute(top_k, min_count, max_basket)
+    return len(neighbors), store(neighbors)
+
+
+# ---------------------------------------------------------------- 读取
+
+def _fresh_version() -> int:
+    # 版本号被淘汰后以时间戳重新起算，避免命中旧版本遗留的缓存
+    return int(time.time() * 1000)
+
+
+def _version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _fresh_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def _bump_version() -> None:
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+
+
+def get_neighbor_ids(product_id: int) -> List[int]:
+    """按排名返回预计算的邻居 id（读缓存，未命中时查 product_copurchase 一次）。"""
+    key = f'{KEY_PREFIX}{_version()}:{product_id}'
+    ids = cache.get(key)
+    if ids is None:
+        ids = list(ProductCoPurchase.objects
+                   .filter(product_id=product_id)
+                   .order_by('rank')
+                   .values_list('neighbor_id', flat=True))
+        cache.set(key, ids, _timeout())
+    return ids
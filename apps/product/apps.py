@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ProductConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "apps.product"
+
+    def ready(self):
+        # 注册缓存失效等信号处理
+        from apps.product import signals  # noqa: F401
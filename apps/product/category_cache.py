@@ -0,0 +1,84 @@
+"""
+分类树进程内缓存
+
+- 首次访问时从 Category 一次性构建完整的三级分类树，之后直接读内存
+- 版本号存放在共享缓存（django cache）中；Category 保存/删除时递增版本号，
+  各进程读取时比对版本号，不一致则重建，保证多进程部署下同样能及时失效
+- 一级/二级/三级菜单接口与 /product/menu_tree/ 共用同一份数据
+"""
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from django.core.cache import cache
+
+from apps.product.models import Category
+
+VERSION_KEY = 'product:category_tree:version'
+MAX_DEPTH = 3
+
+_lock = threading.Lock()
+# (版本号, parent_id -> 子分类菜单项列表, 完整三级树)
+_snapshot: Tuple[int | None, Dict[int, List[dict]], List[dict]] = (None, {}, [])
+
+
+def _fresh_version() -> int:
+    # 共享缓存被清空后以时间戳重新起算，避免与各进程持有的旧版本号撞车
+    return int(time.time() * 1000)
+
+
+def current_version() -> int:
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, _fresh_version(), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def invalidate() -> None:
+    """分类变更后调用：递增共享版本号，所有进程下次读取时重建。"""
+    global _snapshot
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, _fresh_version(), timeout=None)
+    _snapshot = (None, {}, [])
+
+
+def _build(version: int) -> Tuple[int, Dict[int, List[dict]], List[dict]]:
+    children: Dict[int, List[dict]] = {}
+    for c in Category.objects.only('id', 'parent_id', 'name').order_by('id'):
+        children.setdefault(c.parent_id, []).append(c.to_menu_item())
+
+    def subtree(parent_id: int, depth: int) -> List[dict]:
+        nodes = []
+        for item in children.get(parent_id, []):
+            node = dict(item)
+            if depth < MAX_DEPTH:
+                node['children'] = subtree(item['id'], depth + 1)
+            nodes.append(node)
+        return nodes
+
+    return version, children, subtree(0, 1)
+
+
+def _get_snapshot() -> Tuple[int, Dict[int, List[dict]], List[dict]]:
+    global _snapshot
+    version = current_version()
+    snapshot = _snapshot
+    if snapshot[0] == version:
+        return snapshot
+    with _lock:
+        if _snapshot[0] != version:
+            _snapshot = _build(version)
+        return _snapshot
+
+
+def get_children(parent_id: int) -> List[dict]:
+    """返回某分类下的直接子分类菜单项（parent_id=0 即一级分类）。"""
+    return _get_snapshot()[1].get(parent_id, [])
+
+
+def get_menu_tree() -> List[dict]:
+    """返回完整三级分类树：一级/二级节点带 children。"""
+    return _get_snapshot()[2]
@@ -0,0 +1,90 @@
+"""
+分类闭包表维护（category_closure）
+
+- 每个分类对自身（depth=0）及每个祖先各存一行 (ancestor, descendant, depth)；
+  取某分类的全部后代只需按 ancestor_id 一次索引查找，不再按 parent_id 逐层查询
+- 增量维护（见 signals）：
+  新建分类时按父分类的祖先行追加；parent_id 变化时整棵子树断开旧祖先、接到新父分类下；
+  删除分类时其闭包行随外键级联删除，直接子分类各自脱离为独立的根
+- queryset.update() / loaddata 不触发信号，此类批量变更后执行 rebuild()
+  （python manage.py rebuild_category_closure）
+"""
+import logging
+from typing import Dict, List
+
+from django.db import transaction
+from django.db.models import Q
+
+from apps.product.models import Category, CategoryClosure
+
+logger = logging.getLogger(__name__)
+
+
+def _closure_rows(parents: Dict[int, int]) -> List[CategoryClosure]:
+    rows = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        # 沿 parent_id 上溯到根；脏数据成环时到重复节点为止
+        while node in parents and node not in seen:
+            seen.add(node)
+            rows.append(CategoryClosure(ancestor_id=node, descendant_id=category_id, depth=depth))
+            node, depth = parents[node], depth + 1
+    return rows
+
+
+def rebuild() -> int:
+    """按当前 parent_id 全量重建闭包表，返回写入行数。"""
+    rows = _closure_rows(dict(Category.objects.values_list('id', 'parent_id')))
+    with transaction.atomic():
+        CategoryClosure.objects.all().delete()
+        CategoryClosure.objects.bulk_create(rows, batch_size=5000)
+    return len(rows)
+
+
+def _ancestors(category_id: int) -> List[tuple]:
+    if not category_id:
+        return []
+    return list(CategoryClosure.objects.filter(descendant_id=category_id).values_list('ancestor_id', 'depth'))
+
+
+def add(category_id: int, parent_id: int) -> None:
+    """新建分类：自身一行 + 父分类的每个祖先各一行。"""
+    rows = [CategoryClosure(ancestor_id=category_id, descendant_id=category_id, depth=0)]
+    rows += [
+        CategoryClosure(ancestor_id=ancestor_id, descendant_id=category_id, depth=depth + 1)
+        for ancestor_id, depth in _ancestors(parent_id)
+    ]
+    CategoryClosure.objects.bulk_create(rows)
+
+
+def move(category_id: int, parent_id: int) -> None:
+    """把以 category_id 为根的子树挂到 parent_id 下（0 表示成为顶级分类）。"""
+    subtree = list(CategoryClosure.objects.filter(ancestor_id=category_id).values_list('descendant_id', 'depth'))
+    if not subtree:
+        # 闭包缺失（如迁移前的数据或信号外的写入），全量重建兜底
+        rebuild()
+        return
+    subtree_ids = [descendant_id for descendant_id, _ in subtree]
+    if parent_id in subtree_ids:
+        logger.warning('分类 %s 被移动到自身子树 %s 下，已按 parent_id 全量重建闭包', category_id, parent_id)
+        rebuild()
+        return
+    with transaction.atomic():
+        CategoryClosure.objects.filter(descendant_id__in=subtree_ids).exclude(ancestor_id__in=subtree_ids).delete()
+        CategoryClosure.objects.bulk_create([
+            CategoryClosure(ancestor_id=ancestor_id, descendant_id=descendant_id, depth=ancestor_depth + 1 + depth)
+            for ancestor_id, ancestor_depth in _ancestors(parent_id)
+            for descendant_id, depth in subtree
+        ], batch_size=5000)
+
+
+def descendant_ids(category_id: int):
+    """某分类自身及全部后代的分类 id（values 查询集，可直接作为子查询）。
+
+    子树中任一节点停用或删除时，该节点及其整棵子树都不计入：
+    中间分类停用后，其下仍启用的孙分类的商品也不应出现在上级分类列表中。
+    """
+    subtree = CategoryClosure.objects.filter(ancestor_id=category_id)
+    disabled = subtree.filter(Q(descendant__is_active=False) | Q(descendant__is_deleted=True)).values('descendant_id')
+    blocked = CategoryClosure.objects.filter(ancestor_id__in=disabled).values('descendant_id')
+    return subtree.exclude(descendant_id__in=blocked).values('descendant_id')
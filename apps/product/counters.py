@@ -0,0 +1,118 @@
+"""
+商品浏览量 / 销量计数缓冲
+
+- 详情被访问、订单支付成功时只在进程内累加增量（加锁的 Counter），不直接写库，
+  避免热门商品上逐请求 UPDATE 造成行锁热点
+- 后台守护线程每 PRODUCT_COUNTER_FLUSH_INTERVAL 秒批量刷库：每个字段、每批商品一条
+  UPDATE product SET view_count = view_count + CASE id WHEN ... END WHERE id IN (...)
+- 进程退出时（atexit）保证再刷一次；刷库失败时增量回填缓冲，下次重试
+"""
+import atexit
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, Tuple
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Case, F, IntegerField, Value, When
+
+from apps.product.models import Product
+
+logger = logging.getLogger(__name__)
+
+FIELDS = ('view_count', 'sales_count')
+BATCH_SIZE = 500
+
+_lock = threading.Lock()
+_pending: Dict[str, Counter] = {field: Counter() for field in FIELDS}
+_flusher: threading.Thread | None = None
+_stop = threading.Event()
+
+
+def _interval() -> float:
+    return getattr(settings, 'PRODUCT_COUNTER_FLUSH_INTERVAL', 10)
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_run, name='product-counter-flusher', daemon=True)
+        _flusher.start()
+        atexit.register(shutdown)
+
+
+def _run() -> None:
+    while not _stop.wait(_interval()):
+        try:
+            flush()
+        finally:
+            # 后台线程持有独立的数据库连接，用完即关，避免长连接超时
+            connection.close()
+
+
+def incr(field: str, product_id: int, n: int = 1) -> None:
+    incr_many(field, [(product_id, n)])
+
+
+def incr_many(field: str, pairs: Iterable[Tuple[int, int]]) -> None:
+    """批量累加 [(product_id, n), ...]，只加一次锁。"""
+    with _lock:
+        counter = _pending[field]
+        for product_id, n in pairs:
+            if n > 0:
+                counter[product_id] += n
+    _ensure_flusher()
+
+
+def incr_view(product_id: int, n: int = 1) -> None:
+    incr('view_count', product_id, n)
+
+
+def incr_sales(product_id: int, n: int) -> None:
+    incr('sales_count', product_id, n)
+
+
+def _drain() -> Dict[str, Counter]:
+    global _pending
+    with _lock:
+        drained = _pending
+        _pending = {field: Counter() for field in FIELDS}
+    return drained
+
+
+def _restore(field: str, counter: Counter) -> None:
+    with _lock:
+        _pending[field].update(counter)
+
+
+def flush() -> int:
+    """将缓冲中的增量写入数据库，返回写入的 (商品, 字段) 数。"""
+    written = 0
+    for field, counter in _drain().items():
+        items = list(counter.items())
+        for start in range(0, len(items), BATCH_SIZE):
+            chunk = items[start:start + BATCH_SIZE]
+            delta = Case(
+                *[When(id=pid, then=Value(n)) for pid, n in chunk],
+                default=Value(0),
+                output_field=IntegerField(),
+            )
+            try:
+                Product.objects.filter(id__in=[pid for pid, _ in chunk]).update(**{field: F(field) + delta})
+            except Exception:
+                logger.exception('商品计数刷库失败，增量已回填待重试: field=%s', field)
+                _restore(field, Counter(dict(items[start:])))
+                break
+            written += len(chunk)
+    return written
+
+
+def shutdown() -> None:
+    """停止后台线程并同步刷库（进程退出时调用）。"""
+    _stop.set()
+    flush()
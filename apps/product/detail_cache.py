@@ -0,0 +1,110 @@
+"""
+商品详情缓存
+
+- 条目以 (商品 id, update_time) 为键，在共享缓存中保存已序列化好的详情 payload，
+  连同 ETag（payload 摘要）与 Last-Modified（update_time）一起存放；商品一经修改即换键，旧条目自然过期
+- 每个商品的当前 update_time（戳）另存一个短期键（STAMP_TIMEOUT 秒）：命中时整个请求不访问数据库，
+  戳过期后按主键只取 update_time 复核一次，漏调 invalidate 的写入最多滞后 STAMP_TIMEOUT 秒
+- 以 F()/.update() 改动详情字段的写入（库存扣减、评价聚合）须同时写 update_time；
+  浏览量/销量计数缓冲刷库不改 update_time，详情中的计数随条目过期（PRODUCT_DETAIL_CACHE_TIMEOUT）刷新
+- 商品保存/删除、标签变更、评价聚合变化时调用 invalidate 立即失效（见 signals / review.services）
+"""
+import hashlib
+import json
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils.http import http_date
+
+from apps.product.models import Product
+from apps.product.serializers import ProductSerializer
+
+KEY_PREFIX = 'product:detail:'
+STAMP_PREFIX = 'product:detail:stamp:'
+STAMP_TIMEOUT = 30
+
+
+def _stamp(update_time) -> str:
+    return str(int(update_time.timestamp() * 1_000_000)) if update_time else '0'
+
+
+def _key(product_id: int, stamp: str) -> str:
+    return f'{KEY_PREFIX}{product_id}:{stamp}'
+
+
+def _stamp_key(product_id: int) -> str:
+    return f'{STAMP_PREFIX}{product_id}'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PRODUCT_DETAIL_CACHE_TIMEOUT', 600)
+
+
+def build_entry(product: Product) -> dict:
+    data = ProductSerializer(instance=product).data
+    raw = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True, ensure_ascii=False)
+    return {
+        'data': data,
+        'etag': '"%s"' % hashlib.md5(raw.encode('utf-8')).hexdigest(),
+        'last_modified': http_date(product.update_time.timestamp()) if product.update_time else None,
+    }
+
+
+def get_entry(product_id: int) -> Optional[dict]:
+    """读取详情缓存，未命中时查库并回填；商品不存在返回 None。"""
+    stamp = cache.get(_stamp_key(product_id))
+    if stamp is not None:
+        entry = cache.get(_key(product_id, stamp))
+        if entry is not None:
+            return entry
+    update_times = list(Product.objects.filter(id=product_id).values_list('update_time', flat=True))
+    if not update_times:
+        return None
+    stamp = _stamp(update_times[0])
+    entry = cache.get(_key(product_id, stamp))
+    if entry is None:
+        try:
+            product = Product.objects.get(id=product_id)
+        except Product.DoesNotExist:
+            return None
+        # 以实际序列化的行为准，两次查询之间被修改时键随之更新
+        stamp = _stamp(product.update_time)
+        entry = build_entry(product)
+        cache.set(_key(product_id, stamp), entry, _timeout())
+    cache.set(_stamp_key(product_id), stamp, STAMP_TIMEOUT)
+    return entry
+
+
+def project(entry: dict, fields: Optional[Sequence[str]]) -> Tuple[dict, str]:
+    """按 ?fields= 裁剪缓存的 payload，并为该字段集派生独立的 ETag。"""
+    if not fields:
+        return entry['data'], entry['etag']
+    wanted = set(fields)
+    data = {k: v for k, v in entry['data'].items() if k in wanted}
+    suffix = hashlib.md5(','.join(sorted(wanted)).encode('utf-8')).hexdigest()[:8]
+    return data, '"%s-%s"' % (entry['etag'].strip('"'), suffix)
+
+
+def get_cached_entries(product_ids: Iterable[int]) -> Dict[int, dict]:
+    """批量读取已缓存的详情（不回源），返回 {product_id: entry}；戳已过期的商品视为未命中。"""
+    stamps = cache.get_many([_stamp_key(pid) for pid in product_ids])
+    keys = {_key(int(k[len(STAMP_PREFIX):]), stamp): int(k[len(STAMP_PREFIX):]) for k, stamp in stamps.items()}
+    found = cache.get_many(list(keys))
+    return {keys[k]: v for k, v in found.items()}
+
+
+def invalidate(product_id: int) -> None:
+    invalidate_many([product_id])
+
+
+def invalidate_many(product_ids: Iterable[int]) -> None:
+    """删除戳与当前条目：标签变更等不改 update_time 的修改也立即生效。"""
+    product_ids = list(product_ids)
+    stamps = cache.get_many([_stamp_key(pid) for pid in product_ids])
+    keys = list(stamps)
+    keys += [_key(int(k[len(STAMP_PREFIX):]), stamp) for k, stamp in stamps.items()]
+    keys += [_key(pid, _stamp(update_time))
+             for pid, update_time in Product.objects.filter(id__in=product_ids).values_list('id', 'update_time')]
+    cache.delete_many(keys)
@@ -0,0 +1,29 @@
+"""
+批量生成 static/ 下图片的多尺寸衍生图（见 utils.image_variants）
+
+用法：python manage.py build_image_variants [--workers 4] [--force] [--path static/carousel]
+默认跳过索引中 mtime/大小未变化的源图。
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from utils import image_variants
+
+
+class Command(BaseCommand):
+    help = '生成商品/轮播/评价等图片的 thumb/card/detail 衍生图（WebP + JPEG）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=os.cpu_count(), help='进程池大小')
+        parser.add_argument('--force', action='store_true', help='忽略索引，全部重新生成')
+        parser.add_argument('--path', default='static', help='只处理该目录（相对项目根目录）')
+
+    def handle(self, *args, **options):
+        if not image_variants.available():
+            raise CommandError('未安装 Pillow，请先 pip install pillow')
+        sources = list(image_variants.iter_sources(options['path']))
+        built, skipped, failed = image_variants.generate(sources, workers=options['workers'], force=options['force'])
+        for rel_path in failed:
+            self.stderr.write(f'失败：{rel_path}')
+        self.stdout.write(self.style.SUCCESS(f'衍生图生成完成：源图 {len(sources)} 张，生成 {built}，跳过 {skipped}，失败 {len(failed)}'))
@@ -0,0 +1,21 @@
+"""
+按内容哈希发布 static/ 下的全部文件并更新清单（见 utils.assets）
+
+用法：python manage.py collect_assets [--path static/carousel]
+建议在 build_image_variants 之后执行；内容未变的文件不会重复写入。
+"""
+from django.core.management.base import BaseCommand
+
+from utils import assets
+
+
+class Command(BaseCommand):
+    help = '生成内容哈希命名的静态资源副本与 manifest.json'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='static', help='只处理该目录（相对项目根目录）')
+
+    def handle(self, *args, **options):
+        files = list(assets.iter_files(options['path']))
+        written, unchanged = assets.publish_many(files)
+        self.stdout.write(self.style.SUCCESS(f'静态资源发布完成：文件 {len(files)} 个，新写入 {written}，未变化 {unchanged}'))
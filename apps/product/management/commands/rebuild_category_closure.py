@@ -0,0 +1,17 @@
+"""
+按 Category.parent_id 全量重建分类闭包表（见 apps.product.category_closure）
+
+用法：python manage.py rebuild_category_closure
+日常由信号增量维护；批量 update / loaddata 修改分类后执行一次即可。
+"""
+from django.core.management.base import BaseCommand
+
+from apps.product import category_closure
+
+
+class Command(BaseCommand):
+    help = '全量重建分类闭包表（category_closure）'
+
+    def handle(self, *args, **options):
+        rows = category_closure.rebuild()
+        self.stdout.write(self.style.SUCCESS(f'分类闭包重建完成：写入 {rows} 行'))
@@ -0,0 +1,38 @@
+"""
+全量重建商品搜索倒排索引
+
+用法：python manage.py rebuild_search_index [--batch-size 5000]
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.product.models import Product, ProductSearchToken
+from apps.product.search_index import build_rows
+
+
+class Command(BaseCommand):
+    help = '全量重建商品搜索倒排索引（product_search_token）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help='每批写入的索引行数')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        products = (Product.objects
+                    .only('id', 'name', 'subtitle', 'description')
+                    .order_by('id'))
+        pending = []
+        product_count = row_count = 0
+        with transaction.atomic():
+            ProductSearchToken.objects.all().delete()
+            for product in products.iterator(chunk_size=1000):
+                pending.extend(build_rows(product))
+                product_count += 1
+                if len(pending) >= batch_size:
+                    ProductSearchToken.objects.bulk_create(pending, batch_size=batch_size)
+                    row_count += len(pending)
+                    pending = []
+            if pending:
+                ProductSearchToken.objects.bulk_create(pending, batch_size=batch_size)
+                row_count += len(pending)
+        self.stdout.write(self.style.SUCCESS(f'索引重建完成：商品 {product_count} 个，索引行 {row_count} 条'))
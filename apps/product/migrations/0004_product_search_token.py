@@ -0,0 +1,70 @@
+# Generated by Django 4.2.1 on 2026-10-17 20:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from apps.product.search_index import product_token_weights
+
+
+def backfill_search_tokens(apps, schema_editor):
+    Product = apps.get_model("product", "Product")
+    ProductSearchToken = apps.get_model("product", "ProductSearchToken")
+    products = Product.objects.only("id", "name", "subtitle", "description").order_by("id")
+    rows = []
+    for product in products.iterator(chunk_size=1000):
+        rows.extend(
+            ProductSearchToken(token=token, product_id=product.id, weight=weight)
+            for token, weight in product_token_weights(product).items()
+        )
+        if len(rows) >= 5000:
+            ProductSearchToken.objects.bulk_create(rows, batch_size=5000)
+            rows = []
+    ProductSearchToken.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0003_alter_producttag_id"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductSearchToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("token", models.CharField(max_length=32, verbose_name="词元")),
+                (
+                    "weight",
+                    models.PositiveSmallIntegerField(default=1, verbose_name="权重"),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_column="product_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="search_tokens",
+                        to="product.product",
+                        verbose_name="商品ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "商品搜索索引",
+                "verbose_name_plural": "商品搜索索引",
+                "db_table": "product_search_token",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productsearchtoken",
+            constraint=models.UniqueConstraint(
+                fields=("token", "product"), name="uk_search_token_product"
+            ),
+        ),
+        migrations.RunPython(backfill_search_tokens, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 4.2.1 on 2026-10-17 20:27
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_review_stats(apps, schema_editor):
+    Product = apps.get_model("product", "Product")
+    ProductReview = apps.get_model("review", "ProductReview")
+    stats = {}
+    rows = (
+        ProductReview.objects.filter(is_deleted=False)
+        .values("product_id", "rating")
+        .annotate(n=Count("id"))
+        .order_by()
+    )
+    for row in rows:
+        s = stats.setdefault(row["product_id"], {"review_count": 0, "rating_sum": 0})
+        s["review_count"] += row["n"]
+        s["rating_sum"] += row["rating"] * row["n"]
+        s[f"rating_{row['rating']}_count"] = row["n"]
+    for product_id, fields in stats.items():
+        Product.objects.filter(id=product_id).update(**fields)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0004_product_search_token"),
+        ("review", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="rating_1_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="1星评价数"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_2_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="2星评价数"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_3_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="3星评价数"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_4_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="4星评价数"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_5_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="5星评价数"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="rating_sum",
+            field=models.PositiveIntegerField(default=0, verbose_name="评分总和"),
+        ),
+        migrations.AddField(
+            model_name="product",
+            name="review_count",
+            field=models.PositiveIntegerField(default=0, verbose_name="有效评价数"),
+        ),
+        migrations.RunPython(backfill_review_stats, migrations.RunPython.noop),
+    ]
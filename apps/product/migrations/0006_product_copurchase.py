@@ -0,0 +1,61 @@
+# Generated by Django 4.2.1 on 2026-10-17 20:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0005_product_review_stats"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ProductCoPurchase",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                (
+                    "co_count",
+                    models.PositiveIntegerField(verbose_name="共同购买订单数"),
+                ),
+                ("rank", models.PositiveSmallIntegerField(verbose_name="排名")),
+                (
+                    "neighbor",
+                    models.ForeignKey(
+                        db_column="neighbor_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="+",
+                        to="product.product",
+                        verbose_name="共购商品ID",
+                    ),
+                ),
+                (
+                    "product",
+                    models.ForeignKey(
+                        db_column="product_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="copurchases",
+                        to="product.product",
+                        verbose_name="商品ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "共购推荐",
+                "verbose_name_plural": "共购推荐",
+                "db_table": "product_copurchase",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="productcopurchase",
+            constraint=models.UniqueConstraint(
+                fields=("product", "rank"), name="uk_copurchase_product_rank"
+            ),
+        ),
+    ]
@@ -0,0 +1,76 @@
+# Generated by Django 4.2.1 on 2026-10-17 20:46
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_closure(apps, schema_editor):
+    Category = apps.get_model("product", "Category")
+    CategoryClosure = apps.get_model("product", "CategoryClosure")
+    parents = dict(Category.objects.values_list("id", "parent_id"))
+    rows = []
+    for category_id in parents:
+        node, depth, seen = category_id, 0, set()
+        while node in parents and node not in seen:
+            seen.add(node)
+            rows.append(
+                CategoryClosure(
+                    ancestor_id=node, descendant_id=category_id, depth=depth
+                )
+            )
+            node, depth = parents[node], depth + 1
+    CategoryClosure.objects.bulk_create(rows, batch_size=5000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("product", "0006_product_copurchase"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CategoryClosure",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        primary_key=True, serialize=False, verbose_name="ID"
+                    ),
+                ),
+                ("depth", models.PositiveSmallIntegerField(verbose_name="层级距离")),
+                (
+                    "ancestor",
+                    models.ForeignKey(
+                        db_column="ancestor_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="descendant_links",
+                        to="product.category",
+                        verbose_name="祖先分类ID",
+                    ),
+                ),
+                (
+                    "descendant",
+                    models.ForeignKey(
+                        db_column="descendant_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ancestor_links",
+                        to="product.category",
+                        verbose_name="后代分类ID",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "分类闭包",
+                "verbose_name_plural": "分类闭包",
+                "db_table": "category_closure",
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="categoryclosure",
+            constraint=models.UniqueConstraint(
+                fields=("ancestor", "descendant"), name="uk_closure_ancestor_descendant"
+            ),
+        ),
+        migrations.RunPython(backfill_closure, migrations.RunPython.noop),
+    ]
@@ -60,6 +60,14 @@ class Product(models.Model):
     )
     sales_count = models.PositiveIntegerField(default=0, verbose_name='销售数量')
     view_count = models.PositiveIntegerField(default=0, verbose_name='浏览次数')
+    # 评价聚合（冗余字段，由评价增删事务内维护，可用 repair_review_stats 命令校正）
+    review_count = models.PositiveIntegerField(default=0, verbose_name='有效评价数')
+    rating_sum = models.PositiveIntegerField(default=0, verbose_name='评分总和')
+    rating_1_count = models.PositiveIntegerField(default=0, verbose_name='1星评价数')
+    rating_2_count = models.PositiveIntegerField(default=0, verbose_name='2星评价数')
+    rating_3_count = models.PositiveIntegerField(default=0, verbose_name='3星评价数')
+    rating_4_count = models.PositiveIntegerField(default=0, verbose_name='4星评价数')
+    rating_5_count = models.PositiveIntegerField(default=0, verbose_name='5星评价数')
     sort_order = models.IntegerField(default=0, verbose_name='排序')
     seo_title = models.CharField(max_length=200, blank=True, null=True, verbose_name='SEO标题')
     seo_keywords = models.CharField(max_length=500, blank=True, null=True, verbose_name='SEO关键词')
@@ -86,6 +94,16 @@ class Product(models.Model):
             'view_count': self.view_count,
         }
 
+    @property
+    def rating_avg(self) -> float | None:
+        if not self.review_count:
+            return None
+        return round(self.rating_sum / self.review_count, 1)
+
+    @property
+    def rating_histogram(self) -> dict:
+        return {str(star): getattr(self, f'rating_{star}_count') for star in range(1, 6)}
+
     class Meta:
         db_table = 'product'
         verbose_name = '商品信息'
@@ -121,3 +139,82 @@ class Category(models.Model):
         db_table = 'category'
         verbose_name = '商品分类'
         verbose_name_plural = '商品分类'
+
+
+class CategoryClosure(models.Model):
+    """分类闭包表：每个分类对自身（depth=0）及每个祖先各一行，由信号维护（见 category_closure）。"""
+    id = models.BigAutoField(primary_key=True, verbose_name='ID')
+    ancestor = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        db_column='ancestor_id',
+        related_name='descendant_links',
+        verbose_name='祖先分类ID'
+    )
+    descendant = models.ForeignKey(
+        Category,
+        on_delete=models.CASCADE,
+        db_column='descendant_id',
+        related_name='ancestor_links',
+        verbose_name='后代分类ID'
+    )
+    depth = models.PositiveSmallIntegerField(verbose_name='层级距离')
+
+    class Meta:
+        db_table = 'category_closure'
+        verbose_name = '分类闭包'
+        verbose_name_plural = '分类闭包'
+        constraints = [
+            models.UniqueConstraint(fields=['ancestor', 'descendant'], name='uk_closure_ancestor_descendant')
+        ]
+
+
+class ProductSearchToken(models.Model):
+    """商品搜索倒排索引：词元 -> 商品，weight 为该词元在各字段中的权重之和。"""
+    id = models.BigAutoField(primary_key=True, verbose_name='ID')
+    token = models.CharField(max_length=32, verbose_name='词元')
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        db_column='product_id',
+        related_name='search_tokens',
+        verbose_name='商品ID'
+    )
+    weight = models.PositiveSmallIntegerField(default=1, verbose_name='权重')
+
+    class Meta:
+        db_table = 'product_search_token'
+        verbose_name = '商品搜索索引'
+        verbose_name_plural = '商品搜索索引'
+        constraints = [
+            models.UniqueConstraint(fields=['token', 'product'], name='uk_search_token_product')
+        ]
+
+
+class ProductCoPurchase(models.Model):
+    """“买了还买”预计算结果：商品 -> 共购邻居，rank 从 1 开始，由 build_also_bought 整表重建。"""
+    id = models.BigAutoField(primary_key=True, verbose_name='ID')
+    product = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        db_column='product_id',
+        related_name='copurchases',
+        verbose_name='商品ID'
+    )
+    neighbor = models.ForeignKey(
+        Product,
+        on_delete=models.CASCADE,
+        db_column='neighbor_id',
+        related_name='+',
+        verbose_name='共购商品ID'
+    )
+    co_count = models.PositiveIntegerField(verbose_name='共同购买订单数')
+    rank = models.PositiveSmallIntegerField(verbose_name='排名')
+
+    class Meta:
+        db_table = 'product_copurchase'
+        verbose_name = '共购推荐'
+        verbose_name_plural = '共购推荐'
+        constraints = [
+            models.UniqueConstraint(fields=['product', 'rank'], name='uk_copurchase_product_rank')
+        ]
@@ -0,0 +1,185 @@
+"""
+热门搜索结果缓存（进程内 LRU）
+
+- 键：规范化查询（排序去重后的查询词元）+ 排序、页码/游标、page_size、字段、分面筛选等参数；
+  值：整页响应 data，连同本页商品 id 与查询词元，用于定向失效
+- 容量 PRODUCT_SEARCH_CACHE_SIZE 条，超出按 LRU 淘汰；每条 PRODUCT_SEARCH_CACHE_TIMEOUT 秒过期
+- 单飞（single-flight）：同一进程内同一个键未命中时只有一个线程查库，其余线程等待其结果
+- 失效：商品保存/删除、评价聚合变化时经共享缓存广播一条变更记录（商品 id + 文档词元），
+  各进程在下次搜索时按序号拉取并丢弃两类条目：本页含该商品的、查询词元全部被该商品命中的
+  （即该商品可能新进入结果或影响总数）。记录缺失或落后过多时整体清空，保证不会读到漏失效的数据
+- 商品改名后不再命中的旧查询若该商品不在已缓存页内，总数可能滞后，最长不超过 TTL
+- 统计：命中/未命中/合并等待/淘汰/失效次数，见 stats()
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, FrozenSet, Hashable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+SEQ_KEY = 'product:search_cache:seq'
+CHANGE_KEY_PREFIX = 'product:search_cache:change:'
+CHANGE_TIMEOUT = 300
+# 本进程落后超过该条数时直接清空，不再逐条拉取
+MAX_LAG = 200
+# 等待其他线程计算同一键的最长时间（秒），超时后自行计算
+WAIT_TIMEOUT = 5
+
+
+@dataclass
+class _Entry:
+    expires_at: float
+    data: dict
+    product_ids: FrozenSet[int]
+    tokens: FrozenSet[str]
+
+
+_lock = threading.Lock()
+_entries: 'OrderedDict[Hashable, _Entry]' = OrderedDict()
+_inflight: dict = {}
+_seq: Optional[int] = None
+# 每次本地失效递增；计算期间发生过失效的结果不写入缓存
+_epoch = 0
+_stats = dict.fromkeys(('hits', 'misses', 'coalesced', 'evictions', 'expired', 'invalidated', 'flushes'), 0)
+
+
+def _capacity() -> int:
+    return getattr(settings, 'PRODUCT_SEARCH_CACHE_SIZE', 512)
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PRODUCT_SEARCH_CACHE_TIMEOUT', 60)
+
+
+# ---------------------------------------------------------------- 失效广播
+
+def publish(product_ids: Iterable[int], tokens: Optional[Iterable[str]] = None) -> None:
+    """广播商品变更：tokens 为商品文档词元，None 表示只影响已缓存页内的该商品。"""
+    cache.add(SEQ_KEY, 0, timeout=None)
+    try:
+        seq = cache.incr(SEQ_KEY)
+    except ValueError:
+        cache.set(SEQ_KEY, 1, timeout=None)
+        seq = 1
+    record = (list(product_ids), list(tokens) if tokens is not None else None)
+    cache.set(f'{CHANGE_KEY_PREFIX}{seq}', record, CHANGE_TIMEOUT)
+
+
+def _flush_locked() -> None:
+    global _epoch
+    _entries.clear()
+    _epoch += 1
+    _stats['flushes'] += 1
+
+
+def _invalidate_locked(product_ids: FrozenSet[int], tokens: Optional[FrozenSet[str]]) -> None:
+    global _epoch
+    stale = [
+        key for key, entry in _entries.items()
+        if entry.product_ids & product_ids or (tokens is not None and entry.tokens <= tokens)
+    ]
+    for key in stale:
+        del _entries[key]
+    _stats['invalidated'] += len(stale)
+    _epoch += 1
+
+
+def _sync() -> None:
+    """拉取其它进程广播的变更记录并应用。"""
+    global _seq
+    seq = cache.get(SEQ_KEY) or 0
+    if seq == _seq:
+        return
+    with _lock:
+        if _seq is None or seq < _seq or seq - _seq > MAX_LAG:
+            # 首次启动、共享缓存被清空或落后过多
+            if _entries:
+                _flush_locked()
+            _seq = seq
+            return
+        keys = [f'{CHANGE_KEY_PREFIX}{n}' for n in range(_seq + 1, seq + 1)]
+        records = cache.get_many(keys)
+        if len(records) != len(keys):
+            _flush_locked()
+        else:
+            for key in keys:
+                ids, tokens = records[key]
+                _invalidate_locked(frozenset(ids), frozenset(tokens) if tokens is not None else None)
+        _seq = seq
+
+
+# ---------------------------------------------------------------- 读写
+
+def _get_locked(key: Hashable) -> Optional[dict]:
+    entry = _entries.get(key)
+    if entry is None:
+        return None
+    if entry.expires_at <= time.monotonic():
+        del _entries[key]
+        _stats['expired'] += 1
+        return None
+    _entries.move_to_end(key)
+    return entry.data
+
+
+def _put_locked(key: Hashable, entry: _Entry) -> None:
+    _entries[key] = entry
+    _entries.move_to_end(key)
+    while len(_entries) > _capacity():
+        _entries.popitem(last=False)
+        _stats['evictions'] += 1
+
+
+def get_or_compute(key: Hashable, tokens: Iterable[str], compute: Callable[[], dict]) -> dict:
+    """读取缓存；未命中时单飞计算。compute 返回的 data 中 results 项需带 id 才能按商品定向失效。"""
+    _sync()
+    while True:
+        with _lock:
+            data = _get_locked(key)
+            if data is not None:
+                _stats['hits'] += 1
+                return data
+            waiter = _inflight.get(key)
+            if waiter is None:
+                waiter = _inflight[key] = threading.Event()
+                epoch = _epoch
+                _stats['misses'] += 1
+                break
+            _stats['coalesced'] += 1
+        if not waiter.wait(WAIT_TIMEOUT):
+            # 计算方过慢，放弃等待自行查库（不写缓存，避免覆盖）
+            return compute()
+        with _lock:
+            data = _get_locked(key)
+        if data is not None:
+            return data
+        # 计算方失败或结果未写入（期间发生失效），重新竞争
+    try:
+        data = compute()
+        ids = frozenset(item['id'] for item in data.get('results', ()) if 'id' in item)
+        entry = _Entry(time.monotonic() + _timeout(), data, ids, frozenset(tokens))
+        with _lock:
+            if epoch == _epoch:
+                _put_locked(key, entry)
+        return data
+    finally:
+        with _lock:
+            _inflight.pop(key, None)
+        waiter.set()
+
+
+def clear() -> None:
+    with _lock:
+        _flush_locked()
+
+
+def stats() -> dict:
+    with _lock:
+        data = dict(_stats)
+        data.update(size=len(_entries), capacity=_capacity(), timeout=_timeout(), inflight=len(_inflight))
+    lookups = data['hits'] + data['misses'] + data['coalesced']
+    data['hit_ratio'] = round(data['hits'] / lookups, 4) if lookups else None
+    return data
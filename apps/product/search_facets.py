@@ -0,0 +1,168 @@
+"""
+搜索分面（facets）
+
+- 按 (category_id, store_id, 价格区间) 分组计数（一次 GROUP BY 查询），以规范化查询
+  （排序去重后的查询词元）为键只缓存分组计数，同一查询任意组合筛选条件的分面计数都由分组在内存中得出
+- 分组数超过 PRODUCT_SEARCH_FACET_MAX_GROUPS 时不缓存，改为按维度分别执行聚合查询
+- 计数采用“析取”口径：某一维度的计数只应用其它维度的筛选条件，
+  便于前端在同一维度内切换/多选
+- 分组计数按 PRODUCT_SEARCH_FACET_TIMEOUT 过期，商品变更后计数最多滞后该时长
+"""
+import bisect
+import hashlib
+from dataclasses import dataclass, field, replace
+from decimal import Decimal
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Case, CharField, Count, Q, QuerySet, Value, When
+
+from apps.product import search_index
+from apps.store.models import Store
+
+KEY_PREFIX = 'product:search_facets:'
+
+# 价格区间：(标识, 下限含, 上限不含)，上限 None 表示不封顶
+PRICE_BANDS: Tuple[Tuple[str, int, Optional[int]], ...] = (
+    ('0-50', 0, 50),
+    ('50-100', 50, 100),
+    ('100-500', 100, 500),
+    ('500-1000', 500, 1000),
+    ('1000-5000', 1000, 5000),
+    ('5000+', 5000, None),
+)
+PRICE_BAND_KEYS = tuple(key for key, _, _ in PRICE_BANDS)
+_BAND_BOUNDS = [low for _, low, _ in PRICE_BANDS[1:]]
+# 数据库端的价格区间标识，与 price_band() 一致
+_BAND_CASE = Case(
+    *(When(price__lt=high, then=Value(key)) for key, _, high in PRICE_BANDS if high is not None),
+    default=Value(PRICE_BANDS[-1][0]),
+    output_field=CharField(),
+)
+
+
+@dataclass(frozen=True)
+class FacetFilters:
+    category_ids: FrozenSet[int] = field(default_factory=frozenset)
+    store_ids: FrozenSet[int] = field(default_factory=frozenset)
+    price_bands: FrozenSet[str] = field(default_factory=frozenset)
+
+    def apply(self, queryset: QuerySet) -> QuerySet:
+        if self.category_ids:
+            queryset = queryset.filter(category_id__in=self.category_ids)
+        if self.store_ids:
+            queryset = queryset.filter(store_id__in=self.store_ids)
+        if self.price_bands:
+            condition = Q()
+            for key, low, high in PRICE_BANDS:
+                if key in self.price_bands:
+                    band = Q(price__gte=low)
+                    if high is not None:
+                        band &= Q(price__lt=high)
+                    condition |= band
+            queryset = queryset.filter(condition)
+        return queryset
+
+
+def _int_set(raw: str) -> FrozenSet[int]:
+    return frozenset(int(part) for part in raw.split(',') if part.strip())
+
+
+def parse_filters(params) -> FacetFilters:
+    """解析 category_id / store_id / price_band（均可逗号分隔多选）；非法时抛 ValueError(参数名)。"""
+    values = {}
+    for name in ('category_id', 'store_id'):
+        try:
+            values[name] = _int_set(params.get(name, ''))
+        except ValueError:
+            raise ValueError(name)
+    bands = frozenset(part.strip() for part in params.get('price_band', '').split(',') if part.strip())
+    if not bands <= set(PRICE_BAND_KEYS):
+        raise ValueError('price_band')
+    return FacetFilters(category_ids=values['category_id'], store_ids=values['store_id'], price_bands=bands)
+
+
+def price_band(price: Decimal) -> str:
+    return PRICE_BAND_KEYS[bisect.bisect_right(_BAND_BOUNDS, price)]
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PRODUCT_SEARCH_FACET_TIMEOUT', 120)
+
+
+def _max_groups() -> int:
+    return getattr(settings, 'PRODUCT_SEARCH_FACET_MAX_GROUPS', 5000)
+
+
+def _key(q: str) -> str:
+    normalized = ' '.join(sorted(search_index.query_tokens(q)))
+    return KEY_PREFIX + hashlib.md5(normalized.encode('utf-8')).hexdigest()
+
+
+def _load(q: str, queryset: QuerySet) -> Optional[List[Tuple[int, int, str, int]]]:
+    """返回 (category_id, store_id, 价格区间, 数量) 分组；分组数超过上限时返回 None（不缓存）。"""
+    key = _key(q)
+    groups = cache.get(key)
+    if groups is not None:
+        return groups
+    limit = _max_groups()
+    groups = list(
+        queryset.order_by()
+        .annotate(band=_BAND_CASE)
+        .values_list('category_id', 'store_id', 'band')
+        .annotate(n=Count('id'))[:limit + 1]
+    )
+    if len(groups) > limit:
+        return None
+    cache.set(key, groups, _timeout())
+    return groups
+
+
+def _count_groups(groups, filters: FacetFilters) -> Tuple[Dict[int, int], Dict[int, int], Dict[str, int]]:
+    categories: Dict[int, int] = {}
+    stores: Dict[int, int] = {}
+    bands: Dict[str, int] = {}
+    for category_id, store_id, band, n in groups:
+        in_category = not filters.category_ids or category_id in filters.category_ids
+        in_store = not filters.store_ids or store_id in filters.store_ids
+        in_band = not filters.price_bands or band in filters.price_bands
+        if in_store and in_band:
+            categories[category_id] = categories.get(category_id, 0) + n
+        if in_category and in_band:
+            stores[store_id] = stores.get(store_id, 0) + n
+        if in_category and in_store:
+            bands[band] = bands.get(band, 0) + n
+    return categories, stores, bands
+
+
+def _count_sql(queryset: QuerySet, filters: FacetFilters) -> Tuple[Dict[int, int], Dict[int, int], Dict[str, int]]:
+    """分组过多时逐维度聚合：每个维度只应用其它维度的筛选条件。"""
+    queryset = queryset.order_by()
+
+    def grouped(qs: QuerySet, column: str) -> Dict:
+        return dict(qs.values_list(column).annotate(n=Count('id')))
+
+    categories = grouped(replace(filters, category_ids=frozenset()).apply(queryset), 'category_id')
+    stores = grouped(replace(filters, store_ids=frozenset()).apply(queryset), 'store_id')
+    bands = grouped(replace(filters, price_bands=frozenset()).apply(queryset).annotate(band=_BAND_CASE), 'band')
+    return categories, stores, bands
+
+
+def compute(q: str, queryset: QuerySet, filters: FacetFilters) -> dict:
+    """返回当前查询的分面计数。queryset 为未应用分面筛选的命中集合，仅在缓存未命中时查询。"""
+    groups = _load(q, queryset)
+    if groups is None:
+        categories, stores, bands = _count_sql(queryset, filters)
+    else:
+        categories, stores, bands = _count_groups(groups, filters)
+
+    def ranked(counts: Dict) -> List:
+        return sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+
+    store_names = dict(Store.objects.filter(id__in=stores).values_list('id', 'store_name')) if stores else {}
+    return {
+        'category': [{'id': pk, 'count': n} for pk, n in ranked(categories)],
+        'store': [{'id': pk, 'name': store_names.get(pk), 'count': n} for pk, n in ranked(stores)],
+        'price_band': [{'key': key, 'count': bands[key]} for key in PRICE_BAND_KEYS if key in bands],
+    }
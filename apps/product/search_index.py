@@ -0,0 +1,99 @@
+"""
+商品搜索倒排索引
+
+- 分词：中文按单字 + 相邻二元组（bigram），英文/数字按单词及其前缀，统一转小写
+- 索引：name / subtitle / description 分别计权（3 / 2 / 1），同一词元的权重累加后
+  写入 product_search_token 表，每个 (词元, 商品) 一行
+- 维护：建表迁移（0004）回填存量商品，商品保存时增量重建该商品的词元（见 signals），
+  全量重建使用 python manage.py rebuild_search_index
+- 查询：查询词切分为词元后，要求商品命中全部词元，score 为命中词元权重之和
+"""
+import re
+import unicodedata
+from typing import Dict, Iterable, List
+
+from django.db import transaction
+from django.db.models import Count, QuerySet, Sum
+
+from apps.product.models import Product, ProductSearchToken
+
+FIELD_WEIGHTS = (('name', 3), ('subtitle', 2), ('description', 1))
+INDEXED_FIELDS = {f for f, _ in FIELD_WEIGHTS}
+MAX_TOKEN_LEN = 32
+# 详情描述可能很长，仅索引前若干字符，控制单商品词元数量
+MAX_FIELD_LEN = 2000
+
+_CJK = r'㐀-䶿一-鿿豈-﫿'
+_RUN_RE = re.compile(rf'[{_CJK}]+|[a-z0-9]+')
+_CJK_RE = re.compile(rf'[{_CJK}]')
+
+
+def _normalize(text: str | None) -> str:
+    if not text:
+        return ''
+    return unicodedata.normalize('NFKC', text).lower()[:MAX_FIELD_LEN]
+
+
+def _runs(text: str | None) -> Iterable[str]:
+    return _RUN_RE.findall(_normalize(text))
+
+
+def document_tokens(text: str | None) -> set:
+    """文档侧分词：中文单字 + bigram，英文单词的全部前缀。"""
+    tokens = set()
+    for run in _runs(text):
+        if _CJK_RE.match(run):
+            tokens.update(run)
+            tokens.update(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            word = run[:MAX_TOKEN_LEN]
+            tokens.update(word[:i] for i in range(1, len(word) + 1))
+    return tokens
+
+
+def query_tokens(text: str | None) -> List[str]:
+    """查询侧分词：中文取 bigram（单字时取单字），英文取整词（即前缀匹配）。"""
+    tokens: List[str] = []
+    for run in _runs(text):
+        if _CJK_RE.match(run):
+            grams = [run] if len(run) == 1 else [run[i:i + 2] for i in range(len(run) - 1)]
+        else:
+            grams = [run[:MAX_TOKEN_LEN]]
+        for g in grams:
+            if g not in tokens:
+                tokens.append(g)
+    return tokens
+
+
+def product_token_weights(product: Product) -> Dict[str, int]:
+    weights: Dict[str, int] = {}
+    for field, weight in FIELD_WEIGHTS:
+        for token in document_tokens(getattr(product, field)):
+            weights[token] = weights.get(token, 0) + weight
+    return weights
+
+
+def build_rows(product: Product) -> List[ProductSearchToken]:
+    return [
+        ProductSearchToken(token=token, product_id=product.id, weight=weight)
+        for token, weight in product_token_weights(product).items()
+    ]
+
+
+@transaction.atomic
+def index_product(product: Product) -> None:
+    """增量重建单个商品的索引。"""
+    ProductSearchToken.objects.filter(product_id=product.id).delete()
+    ProductSearchToken.objects.bulk_create(build_rows(product), batch_size=1000)
+
+
+def match_queryset(q: str) -> QuerySet | None:
+    """返回命中全部查询词元的 (product_id, score) 分组查询；无有效词元时返回 None。"""
+    tokens = query_tokens(q)
+    if not tokens:
+        return None
+    return (ProductSearchToken.objects
+            .filter(token__in=tokens)
+            .values('product_id')
+            .annotate(hits=Count('id'), score=Sum('weight'))
+            .filter(hits=len(tokens)))
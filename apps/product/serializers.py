@@ -1,32 +1,56 @@
 from rest_framework import serializers
-from django.conf import settings
 from core.settings import IMAGE_URL
 from apps.product.models import Product
+from utils import assets, image_variants
+from utils.serializers import SparseFieldsMixin
 
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
-    商品序列化器：自动为 thumbnail 补全 IMAGE_URL 前缀，并提供 image_url 兼容字段
+    商品序列化器：自动为 thumbnail 补全 IMAGE_URL 前缀，并提供 image_url 兼容字段；
+    评分均值与 1-5 星直方图直接读取商品上的冗余聚合字段；
+    image_variants / gallery_variants 为缩略图与图集的多尺寸衍生图（未生成时为 None）
     """
     image_url = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
+    gallery_variants = serializers.SerializerMethodField()
+    rating_avg = serializers.FloatField(read_only=True)
+    rating_histogram = serializers.DictField(child=serializers.IntegerField(), read_only=True)
     create_time = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S')
     update_time = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S')
 
+    SPARSE_DEPENDS = {
+        'image_url': ['thumbnail'],
+        'image_variants': ['thumbnail'],
+        'gallery_variants': ['gallery'],
+        'rating_avg': ['review_count', 'rating_sum'],
+        'rating_histogram': [f'rating_{star}_count' for star in range(1, 6)],
+    }
+
     class Meta:
         model = Product
         fields = '__all__'
 
     def _add_prefix(self, path: str | None) -> str | None:
-        if not path:
-            return path
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = getattr(settings, 'IMAGE_URL', '') or ''
-        return base.rstrip('/') + '/' + path.lstrip('/')
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
 
     def get_image_url(self, product: Product):
         return self._add_prefix(product.thumbnail)
 
+    def get_image_variants(self, product: Product):
+        return image_variants.variant_urls(product.thumbnail)
+
+    def get_gallery_variants(self, product: Product):
+        try:
+            import json
+            imgs = json.loads(product.gallery or '[]')
+        except ValueError:
+            return []
+        if not isinstance(imgs, list):
+            return []
+        return [image_variants.variant_urls(i) if isinstance(i, str) else None for i in imgs]
+
     def to_representation(self, instance: Product):
         data = super().to_representation(instance)
         # 覆盖原 thumbnail 字段为带前缀完整 URL
@@ -42,6 +66,48 @@ class ProductSerializer(serializers.ModelSerializer):
                     data['gallery'] = [self._add_prefix(i) for i in imgs]
             except Exception:
                 pass  # 原样返回
+        return self.project(data)
+
+
+class ProductCardSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    """
+    商品卡片序列化器：标签列表、搜索结果等列表页使用，仅包含卡片所需字段，
+    不携带 description / SEO / 成本价 / 图集等大字段
+    """
+    store_name = serializers.CharField(source='store.store_name', read_only=True, default=None)
+    rating_avg = serializers.FloatField(read_only=True)
+    thumbnail_variants = serializers.SerializerMethodField()
+
+    # 查询时只取这些列（配合 select_related('store')）
+    QUERY_COLUMNS = (
+        'id', 'name', 'price', 'original_price', 'thumbnail', 'sales_count', 'view_count',
+        'review_count', 'rating_sum', 'store', 'store__store_name',
+    )
+    SPARSE_DEPENDS = {
+        'store_id': ['store'],
+        'store_name': ['store', 'store__store_name'],
+        'rating_avg': ['review_count', 'rating_sum'],
+        'thumbnail_variants': ['thumbnail'],
+    }
+
+    class Meta:
+        model = Product
+        fields = [
+            'id', 'name', 'price', 'original_price', 'thumbnail', 'thumbnail_variants', 'sales_count',
+            'view_count', 'review_count', 'rating_avg', 'store_id', 'store_name',
+        ]
+
+    def _add_prefix(self, path: str | None) -> str | None:
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
+
+    def get_thumbnail_variants(self, product: Product):
+        return image_variants.variant_urls(product.thumbnail)
+
+    def to_representation(self, instance: Product):
+        data = super().to_representation(instance)
+        if 'thumbnail' in data:
+            data['thumbnail'] = self._add_prefix(data['thumbnail'])
         return data
 
 
@@ -0,0 +1,156 @@
+"""
+Product 模块信号
+
+- 分类变更（保存/删除）时使分类树缓存失效，并增量维护分类闭包表
+- 商品保存时增量更新搜索倒排索引（仅当索引字段可能变化时）
+- 商品保存/删除、标签变更时使详情缓存失效
+- 标签增删商品、商品收录条件/排序变化、商品删除时使对应标签的物化列表失效
+- 分类/标签/商品变更时刷新联想词（商品保存走增量，其余全量）
+- 商品保存/删除时广播搜索结果缓存失效
+"""
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.product import category_cache, category_closure, detail_cache, search_cache, search_index, suggest, tag_listing
+from apps.product.models import Category, Product, ProductTag
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def invalidate_category_tree(sender, **kwargs):
+    # 提交后再递增版本，避免其它进程在提交前按旧数据重建并缓存到新版本下
+    transaction.on_commit(category_cache.invalidate)
+    transaction.on_commit(suggest.invalidate)
+
+
+@receiver(pre_save, sender=Category)
+def remember_category_parent(sender, instance: Category, update_fields=None, raw=False, **kwargs):
+    # 记下保存前的 parent_id，post_save 据此判断是否需要移动子树
+    if raw or instance._state.adding or (update_fields is not None and 'parent_id' not in update_fields):
+        return
+    instance._closure_parent_id = Category.objects.filter(pk=instance.pk).values_list('parent_id', flat=True).first()
+
+
+@receiver(post_save, sender=Category)
+def maintain_category_closure(sender, instance: Category, created=False, raw=False, **kwargs):
+    if raw:
+        return
+    if created:
+        category_closure.add(instance.id, instance.parent_id)
+        return
+    old_parent_id = instance.__dict__.pop('_closure_parent_id', instance.parent_id)
+    if old_parent_id != instance.parent_id:
+        category_closure.move(instance.id, instance.parent_id)
+
+
+@receiver(post_delete, sender=Category)
+def detach_category_children(sender, instance: Category, **kwargs):
+    # 自身的闭包行已随外键级联删除；直接子分类脱离为独立的根
+    for child_id in Category.objects.filter(parent_id=instance.id).values_list('id', flat=True):
+        category_closure.move(child_id, 0)
+
+
+@receiver(post_save, sender=ProductTag)
+@receiver(post_delete, sender=ProductTag)
+@receiver(post_delete, sender=Product)
+def rebuild_suggestions(sender, **kwargs):
+    transaction.on_commit(suggest.invalidate)
+
+
+@receiver(post_save, sender=Product)
+def refresh_product_suggestions(sender, instance: Product, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not (set(update_fields) & suggest.SUGGEST_FIELDS):
+        return
+    # 按 id 增量替换：update_fields 未包含 update_time 时该列不会更新，不能依赖时间水位
+    product_id = instance.id
+    transaction.on_commit(lambda: suggest.mark_products_changed([product_id]))
+
+
+@receiver(post_save, sender=Product)
+def reindex_product(sender, instance: Product, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    # 仅更新库存/计数等非索引字段时跳过
+    if update_fields is not None and not (set(update_fields) & search_index.INDEXED_FIELDS):
+        return
+    search_index.index_product(instance)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_product_detail(sender, instance: Product, **kwargs):
+    # 提交后再失效，避免其它请求在提交前回源，把旧详情连同有效 ETag 写回缓存
+    product_id = instance.id
+    transaction.on_commit(lambda: detail_cache.invalidate(product_id))
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def invalidate_product_detail_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if not reverse:
+        # product.tags.add/remove/clear
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            product_id = instance.id
+            transaction.on_commit(lambda: detail_cache.invalidate(product_id))
+        return
+    # tag.products.add/remove/clear：clear 时 pk_set 为空，需在清空前取出关联商品
+    if action == 'pre_clear':
+        product_ids = list(instance.products.values_list('id', flat=True))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        product_ids = list(pk_set)
+    else:
+        return
+    transaction.on_commit(lambda: detail_cache.invalidate_many(product_ids))
+
+
+def _invalidate_tag_listings_on_commit(tag_ids) -> None:
+    # 提交后再丢弃物化列表，避免其它请求在提交前按旧数据重建并缓存
+    if tag_ids:
+        transaction.on_commit(lambda: tag_listing.invalidate_many(tag_ids))
+
+
+@receiver(post_save, sender=Product)
+def invalidate_tag_listing(sender, instance: Product, created=False, update_fields=None, raw=False, **kwargs):
+    # 新建商品尚无标签，加标签时由 m2m_changed 处理
+    if raw or created:
+        return
+    if update_fields is not None and not (set(update_fields) & tag_listing.LISTING_FIELDS):
+        return
+    _invalidate_tag_listings_on_commit(tag_listing.tag_ids_for_product(instance.id))
+
+
+@receiver(pre_delete, sender=Product)
+def invalidate_tag_listing_on_delete(sender, instance: Product, **kwargs):
+    # 级联删除关联行不会触发 m2m_changed，需在删除前取出关联标签
+    _invalidate_tag_listings_on_commit(tag_listing.tag_ids_for_product(instance.id))
+
+
+@receiver(post_delete, sender=ProductTag)
+def drop_tag_listing(sender, instance: ProductTag, **kwargs):
+    _invalidate_tag_listings_on_commit([instance.id])
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def invalidate_tag_listing_on_tags(sender, instance, action, reverse, pk_set, **kwargs):
+    if reverse:
+        # tag.products.*：只影响该标签
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            _invalidate_tag_listings_on_commit([instance.id])
+        return
+    # product.tags.*：clear 时 pk_set 为空，需在清空前取出原有标签
+    if action == 'pre_clear':
+        _invalidate_tag_listings_on_commit(tag_listing.tag_ids_for_product(instance.id))
+    elif action in ('post_add', 'post_remove') and pk_set:
+        _invalidate_tag_listings_on_commit(list(pk_set))
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_search_results(sender, instance: Product, raw=False, **kwargs):
+    if raw:
+        return
+    tokens = list(search_index.product_token_weights(instance))
+    # 提交后再广播，避免其它进程在提交前重算并缓存旧数据
+    transaction.on_commit(lambda: search_cache.publish([instance.id], tokens))
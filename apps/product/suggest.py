@@ -0,0 +1,288 @@
+"""
+搜索框联想词（前缀补全）
+
+- 进程内维护一个按键排序的数组 [(key, kind, ref_id), ...]，查询时 bisect 定位前缀起点，
+  顺序扫描相邻的命中项，按权重取前 N 条；全程不访问数据库
+- 命中超过 MAX_SCAN 条的前缀（通常是一两个字的短前缀）在构建/增量替换快照时预先算好前 TOP_K 条，
+  查询直接读取，不再只扫描按键排序靠前的一段
+- 词条来源：商品名（权重=销量）、标签名与分类名（权重=其下商品销量之和）；
+  名称整体以及其中每个空白分隔片段起始的后缀都会建键，输入 "mate" 也能联想到 "华为手机 Mate60"
+- 刷新方式与分类树缓存一致，版本号存放在共享缓存中（均在事务提交后递增）：
+  - 分类/标签变更、商品物理删除：递增全量版本号，各进程下次读取时全量重建
+  - 商品保存：递增增量版本号并按该序号记下变动的商品 id，各进程按序号拉取这些 id 并就地替换其词条；
+    不依赖 update_time（save(update_fields=[...]) 未包含该列时不会更新）。记录缺失或落后过多时改为全量重建
+  - 销量经计数缓冲批量刷库，不触发刷新，由 REBUILD_INTERVAL 定期全量重建兜底
+- 重建/增量都在后台线程执行，期间请求继续读旧快照，不阻塞在全表扫描上；
+  只有进程内尚无快照（冷启动）时才在请求线程同步构建
+"""
+import bisect
+import heapq
+import logging
+import threading
+import time
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Sum
+
+from apps.product.models import Category, Product, ProductTag
+from apps.product.tag_listing import LISTED_STATUSES
+
+logger = logging.getLogger(__name__)
+
+VERSION_KEY = 'product:suggest:version'
+DELTA_VERSION_KEY = 'product:suggest:delta_version'
+CHANGE_KEY_PREFIX = 'product:suggest:change:'
+# 商品上影响词条的字段（sales_count 除外，见模块说明）
+SUGGEST_FIELDS = frozenset({'name', 'status', 'is_deleted'})
+REBUILD_INTERVAL = 600
+# 单次查询最多扫描的前缀命中数，超过该数的前缀改用预计算的 TOP_K
+MAX_SCAN = 2000
+# 预计算的每个前缀词条数，不小于接口的 limit 上限
+TOP_K = 20
+MAX_KEY_LEN = 64
+# 变动记录保留时长；快照超过 REBUILD_INTERVAL 本就全量重建，更早的记录用不到
+CHANGE_TIMEOUT = REBUILD_INTERVAL
+# 落后超过该条数时直接全量重建，不再逐条拉取
+MAX_LAG = 200
+
+KIND_PRODUCT = 'product'
+KIND_CATEGORY = 'category'
+KIND_TAG = 'tag'
+
+Ref = Tuple[str, int]
+
+
+@dataclass
+class _Snapshot:
+    version: int | None = None
+    delta_version: int | None = None
+    built_at: float = 0.0
+    keys: List[Tuple[str, str, int]] = field(default_factory=list)
+    # (kind, id) -> (展示文本, 权重)
+    entries: Dict[Ref, Tuple[str, int]] = field(default_factory=dict)
+    # 命中超过 MAX_SCAN 的前缀 -> 按权重降序的前 TOP_K 个词条
+    tops: Dict[str, List[Ref]] = field(default_factory=dict)
+
+
+_lock = threading.Lock()
+_snapshot = _Snapshot()
+_refresher: Optional[threading.Thread] = None
+
+
+def _normalize(text: str | None) -> str:
+    return ' '.join(unicodedata.normalize('NFKC', text or '').lower().split())
+
+
+def _keys_for(text: str) -> List[str]:
+    """名称整体及每个空白分隔片段起始的后缀。"""
+    words = _normalize(text).split(' ')
+    return list(dict.fromkeys(' '.join(words[i:])[:MAX_KEY_LEN] for i in range(len(words)) if words[i]))
+
+
+def _add(keys: list, entries: dict, kind: str, ref_id: int, text: str, weight: int) -> None:
+    entries[(kind, ref_id)] = (text, weight)
+    keys.extend((key, kind, ref_id) for key in _keys_for(text))
+
+
+def _ranking(entries: dict):
+    """权重降序，同权重 id 小者优先。"""
+    return lambda ref: (entries[ref][1], -ref[1])
+
+
+def _top_prefixes(keys: list, entries: dict) -> Dict[str, List[Ref]]:
+    """找出命中超过 MAX_SCAN 的前缀并算好前 TOP_K 个词条。
+
+    keys 已排序，同一前缀的命中相邻；逐级加长前缀，只在上一级的热点区间内继续细分。
+    """
+    tops: Dict[str, List[Ref]] = {}
+    ranges = [(0, len(keys))]
+    length = 1
+    while ranges and length <= MAX_KEY_LEN:
+        heavy = []
+        for lo, hi in ranges:
+            i = lo
+            while i < hi:
+                key = keys[i][0]
+                if len(key) < length:
+                    i += 1
+                    continue
+                prefix = key[:length]
+                j = i + 1
+                while j < hi and keys[j][0].startswith(prefix):
+                    j += 1
+                if j - i > MAX_SCAN:
+                    refs = {k[1:] for k in keys[i:j]}
+                    tops[prefix] = heapq.nlargest(TOP_K, refs, key=_ranking(entries))
+                    heavy.append((i, j))
+                i = j
+        ranges = heavy
+        length += 1
+    return tops
+
+
+def _listed_products():
+    return Product.objects.filter(is_deleted=False, status__in=LISTED_STATUSES)
+
+
+def _fresh_version() -> int:
+    return int(time.time() * 1000)
+
+
+def _current(key: str) -> int:
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _fresh_version(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def _bump(key: str) -> None:
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _fresh_version(), timeout=None)
+
+
+def invalidate() -> None:
+    """分类/标签变更或商品删除后调用：所有进程下次读取时全量重建。"""
+    _bump(VERSION_KEY)
+
+
+def mark_products_changed(product_ids: Iterable[int]) -> None:
+    """商品保存（提交）后调用：记下变动的商品 id，所有进程下次读取时增量替换其词条。"""
+    cache.add(DELTA_VERSION_KEY, _fresh_version(), timeout=None)
+    try:
+        seq = cache.incr(DELTA_VERSION_KEY)
+    except ValueError:
+        seq = _fresh_version()
+        cache.set(DELTA_VERSION_KEY, seq, timeout=None)
+    cache.set(f'{CHANGE_KEY_PREFIX}{seq}', list(product_ids), CHANGE_TIMEOUT)
+
+
+def _build(version: int, delta_version: int) -> _Snapshot:
+    keys: list = []
+    entries: dict = {}
+    for pk, name, sales in _listed_products().values_list('id', 'name', 'sales_count'):
+        _add(keys, entries, KIND_PRODUCT, pk, name, sales)
+    category_sales = dict(
+        _listed_products().values('category_id').annotate(total=Sum('sales_count')).values_list('category_id', 'total')
+    )
+    for pk, name in Category.objects.filter(is_deleted=False).values_list('id', 'name'):
+        _add(keys, entries, KIND_CATEGORY, pk, name, category_sales.get(pk) or 0)
+    tag_sales = dict(
+        _listed_products().values('tags__id').annotate(total=Sum('sales_count')).values_list('tags__id', 'total')
+    )
+    for pk, name in ProductTag.objects.filter(is_active=True).values_list('id', 'name'):
+        _add(keys, entries, KIND_TAG, pk, name, tag_sales.get(pk) or 0)
+    keys.sort()
+    return _Snapshot(version, delta_version, time.monotonic(), keys, entries, _top_prefixes(keys, entries))
+
+
+def _changed_ids(since: Optional[int], until: int) -> Optional[Set[int]]:
+    """序号 (since, until] 内变动的商品 id；记录缺失或落后过多时返回 None（需全量重建）。"""
+    if since is None or until < since or until - since > MAX_LAG:
+        return None
+    keys = [f'{CHANGE_KEY_PREFIX}{seq}' for seq in range(since + 1, until + 1)]
+    found = cache.get_many(keys)
+    if len(found) != len(keys):
+        return None
+    return {pk for ids in found.values() for pk in ids}
+
+
+def _patch(snapshot: _Snapshot, delta_version: int, ids: Set[int]) -> _Snapshot:
+    """按 id 重新读取变动商品，替换其词条；写时复制，读者始终看到完整快照。"""
+    changed = list(
+        Product.objects.filter(id__in=ids)
+        .values_list('id', 'name', 'sales_count', 'status', 'is_deleted')
+    )
+    # 已物理删除的商品查不到，同样要移除其词条
+    keys = [k for k in snapshot.keys if not (k[1] == KIND_PRODUCT and k[2] in ids)]
+    entries = {ref: v for ref, v in snapshot.entries.items() if not (ref[0] == KIND_PRODUCT and ref[1] in ids)}
+    for pk, name, sales, status, is_deleted in changed:
+        if not is_deleted and status in LISTED_STATUSES:
+            _add(keys, entries, KIND_PRODUCT, pk, name, sales)
+    keys.sort()
+    return _Snapshot(snapshot.version, delta_version, snapshot.built_at, keys, entries, _top_prefixes(keys, entries))
+
+
+def _versions() -> Tuple[int, int]:
+    # 一次往返取回两个版本号
+    versions = cache.get_many([VERSION_KEY, DELTA_VERSION_KEY])
+    return versions.get(VERSION_KEY) or _current(VERSION_KEY), versions.get(DELTA_VERSION_KEY) or _current(DELTA_VERSION_KEY)
+
+
+def _expired(snapshot: _Snapshot, version: int) -> bool:
+    return snapshot.version != version or time.monotonic() - snapshot.built_at >= REBUILD_INTERVAL
+
+
+def _refresh(snapshot: _Snapshot) -> _Snapshot:
+    version, delta_version = _versions()
+    if not _expired(snapshot, version):
+        if snapshot.delta_version == delta_version:
+            return snapshot
+        ids = _changed_ids(snapshot.delta_version, delta_version)
+        if ids is not None:
+            return _patch(snapshot, delta_version, ids)
+    return _build(version, delta_version)
+
+
+def _run_refresh() -> None:
+    global _snapshot
+    try:
+        _snapshot = _refresh(_snapshot)
+    except Exception:
+        logger.exception('联想词快照刷新失败，继续使用旧快照')
+    finally:
+        # 后台线程持有独立的数据库连接，用完即关
+        connection.close()
+
+
+def _start_refresh() -> None:
+    """后台刷新快照；已有刷新在进行时不重复启动。"""
+    global _refresher
+    with _lock:
+        if _refresher is not None and _refresher.is_alive():
+            return
+        _refresher = threading.Thread(target=_run_refresh, name='product-suggest-refresh', daemon=True)
+        _refresher.start()
+
+
+def _get_snapshot() -> _Snapshot:
+    global _snapshot
+    version, delta_version = _versions()
+    snapshot = _snapshot
+    if not _expired(snapshot, version) and snapshot.delta_version == delta_version:
+        return snapshot
+    if snapshot.version is None:
+        # 冷启动：本进程尚无快照可读，只能同步构建
+        with _lock:
+            if _snapshot.version is None:
+                _snapshot = _build(version, delta_version)
+            return _snapshot
+    _start_refresh()
+    return snapshot
+
+
+def suggest(q: str, limit: int = 10) -> List[dict]:
+    """返回以 q 为前缀的联想词，按权重降序。"""
+    prefix = _normalize(q)
+    if not prefix:
+        return []
+    snapshot = _get_snapshot()
+    top = snapshot.tops.get(prefix)
+    if top is not None and limit <= TOP_K:
+        return [{'text': snapshot.entries[ref][0], 'type': ref[0], 'id': ref[1]} for ref in top[:limit]]
+    keys = snapshot.keys
+    best: Dict[Ref, int] = {}
+    i = bisect.bisect_left(keys, (prefix,))
+    end = min(len(keys), i + MAX_SCAN)
+    while i < end and keys[i][0].startswith(prefix):
+        ref = keys[i][1:]
+        best[ref] = snapshot.entries[ref][1]
+        i += 1
+    top = heapq.nlargest(limit, best, key=_ranking(snapshot.entries))
+    return [{'text': snapshot.entries[ref][0], 'type': ref[0], 'id': ref[1]} for ref in top]
@@ -0,0 +1,76 @@
+"""
+标签商品列表物化缓存
+
+- 每个标签在共享缓存中保存一份已排好序的商品 id 列表：
+  sort_order 降序 → sales_count 降序 → create_time 降序 → id 降序，
+  只收录未删除且处于可展示状态（LISTED_STATUSES）的商品
+- 翻页直接对 id 列表切片，再按 id 批量取本页商品，不再走 M2M 联表与逐页 COUNT；
+  联表查询只在重建某个标签的列表时执行一次
+- 失效按标签粒度进行（见 signals）：标签增删商品、商品状态/删除标记/排序权重变化、
+  商品删除时只丢弃受影响标签的列表，下次访问时重建
+- 销量随计数缓冲批量刷库不断变化，不逐次触发重建，由 PRODUCT_TAG_LISTING_TIMEOUT 兜底刷新
+"""
+from typing import Iterable, List
+
+from django.conf import settings
+from django.core.cache import cache
+
+from apps.product.models import Product
+
+KEY_PREFIX = 'product:tag_listing:'
+LISTED_STATUSES = ('on_sale', 'out_of_stock')
+ORDERING = ('-sort_order', '-sales_count', '-create_time', '-id')
+# 商品上影响列表收录与排序的字段（sales_count 除外，见模块说明）
+LISTING_FIELDS = frozenset({'status', 'is_deleted', 'sort_order'})
+
+
+def _key(tag_id: int) -> str:
+    return f'{KEY_PREFIX}{tag_id}'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'PRODUCT_TAG_LISTING_TIMEOUT', 300)
+
+
+def build(tag_id: int) -> List[int]:
+    """联表查询重建某标签的有序 id 列表并写入缓存。"""
+    ids = list(
+        Product.objects
+        .filter(tags__id=tag_id, is_deleted=False, status__in=LISTED_STATUSES)
+        .order_by(*ORDERING)
+        .values_list('id', flat=True)
+    )
+    cache.set(_key(tag_id), ids, _timeout())
+    return ids
+
+
+def get_ids(tag_id: int) -> List[int]:
+    ids = cache.get(_key(tag_id))
+    if ids is None:
+        ids = build(tag_id)
+    return ids
+
+
+def invalidate(tag_id: int) -> None:
+    cache.delete(_key(tag_id))
+
+
+def invalidate_many(tag_ids: Iterable[int]) -> None:
+    keys = [_key(tag_id) for tag_id in set(tag_ids)]
+    if keys:
+        cache.delete_many(keys)
+
+
+def tag_ids_for_product(product_id: int) -> List[int]:
+    return list(Product.tags.through.objects.filter(product_id=product_id).values_list('producttag_id', flat=True))
+
+
+def invalidate_for_product(product_id: int) -> None:
+    """商品自身的收录条件或排序变化时，丢弃其所属各标签的列表。"""
+    invalidate_many(tag_ids_for_product(product_id))
+
+
+def fetch_page(ids: List[int], queryset) -> List[Product]:
+    """按 id 列表的顺序取出本页商品；列表过期期间已不存在的商品直接跳过。"""
+    rows = queryset.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows]
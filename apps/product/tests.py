@@ -1,3 +1,282 @@
-from django.test import TestCase
+import importlib
+from unittest import mock
 
-# Create your tests here.
+from django.apps import apps
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.product import category_closure, detail_cache, search_facets, search_index, suggest
+from apps.product.models import Category, CategoryClosure, Product, ProductSearchToken, ProductTag
+from apps.store.models import Store
+from apps.user.models import User
+
+
+class ProductTestMixin:
+    """建店铺与两级分类（电子 > 手机），make_product() 建商品。
+
+    缓存失效与索引维护多在 on_commit 中执行，因此用 TransactionTestCase。
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='u1', phone='13800000000', password='x')
+        self.store = Store.objects.create(store_name='s1', owner=self.user, status='active')
+        self.root = Category.objects.create(name='电子', parent_id=0)
+        self.category = Category.objects.create(name='手机', parent_id=self.root.id)
+        self.client = APIClient()
+
+    def make_product(self, name='商品', category=None, **fields):
+        fields.setdefault('price', '10.00')
+        fields.setdefault('stock', 10)
+        fields.setdefault('status', 'on_sale')
+        fields.setdefault('store', self.store)
+        return Product.objects.create(name=name, category=category or self.category, **fields)
+
+
+class CategoryListingQueryTests(ProductTestMixin, TransactionTestCase):
+    """分类商品列表：排序键随本页一起取出，计算 next_cursor 不再回表。"""
+
+    def _count_queries(self, **params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/product/category/{self.root.id}/', {'page_size': 2, **params})
+        self.assertTrue(response.json()['data']['has_next'])
+        return len(queries)
+
+    def test_sort_keys_are_loaded_with_the_page(self):
+        for i in range(3):
+            self.make_product(f'p{i}')
+        # price 在卡片列中，以其查询条数为基准
+        expected = self._count_queries(sort='price_asc')
+        for sort in ('newest', 'price_desc', 'sales'):
+            self.assertEqual(self._count_queries(sort=sort), expected, sort)
+            self.assertEqual(self._count_queries(sort=sort, fields='id,name'), expected, sort)
+
+
+class SearchTokenizerTests(TransactionTestCase):
+    """搜索分词：文档侧单字 + bigram + 英文前缀，查询侧 bigram + 整词。"""
+
+    def test_document_tokens(self):
+        tokens = search_index.document_tokens('华为Mate60 手机')
+        self.assertTrue({'华', '为', '华为', '手', '机', '手机', 'm', 'ma', 'mate60'} <= tokens)
+        # 不同连续段之间不组 bigram
+        self.assertNotIn('为手', tokens)
+
+    def test_document_tokens_normalize(self):
+        self.assertIn('mate', search_index.document_tokens('ＭＡＴＥ'))
+        self.assertEqual(search_index.document_tokens(None), set())
+
+    def test_query_tokens(self):
+        self.assertEqual(search_index.query_tokens('华为手机'), ['华为', '为手', '手机'])
+        self.assertEqual(search_index.query_tokens('手'), ['手'])
+        self.assertEqual(search_index.query_tokens('Mate mate 60'), ['mate', '60'])
+        self.assertEqual(search_index.query_tokens(' ,.! '), [])
+
+
+class SearchIndexTests(ProductTestMixin, TransactionTestCase):
+    """倒排索引：保存时增量维护，match_queryset 要求命中全部词元并按权重计分。"""
+
+    def setUp(self):
+        super().setUp()
+        self.phone = self.make_product('华为 Mate60 手机', subtitle='旗舰')
+        self.case = self.make_product('手机壳', description='适配 mate60 手机')
+
+    def match(self, q):
+        return {row['product_id']: row['score'] for row in search_index.match_queryset(q)}
+
+    def test_match_requires_all_tokens(self):
+        self.assertEqual(set(self.match('手机')), {self.phone.id, self.case.id})
+        self.assertEqual(set(self.match('华为手机')), set())
+        self.assertEqual(set(self.match('华为 手机')), {self.phone.id})
+        self.assertEqual(self.match('xyz'), {})
+        self.assertIsNone(search_index.match_queryset('  '))
+
+    def test_english_prefix(self):
+        self.assertEqual(set(self.match('mat')), {self.phone.id, self.case.id})
+
+    def test_field_weights(self):
+        scores = self.match('mate60')
+        # 名称命中（权重 3）高于详情命中（权重 1）
+        self.assertGreater(scores[self.phone.id], scores[self.case.id])
+
+    def test_reindex_on_save(self):
+        self.phone.name = '小米 平板'
+        self.phone.save()
+        self.assertEqual(set(self.match('平板')), {self.phone.id})
+        self.assertNotIn(self.phone.id, self.match('华为'))
+
+    def test_migration_backfills_existing_products(self):
+        ProductSearchToken.objects.all().delete()
+        migration = importlib.import_module('apps.product.migrations.0004_product_search_token')
+        migration.backfill_search_tokens(apps, None)
+        self.assertEqual(set(self.match('手机')), {self.phone.id, self.case.id})
+
+
+class DetailCacheTests(ProductTestMixin, TransactionTestCase):
+    """商品详情缓存：键含 update_time，命中与 304 不访问数据库。"""
+
+    def setUp(self):
+        super().setUp()
+        self.product = self.make_product('手机')
+        self.url = f'/product/query/{self.product.id}/'
+
+    def get(self, **headers):
+        return self.client.get(self.url, **headers)
+
+    def test_hit_and_not_modified_skip_database(self):
+        etag = self.get()['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.get().json()['data']['name'], '手机')
+            self.assertEqual(self.get(HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_save_changes_payload(self):
+        etag = self.get()['ETag']
+        self.product.name = '平板'
+        self.product.save()
+        response = self.get(HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['name'], '平板')
+
+    def test_update_without_invalidate_is_picked_up_when_stamp_expires(self):
+        self.get()
+        Product.objects.filter(id=self.product.id).update(stock=3, update_time=timezone.now())
+        # 戳过期后按 update_time 复核
+        cache.delete(detail_cache._stamp_key(self.product.id))
+        self.assertEqual(self.get().json()['data']['stock'], 3)
+
+    def test_invalidate_without_update_time_change(self):
+        self.get()
+        tag = ProductTag.objects.create(name='热卖', slug='hot')
+        self.product.tags.add(tag)
+        self.assertEqual(self.get().json()['data']['tags'], [tag.id])
+
+    def test_batch_reads_cached_entries(self):
+        self.get()
+        with self.assertNumQueries(0):
+            response = self.client.get('/product/batch/', {'ids': str(self.product.id)})
+        self.assertEqual(response.json()['data']['results'][0]['name'], '手机')
+
+
+class SearchFacetTests(ProductTestMixin, TransactionTestCase):
+    """搜索分面：缓存分组计数，分组过多时逐维度聚合。"""
+
+    def setUp(self):
+        super().setUp()
+        self.other_store = Store.objects.create(store_name='s2', owner=self.user, status='active')
+        self.other_category = Category.objects.create(name='平板', parent_id=self.root.id)
+        self.make_product('手机壳', price='20.00')
+        self.make_product('手机支架', price='20.00')
+        self.make_product('手机膜', price='120.00', store=self.other_store)
+        self.make_product('手机平板', category=self.other_category, price='6000.00')
+        self.queryset = Product.objects.filter(is_deleted=False)
+
+    def compute(self, **filters):
+        return search_facets.compute('手机', self.queryset, search_facets.FacetFilters(**filters))
+
+    def test_counts_apply_other_dimensions_only(self):
+        facets = self.compute(store_ids=frozenset([self.store.id]))
+        self.assertEqual(facets['category'], [{'id': self.category.id, 'count': 2}, {'id': self.other_category.id, 'count': 1}])
+        self.assertEqual(facets['store'], [
+            {'id': self.store.id, 'name': 's1', 'count': 3},
+            {'id': self.other_store.id, 'name': 's2', 'count': 1},
+        ])
+        self.assertEqual(facets['price_band'], [{'key': '0-50', 'count': 2}, {'key': '5000+', 'count': 1}])
+
+    def test_caches_group_counts_only(self):
+        self.compute()
+        groups = cache.get(search_facets._key('手机'))
+        self.assertCountEqual(groups, [
+            (self.category.id, self.store.id, '0-50', 2),
+            (self.category.id, self.other_store.id, '100-500', 1),
+            (self.other_category.id, self.store.id, '5000+', 1),
+        ])
+
+    def test_too_many_groups_fall_back_to_sql(self):
+        expected = self.compute(price_bands=frozenset(['0-50']))
+        cache.clear()
+        with override_settings(PRODUCT_SEARCH_FACET_MAX_GROUPS=2):
+            self.assertEqual(self.compute(price_bands=frozenset(['0-50'])), expected)
+        self.assertIsNone(cache.get(search_facets._key('手机')))
+
+
+class SuggestTests(ProductTestMixin, TransactionTestCase):
+    """联想词：按权重取前缀命中，热点前缀读预计算的 TOP_K。"""
+
+    def setUp(self):
+        super().setUp()
+        suggest._snapshot = suggest._Snapshot()
+
+    def texts(self, q, limit=10):
+        return [item['text'] for item in suggest.suggest(q, limit)]
+
+    def test_prefix_and_word_suffix(self):
+        self.make_product('华为手机 Mate60', sales_count=5)
+        self.make_product('小米平板', sales_count=9)
+        self.assertEqual(self.texts('mate'), ['华为手机 Mate60'])
+        self.assertEqual(self.texts('小米'), ['小米平板'])
+        # 分类权重为其下商品销量之和
+        self.assertEqual(self.client.get('/product/suggest/', {'q': '手'}).json()['data'][0]['text'], '手机')
+
+    @mock.patch.object(suggest, 'MAX_SCAN', 3)
+    def test_heaviest_match_after_scan_window(self):
+        for i in range(5):
+            self.make_product(f'a{i}', sales_count=i)
+        heaviest = self.make_product('az', sales_count=100)
+        self.assertEqual(self.texts('a', 2), ['az', 'a4'])
+        self.assertIn('a', suggest._snapshot.tops)
+
+        # 增量替换快照时同样重算
+        heaviest.name = 'b'
+        heaviest.save()
+        self.make_product('ay', sales_count=50)
+        suggest._snapshot = suggest._refresh(suggest._snapshot)
+        self.assertEqual(self.texts('a', 2), ['ay', 'a4'])
+
+
+class CategoryClosureListingTests(ProductTestMixin, TransactionTestCase):
+    """分类商品列表经闭包表取后代分类：含孙分类，停用节点的整棵子树不计入，移动/删除分类后闭包随之维护。"""
+
+    def setUp(self):
+        super().setUp()
+        # 电子 > 手机 > 5G手机
+        self.leaf = Category.objects.create(name='5G手机', parent_id=self.category.id)
+        self.phone = self.make_product('p-phone')
+        self.leaf_phone = self.make_product('p-5g', category=self.leaf)
+
+    def names(self, category):
+        response = self.client.get(f'/product/category/{category.id}/')
+        return sorted(p['name'] for p in response.json()['data']['results'])
+
+    def closure(self):
+        return set(CategoryClosure.objects.values_list('ancestor_id', 'descendant_id', 'depth'))
+
+    def test_includes_grandchildren(self):
+        self.assertEqual(self.names(self.root), ['p-5g', 'p-phone'])
+        self.assertIn((self.root.id, self.leaf.id, 2), self.closure())
+
+    def test_disabled_middle_category_hides_subtree(self):
+        Category.objects.filter(id=self.category.id).update(is_active=False)
+        self.assertEqual(self.names(self.root), [])
+
+    def test_move_subtree(self):
+        other = Category.objects.create(name='数码', parent_id=0)
+        self.category.parent_id = other.id
+        self.category.save()
+        self.assertEqual(self.names(self.root), [])
+        self.assertEqual(self.names(other), ['p-5g', 'p-phone'])
+        self.assertIn((other.id, self.leaf.id, 2), self.closure())
+
+    def test_delete_detaches_children(self):
+        Product.objects.filter(category=self.category).delete()
+        self.category.delete()
+        self.assertEqual(self.names(self.root), [])
+        self.assertEqual(self.names(self.leaf), ['p-5g'])
+
+    def test_rebuild_matches_incremental(self):
+        expected = self.closure()
+        CategoryClosure.objects.all().delete()
+        category_closure.rebuild()
+        self.assertEqual(self.closure(), expected)
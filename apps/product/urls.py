@@ -1,12 +1,18 @@
 from django.urls import path
-from .views import ProductMainMenuView, ProductSubMenuView, ProductSubSubMenuView, ProductTagAPIView, ProductQueryAPIView, ProductSearchAPIView
+from .views import ProductMainMenuView, ProductSubMenuView, ProductSubSubMenuView, ProductMenuTreeView, ProductCategoryListAPIView, ProductTagAPIView, ProductQueryAPIView, ProductBatchAPIView, ProductSearchAPIView, ProductSearchCacheStatsAPIView, ProductSuggestAPIView, ProductAlsoBoughtAPIView
 
 
 urlpatterns = [
     path("main_menu/", ProductMainMenuView.as_view(), name="product_main_menu"),
     path("sub_menu/", ProductSubMenuView.as_view(), name="product_sub_menu"),
     path("sub_sub_menu/", ProductSubSubMenuView.as_view(), name="product_sub_sub_menu"),
+    path("menu_tree/", ProductMenuTreeView.as_view(), name="product_menu_tree"),
+    path("category/<int:category_id>/", ProductCategoryListAPIView.as_view(), name="product_category_list"),
     path("tag/<int:product_tag_id>/<int:page>/", ProductTagAPIView.as_view(), name="product_tag"),
     path("query/<int:id>/", ProductQueryAPIView.as_view(), name="product_query"),
+    path("<int:id>/also_bought/", ProductAlsoBoughtAPIView.as_view(), name="product_also_bought"),
+    path("batch/", ProductBatchAPIView.as_view(), name="product_batch"),
     path("search/", ProductSearchAPIView.as_view(), name="product_search"),
+    path("search/cache_stats/", ProductSearchCacheStatsAPIView.as_view(), name="product_search_cache_stats"),
+    path("suggest/", ProductSuggestAPIView.as_view(), name="product_suggest"),
 ]
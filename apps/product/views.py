@@ -2,20 +2,27 @@
 Product 模块视图
 
 - 提供分类菜单与商品详情/标签列表接口
+- 分类菜单统一读取进程内分类树缓存（见 category_cache），不再逐次查库
 - 统一使用 CustomResponse 返回结构
 """
 
+import math
 from typing import Any
 from django.core.paginator import Paginator
 from rest_framework.views import APIView
-from apps.product.models import Category
-from apps.product.models import Product
-from apps.product.serializers import ProductSerializer
+from apps.product import also_bought, category_cache, category_closure, counters, detail_cache, search_cache, search_facets, search_index, suggest, tag_listing
+from apps.product.models import Category, Product
+from apps.product.serializers import ProductCardSerializer, ProductSerializer
+from utils.pagination import CursorError, decode_cursor, encode_cursor, is_cursor_request, paginate_by_cursor, wants_total
+from utils import image_variants
 from utils.renderer import CustomResponse
+from utils.serializers import requested_fields, sparse_queryset
 from rest_framework.generics import ListAPIView
 from utils.error_codes import Codes
-from django.db.models import Count, Q
+from django.db.models import OuterRef, Subquery
 from django.conf import settings
+from django.http import Http404, HttpResponseNotModified
+from django.utils.http import parse_etags
 
 
 class ProductMainMenuView(APIView):
@@ -24,8 +31,7 @@ class ProductMainMenuView(APIView):
     @staticmethod
     def get(request):
         # 顶级分类（parent_id=0）
-        main_menus = Category.objects.filter(parent_id=0)
-        result_list = [m.to_menu_item() for m in main_menus]
+        result_list = category_cache.get_children(0)
         return CustomResponse(code=Codes.CATEGORY_MAIN_MENU_OK, msg="获取主菜单成功", data=result_list, status=200)
 
 
@@ -42,8 +48,7 @@ class ProductSubMenuView(APIView):
         except (TypeError, ValueError):
             return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="参数格式错误: main_menu_id 应为整数", errors={"main_menu_id": "invalid"}, status=400)
 
-        sub_menus = Category.objects.filter(parent_id=pid)
-        result_list = [m.to_menu_item() for m in sub_menus]
+        result_list = category_cache.get_children(pid)
         return CustomResponse(code=Codes.CATEGORY_SUB_MENU_OK, msg="获取子菜单成功", data=result_list, status=200)
 
 
@@ -60,15 +65,93 @@ class ProductSubSubMenuView(APIView):
         except (TypeError, ValueError):
             return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="参数格式错误: sub_menu_id 应为整数", errors={"sub_menu_id": "invalid"}, status=400)
 
-        sub_sub_menus = Category.objects.filter(parent_id=pid)
-        result_list = [m.to_menu_item() for m in sub_sub_menus]
+        result_list = category_cache.get_children(pid)
         return CustomResponse(code=Codes.CATEGORY_SUB_SUB_MENU_OK, msg="获取子子菜单成功", data=result_list, status=200)
 
 
+class ProductMenuTreeView(APIView):
+    """一次性获取完整三级分类树。路由：/product/menu_tree/
+
+    返回：[{id, name, children: [{id, name, children: [{id, name}]}]}]
+    """
+
+    @staticmethod
+    def get(request):
+        tree = category_cache.get_menu_tree()
+        return CustomResponse(code=Codes.CATEGORY_MENU_TREE_OK, msg="获取分类树成功", data=tree, status=200)
+
+
+class ProductCategoryListAPIView(APIView):
+    """分类商品列表（含全部子分类）。路由：/product/category/<category_id>/
+
+    参数：
+      sort: newest（默认，上架时间新->旧）/ price_asc / price_desc / sales（销量降序）
+      cursor: 游标，首页不传或传空；返回 next_cursor
+      page_size: 每页数量（默认20，最大100）
+      with_total: 是否返回总数（1=是，默认不统计）
+      fields: 可选，逗号分隔的卡片字段
+    后代分类经闭包表一次子查询取得（见 category_closure），商品按 keyset 分页，不执行 OFFSET。
+    销量随计数缓冲刷库变化，按 sales 翻页期间个别商品可能前后移位。
+    """
+
+    SORT_ORDERING = {
+        'newest': ['-create_time', '-id'],
+        'price_asc': ['price', 'id'],
+        'price_desc': ['-price', '-id'],
+        'sales': ['-sales_count', '-id'],
+    }
+
+    def get(self, request, category_id: int):
+        sort = request.query_params.get('sort', 'newest')
+        if sort not in self.SORT_ORDERING:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='sort 仅支持 newest/price_asc/price_desc/sales', errors={'sort': 'invalid'}, status=400)
+        try:
+            page_size = int(request.query_params.get('page_size', 20))
+        except ValueError:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='page_size 必须为整数', errors={'page_size': 'invalid'}, status=400)
+        page_size = min(page_size if page_size > 0 else 20, 100)
+        if not Category.objects.filter(id=category_id, is_deleted=False, is_active=True).exists():
+            return CustomResponse(code=Codes.CATEGORY_NOT_FOUND, msg='分类不存在', errors={'category_id': category_id}, status=404)
+
+        fields = requested_fields(request)
+        ordering = self.SORT_ORDERING[sort]
+        # 排序键（如 create_time）须在查询列中，否则取游标值时逐行回表
+        sort_columns = [key.lstrip('-') for key in ordering]
+        queryset = (Product.objects
+                    .filter(is_deleted=False, status__in=tag_listing.LISTED_STATUSES,
+                            category_id__in=category_closure.descendant_ids(category_id))
+                    .select_related('store')
+                    .only(*ProductCardSerializer.QUERY_COLUMNS, *sort_columns))
+        queryset = sparse_queryset(queryset, ProductCardSerializer, fields and [*fields, *sort_columns])
+        try:
+            cursor_page = paginate_by_cursor(queryset, ordering, request.query_params.get('cursor'), page_size)
+        except CursorError as e:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg=str(e), errors={'cursor': 'invalid'}, status=400)
+        results = ProductCardSerializer(cursor_page.items, many=True, fields=fields).data
+        data = {
+            'category_id': category_id,
+            'sort': sort,
+            'page_size': page_size,
+            'total': queryset.count() if wants_total(request) else None,
+            'next_cursor': cursor_page.next_cursor,
+            'has_next': cursor_page.has_next,
+            'current_count': len(results),
+            'results': results,
+        }
+        return CustomResponse(code=Codes.PRODUCT_CATEGORY_LIST_OK, msg='', data=data, status=200)
+
+
 class ProductTagAPIView(ListAPIView):
-    """按标签获取商品列表。路由：/product/tag/<product_tag_id>/<page>/"""
+    """按标签获取商品列表。路由：/product/tag/<product_tag_id>/<page>/
+
+    列表来自按标签物化的有序 id 列表（见 tag_listing），翻页只切片并按 id 取本页商品。
+    可选 ?cursor=（首页为空）启用游标分页，此时忽略路径中的 page，
+    返回 {results, next_cursor, has_next, total}。
+    列表项使用精简卡片序列化器，支持 ?fields= 进一步裁剪字段与查询列。
+    """
 
-    serializer_class = ProductSerializer
+    serializer_class = ProductCardSerializer
+    PAGE_SIZE = 20
 
     def list(self, request, *args: Any, **kwargs: Any):
         try:
@@ -88,18 +171,35 @@ class ProductTagAPIView(ListAPIView):
                 errors={"page": "invalid"},
                 status=400
             )
-        queryset = Product.objects.filter(tags__id=tag_id)
-        paginator = Paginator(queryset, 20)
-        try:
-            page = paginator.get_page(page)
-        except Exception:
-            return CustomResponse(
-                code=Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR,
-                msg="页面超出范围",
-                errors={"page": "out of range"},
-                status=404
-            )
-        page_serialize = self.get_serializer(page.object_list, many=True)
+        fields = requested_fields(request)
+        ids = tag_listing.get_ids(tag_id)
+        queryset = (Product.objects
+                    .filter(is_deleted=False, status__in=tag_listing.LISTED_STATUSES)
+                    .select_related('store')
+                    .only(*ProductCardSerializer.QUERY_COLUMNS))
+        queryset = sparse_queryset(queryset, ProductCardSerializer, fields)
+        if is_cursor_request(request):
+            # 游标即物化列表中的偏移量
+            cursor = request.query_params.get('cursor')
+            try:
+                offset = int(decode_cursor(cursor, 1)[0]) if cursor else 0
+            except (CursorError, TypeError, ValueError):
+                return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="cursor 无效", errors={"cursor": "invalid"}, status=400)
+            offset = max(offset, 0)
+            end = offset + self.PAGE_SIZE
+            next_cursor = encode_cursor([end]) if end < len(ids) else None
+            data = {
+                "results": self.get_serializer(tag_listing.fetch_page(ids[offset:end], queryset), many=True, fields=fields).data,
+                "next_cursor": next_cursor,
+                "has_next": next_cursor is not None,
+                "total": len(ids),
+            }
+            return CustomResponse(code=Codes.PRODUCT_TAG_LIST_OK, msg="", data=data, status=200)
+        # 与 Paginator.get_page 一致：页码超出时返回最后一页
+        num_pages = max(math.ceil(len(ids) / self.PAGE_SIZE), 1)
+        page = min(page, num_pages)
+        page_ids = ids[(page - 1) * self.PAGE_SIZE:page * self.PAGE_SIZE]
+        page_serialize = self.get_serializer(tag_listing.fetch_page(page_ids, queryset), many=True, fields=fields)
         return CustomResponse(
             code=Codes.PRODUCT_TAG_LIST_OK,
             msg="",
@@ -109,7 +209,12 @@ class ProductTagAPIView(ListAPIView):
 
 
 class ProductQueryAPIView(APIView):
-    """查询商品详情。路由：/product/query/<id>/"""
+    """查询商品详情。路由：/product/query/<id>/
+
+    详情 payload 读取共享缓存（见 detail_cache），响应携带 ETag / Last-Modified；
+    客户端携带 If-None-Match 且与缓存一致时直接返回 304，缓存中的 update_time 戳未过期时不访问数据库。
+    每次访问计入浏览量缓冲（见 counters）。支持 ?fields= 裁剪返回字段（ETag 随字段集变化）。
+    """
 
     def get(self, request, id: int):
         try:
@@ -117,13 +222,136 @@ class ProductQueryAPIView(APIView):
         except (TypeError, ValueError):
             return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="参数格式错误: id 应为整数", errors={"id": "invalid"}, status=400)
 
-        try:
-            product_data = Product.objects.get(id=product_id)
-        except Product.DoesNotExist:
+        entry = detail_cache.get_entry(product_id)
+        if entry is None:
             return CustomResponse(code=Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR, msg="商品不存在", errors={"id": product_id}, status=404)
+        # 浏览量先进缓冲，定时批量刷库
+        counters.incr_view(product_id)
+
+        data, etag = detail_cache.project(entry, requested_fields(request))
+        if_none_match = request.headers.get("If-None-Match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in parse_etags(if_none_match)):
+            response = HttpResponseNotModified()
+        else:
+            response = CustomResponse(code=Codes.PRODUCT_DETAIL_OK, msg="获取商品详情成功", data=data, status=200)
+        response["ETag"] = etag
+        if entry["last_modified"]:
+            response["Last-Modified"] = entry["last_modified"]
+        response["Cache-Control"] = "no-cache"
+        return response
+
+
+class ProductBatchAPIView(APIView):
+    """批量获取商品卡片。路由：/product/batch/?ids=1,2,3
+
+    - ids 逗号分隔，去重后保持请求顺序，最多 MAX_IDS 个
+    - 详情缓存已命中的商品直接由缓存构造卡片，其余一次 id__in 查询补齐
+    - 不存在或已删除的商品放入 missing
+    返回：{results: [Product.to_card_dict() + thumbnail_variants...], missing: [id...]}
+    """
+
+    MAX_IDS = 200
+    CARD_FIELDS = ('id', 'name', 'price', 'thumbnail', 'sales_count', 'view_count')
+
+    def get(self, request):
+        raw = request.query_params.get("ids", "")
+        try:
+            ids = [int(x) for x in raw.split(",") if x.strip()]
+        except ValueError:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="ids 应为逗号分隔的整数", errors={"ids": "invalid"}, status=400)
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="缺少参数: ids", errors={"ids": "required"}, status=400)
+        if len(ids) > self.MAX_IDS:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg=f"ids 最多 {self.MAX_IDS} 个", errors={"ids": "too_many"}, status=400)
+
+        cards = {}
+        for pid, entry in detail_cache.get_cached_entries(ids).items():
+            data = entry["data"]
+            if not data.get("is_deleted"):
+                cards[pid] = {f: data.get(f) for f in self.CARD_FIELDS}
+                cards[pid]["thumbnail_variants"] = data.get("image_variants")
+        rest = [pid for pid in ids if pid not in cards]
+        if rest:
+            for p in Product.objects.filter(id__in=rest, is_deleted=False).only(*self.CARD_FIELDS):
+                card = p.to_card_dict()
+                card["thumbnail"] = ProductSerializer().get_image_url(p)
+                card["thumbnail_variants"] = image_variants.variant_urls(p.thumbnail)
+                cards[p.id] = card
 
-        result = ProductSerializer(instance=product_data).data
-        return CustomResponse(code=Codes.PRODUCT_DETAIL_OK, msg="获取商品详情成功", data=result, status=200)
+        data = {
+            "results": [cards[pid] for pid in ids if pid in cards],
+            "missing": [pid for pid in ids if pid not in cards],
+        }
+        return CustomResponse(code=Codes.PRODUCT_BATCH_OK, msg="获取商品成功", data=data, status=200)
+
+
+class ProductAlsoBoughtAPIView(ListAPIView):
+    """买了还买。路由：/product/<id>/also_bought/?limit=10
+
+    读取离线预计算的共购邻居（见 also_bought，由 build_also_bought 定时重建），按排名返回商品卡片，
+    已下架/删除的邻居跳过；limit 默认 10，最大 20。支持 ?fields= 裁剪字段。
+    """
+
+    serializer_class = ProductCardSerializer
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 20
+
+    def list(self, request, *args: Any, **kwargs: Any):
+        product_id = kwargs.get("id")
+        try:
+            limit = int(request.query_params.get("limit", self.DEFAULT_LIMIT))
+        except ValueError:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg="limit 必须为整数", errors={"limit": "invalid"}, status=400)
+        limit = min(max(limit, 1), self.MAX_LIMIT)
+        ids = also_bought.get_neighbor_ids(product_id)
+        fields = requested_fields(request)
+        queryset = (Product.objects
+                    .filter(is_deleted=False, status__in=tag_listing.LISTED_STATUSES)
+                    .select_related('store')
+                    .only(*ProductCardSerializer.QUERY_COLUMNS))
+        queryset = sparse_queryset(queryset, ProductCardSerializer, fields)
+        # 多取一些，下架的邻居被跳过后仍尽量凑满 limit
+        products = tag_listing.fetch_page(ids[:limit * 2], queryset)[:limit]
+        data = self.get_serializer(products, many=True, fields=fields).data
+        return CustomResponse(code=Codes.PRODUCT_ALSO_BOUGHT_OK, msg="", data=data, status=200)
+
+
+class ProductSuggestAPIView(APIView):
+    """搜索框联想词。路由：/product/suggest/?q=前缀&limit=10
+
+    读取进程内前缀索引（见 suggest），不访问数据库；limit 默认 10，最大 20。
+    返回 [{text, type(product/category/tag), id}]，按销量权重降序。
+    """
+
+    DEFAULT_LIMIT = 10
+    MAX_LIMIT = 20
+
+    def get(self, request):
+        try:
+            limit = int(request.query_params.get('limit', self.DEFAULT_LIMIT))
+        except ValueError:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='limit 必须为整数', errors={'limit': 'invalid'}, status=400)
+        limit = min(max(limit, 1), self.MAX_LIMIT)
+        items = suggest.suggest(request.query_params.get('q', ''), limit)
+        return CustomResponse(code=Codes.PRODUCT_SUGGEST_OK, msg='', data=items, status=200)
+
+
+class ProductSearchCacheStatsAPIView(APIView):
+    """本进程搜索结果缓存的命中统计。路由：/product/search/cache_stats/
+
+    暴露进程内缓存细节，仅在 DEBUG 下开放，生产环境返回 404。
+    """
+
+    @staticmethod
+    def get(request):
+        if not settings.DEBUG:
+            raise Http404
+        return CustomResponse(code=Codes.PRODUCT_SEARCH_CACHE_STATS_OK, msg='', data=search_cache.stats(), status=200)
+
+
+def wants_facets(request) -> bool:
+    return request.query_params.get('with_facets', '').lower() in ('1', 'true', 'yes')
 
 
 class ProductSearchAPIView(APIView):
@@ -131,7 +359,7 @@ class ProductSearchAPIView(APIView):
 
     GET /product/search/?q=关键词&page=1&sort=0&page_size=20
     参数：
-      q: 搜索关键词（必填，对 name / subtitle / description 模糊匹配）
+      q: 搜索关键词（必填，经倒排索引匹配 name / subtitle / description，见 search_index）
       page: 页码（>=1，默认1）
       page_size: 每页数量（默认20，最大100）
       sort: 排序方式
@@ -140,9 +368,26 @@ class ProductSearchAPIView(APIView):
             2=价格降序
             3=评论数升序
             4=评论数降序
-    返回：分页结果 + 商品核心信息
+            5=相关度降序
+      cursor: 传入即启用游标分页（首页传空值），返回 next_cursor；此时忽略 page
+      with_total: 游标模式下是否返回总数（1=是，默认不统计）
+      fields: 可选，逗号分隔的卡片字段，用于裁剪返回字段与查询列
+      category_id / store_id / price_band: 分面筛选，均可逗号分隔多选；
+            price_band 取值见 search_facets.PRICE_BANDS（如 100-500、5000+）
+      with_facets: 是否返回分面计数（1=是），计数按规范化查询缓存（见 search_facets）
+    返回：分页结果 + 商品卡片（ProductCardSerializer）[+ facets]
+    整页结果按规范化查询与上述参数缓存在进程内 LRU 中（见 search_cache）。
     """
 
+    SORT_ORDERING = {
+        0: ['-id'],                     # 默认：新->旧
+        1: ['price', '-id'],            # 价格升序
+        2: ['-price', '-id'],           # 价格降序
+        3: ['review_count', '-id'],     # 评论数升序
+        4: ['-review_count', '-id'],    # 评论数降序
+        5: ['-relevance', '-id'],       # 相关度降序
+    }
+
     def get(self, request):
         q = request.query_params.get('q', '').strip()
         if not q:
@@ -169,58 +414,94 @@ class ProductSearchAPIView(APIView):
         try:
             sort = int(request.query_params.get('sort', 0))
         except ValueError:
-            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='sort 必须为 0/1/2/3/4', errors={'sort': 'invalid'}, status=400)
-        if sort not in (0, 1, 2, 3, 4):
-            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='sort 仅支持 0/1/2/3/4', errors={'sort': 'invalid'}, status=400)
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='sort 必须为 0/1/2/3/4/5', errors={'sort': 'invalid'}, status=400)
+        if sort not in (0, 1, 2, 3, 4, 5):
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg='sort 仅支持 0/1/2/3/4/5', errors={'sort': 'invalid'}, status=400)
 
-        queryset = (Product.objects
-                    .filter(is_deleted=False)
-                    .filter(Q(name__icontains=q) | Q(subtitle__icontains=q) | Q(description__icontains=q))
-                    .select_related('store')
-                    .annotate(review_count=Count('productreview', filter=Q(productreview__is_deleted=False)))
-                    )
-
-        # 应用排序
-        if sort == 1:          # 价格升序
-            queryset = queryset.order_by('price', '-id')
-        elif sort == 2:        # 价格降序
-            queryset = queryset.order_by('-price', '-id')
-        elif sort == 3:        # 评论数升序
-            queryset = queryset.order_by('review_count', '-id')
-        elif sort == 4:        # 评论数降序
-            queryset = queryset.order_by('-review_count', '-id')
-        else:                  # 默认：新->旧
-            queryset = queryset.order_by('-id')
-
-        paginator = Paginator(queryset, page_size)
         try:
-            page_obj = paginator.get_page(page)
-        except Exception:
-            return CustomResponse(code=Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR, msg='页码超出范围', errors={'page': 'out_of_range'}, status=404)
-
-        results = [
-            {
-                'id': p.id,
-                'name': p.name,
-                'price': str(p.price),
-                'thumbnail': (settings.IMAGE_URL.rstrip('/') + '/' + p.thumbnail.lstrip('/')) if p.thumbnail and not (p.thumbnail.startswith('http://') or p.thumbnail.startswith('https://')) else p.thumbnail,
-                'review_count': p.review_count,
-                'store_id': p.store_id,
-                'store_name': getattr(p.store, 'store_name', None)
-            }
-            for p in page_obj.object_list
-        ]
+            facet_filters = search_facets.parse_filters(request.query_params)
+        except ValueError as e:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg=f'{e} 参数无效', errors={str(e): 'invalid'}, status=400)
 
-        data = {
-            'q': q,
+        fields = requested_fields(request)
+        cursor = request.query_params.get('cursor') if is_cursor_request(request) else None
+        options = {
             'sort': sort,
-            'page': page_obj.number,
+            'page': page,
             'page_size': page_size,
-            'total': paginator.count,
-            'total_pages': paginator.num_pages,
-            'has_next': page_obj.has_next(),
-            'has_prev': page_obj.has_previous(),
-            'current_count': len(results),
-            'results': results
+            'fields': fields,
+            'filters': facet_filters,
+            'cursor': cursor,
+            'with_total': wants_total(request),
+            'with_facets': wants_facets(request),
         }
-        return CustomResponse(code=Codes.PRODUCT_SEARCH_OK, msg='搜索成功', data=data, status=200)
+        tokens = search_index.query_tokens(q)
+        key = (
+            tuple(sorted(tokens)), sort, page if cursor is None else None, page_size,
+            tuple(sorted(fields)) if fields else None,
+            tuple(sorted(facet_filters.category_ids)), tuple(sorted(facet_filters.store_ids)),
+            tuple(sorted(facet_filters.price_bands)), cursor, options['with_total'], options['with_facets'],
+        )
+        try:
+            data = search_cache.get_or_compute(key, tokens, lambda: self._search(q, **options))
+        except CursorError as e:
+            return CustomResponse(code=Codes.CATEGORY_PARAM_ERROR, msg=str(e), errors={'cursor': 'invalid'}, status=400)
+        # 缓存中的 data 为共享对象，只读；q 按原样回显
+        return CustomResponse(code=Codes.PRODUCT_SEARCH_OK, msg='搜索成功', data={'q': q, **data}, status=200)
+
+    def _search(self, q, sort, page, page_size, fields, filters, cursor, with_total, with_facets) -> dict:
+        """执行查询并组装响应 data（不含 q）；结果由 search_cache 缓存。"""
+        matches = search_index.match_queryset(q)
+        if matches is None:
+            queryset = Product.objects.none()
+        else:
+            queryset = Product.objects.filter(is_deleted=False, id__in=matches.values('product_id'))
+        facets = search_facets.compute(q, queryset, filters) if with_facets else None
+        queryset = filters.apply(queryset)
+        # review_count 为商品上的冗余聚合字段，排序无需再关联 product_review
+        queryset = queryset.select_related('store')
+
+        # 应用排序（末位 id 保证顺序唯一，游标分页依赖此约束）
+        if sort == 5 and matches is not None:  # 相关度降序
+            relevance = matches.filter(product_id=OuterRef('id')).values('score')[:1]
+            queryset = queryset.annotate(relevance=Subquery(relevance))
+        ordering = self.SORT_ORDERING.get(sort, ['-id'])
+        if sort == 5 and matches is None:
+            ordering = ['-id']
+
+        queryset = sparse_queryset(queryset.only(*ProductCardSerializer.QUERY_COLUMNS), ProductCardSerializer, fields)
+
+        def to_results(items) -> list:
+            return ProductCardSerializer(items, many=True, fields=fields).data
+
+        # 游标分页：?cursor=（首页为空），不执行 COUNT / OFFSET
+        if cursor is not None:
+            cursor_page = paginate_by_cursor(queryset, ordering, cursor, page_size)
+            results = to_results(cursor_page.items)
+            data = {
+                'sort': sort,
+                'page_size': page_size,
+                'total': queryset.count() if with_total else None,
+                'next_cursor': cursor_page.next_cursor,
+                'has_next': cursor_page.has_next,
+                'current_count': len(results),
+                'results': results
+            }
+        else:
+            paginator = Paginator(queryset.order_by(*ordering), page_size)
+            page_obj = paginator.get_page(page)
+            results = to_results(page_obj.object_list)
+            data = {
+                'sort': sort,
+                'page': page_obj.number,
+                'page_size': page_size,
+                'total': paginator.count,
+                'total_pages': paginator.num_pages,
+                'has_next': page_obj.has_next(),
+                'has_prev': page_obj.has_previous(),
+                'current_count': len(results),
+                'results': results
+            }
+        if facets is not None:
+            data['facets'] = facets
+        return data
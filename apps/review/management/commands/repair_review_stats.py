@@ -0,0 +1,52 @@
+"""
+校正商品评价聚合字段
+
+用法：python manage.py repair_review_stats [--product-id 1 --product-id 2] [--batch-size 1000]
+按 product_review 中未删除的评价重新计算 review_count / rating_sum / 1-5 星直方图，
+仅写回与实际不一致的商品。
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.product.models import Product
+from apps.review.services import STAT_FIELDS, compute_stats
+
+
+class Command(BaseCommand):
+    help = '按有效评价重算商品评价聚合（review_count / rating_sum / 评分直方图）'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--product-id', type=int, action='append', dest='product_ids', help='仅校正指定商品，可重复')
+        parser.add_argument('--batch-size', type=int, default=1000, help='每批写回的商品数')
+
+    def handle(self, *args, **options):
+        product_ids = options['product_ids']
+        batch_size = options['batch_size']
+        stats = compute_stats(product_ids)
+        empty = dict.fromkeys(STAT_FIELDS, 0)
+
+        products = Product.objects.only('id', *STAT_FIELDS).order_by('id')
+        if product_ids:
+            products = products.filter(id__in=product_ids)
+
+        dirty = []
+        checked = repaired = 0
+        for product in products.iterator(chunk_size=batch_size):
+            checked += 1
+            expected = stats.get(product.id, empty)
+            if any(getattr(product, f) != v for f, v in expected.items()):
+                for f, v in expected.items():
+                    setattr(product, f, v)
+                dirty.append(product)
+            if len(dirty) >= batch_size:
+                repaired += self._flush(dirty)
+                dirty = []
+        if dirty:
+            repaired += self._flush(dirty)
+        self.stdout.write(self.style.SUCCESS(f'检查商品 {checked} 个，校正 {repaired} 个'))
+
+    @staticmethod
+    def _flush(products) -> int:
+        with transaction.atomic():
+            Product.objects.bulk_update(products, STAT_FIELDS)
+        return len(products)
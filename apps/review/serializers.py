@@ -1,6 +1,7 @@
 from rest_framework import serializers
-from django.conf import settings
 from .models import ProductReview
+from utils import assets, image_variants
+from utils.serializers import SparseFieldsMixin
 import json
 
 class ImagesField(serializers.Field):
@@ -37,11 +38,12 @@ class ImagesField(serializers.Field):
             return []
         return []
 
-class ProductReviewSerializer(serializers.ModelSerializer):
+class ProductReviewSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     images = ImagesField(required=False, allow_null=True)
     user_id = serializers.IntegerField(source='user.id', read_only=True)
     user_username = serializers.CharField(source='user.username', read_only=True)
     user_avatar_url = serializers.SerializerMethodField()
+    user_avatar_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = ProductReview
@@ -55,25 +57,29 @@ class ProductReviewSerializer(serializers.ModelSerializer):
         }
 
     def _add_prefix(self, path: str | None):
-        if not path:
-            return path
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = getattr(settings, 'IMAGE_URL', '') or ''
-        return base.rstrip('/') + '/' + path.lstrip('/')
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
 
     def get_user_avatar_url(self, obj: ProductReview):
         return self._add_prefix(getattr(obj.user, 'avatar_url', None))
 
+    def get_user_avatar_variants(self, obj: ProductReview):
+        return image_variants.variant_urls(getattr(obj.user, 'avatar_url', None))
+
     def to_representation(self, instance):
         data = super().to_representation(instance)
         # 处理 images 前缀
-        imgs = data.get('images') or []
-        if isinstance(imgs, list):
-            data['images'] = [self._add_prefix(p) for p in imgs]
-        return data
+        if 'images' in data:
+            imgs = data['images'] or []
+            if isinstance(imgs, list):
+                data['image_variants'] = [image_variants.variant_urls(p) for p in imgs]
+                data['images'] = [self._add_prefix(p) for p in imgs]
+        return self.project(data)
 
     def validate(self, attrs):
+        if self.instance is not None:
+            # 更新（改分/改内容）不涉及订单明细，update() 中也会丢弃该字段
+            return attrs
         order_item = attrs.get('order_item')
         if order_item is None:
             raise serializers.ValidationError({'order_item': 'required'})
@@ -0,0 +1,63 @@
+"""
+评价聚合维护
+
+Product 上冗余保存 review_count / rating_sum / rating_N_count（1-5 星直方图），
+评价创建、软删除、改分时在同一事务内用 F 表达式增量更新，避免列表排序与详情页
+对 product_review 做实时聚合。数据漂移时可执行 python manage.py repair_review_stats。
+"""
+from collections import defaultdict
+from typing import Dict, Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from apps.product import detail_cache, search_cache
+from apps.product.models import Product
+from apps.review.models import ProductReview
+
+STAT_FIELDS = ['review_count', 'rating_sum'] + [f'rating_{star}_count' for star in range(1, 6)]
+
+
+def _apply(product_id: int, count_delta: int, rating_deltas: Dict[int, int]) -> None:
+    updates = {
+        f'rating_{star}_count': F(f'rating_{star}_count') + d
+        for star, d in rating_deltas.items() if d
+    }
+    updates['rating_sum'] = F('rating_sum') + sum(star * d for star, d in rating_deltas.items())
+    if count_delta:
+        updates['review_count'] = F('review_count') + count_delta
+    # 详情缓存以 update_time 为键，.update() 不触发 auto_now，手动写入
+    updates['update_time'] = timezone.now()
+    Product.objects.filter(id=product_id).update(**updates)
+    # F 表达式更新不触发 post_save，需手动失效详情缓存与搜索结果缓存；均在提交后执行，避免回源读到未提交前的旧数据
+    transaction.on_commit(lambda: detail_cache.invalidate(product_id))
+    transaction.on_commit(lambda: search_cache.publish([product_id]))
+
+
+def on_review_created(review: ProductReview) -> None:
+    _apply(review.product_id, 1, {review.rating: 1})
+
+
+def on_review_deleted(review: ProductReview) -> None:
+    _apply(review.product_id, -1, {review.rating: -1})
+
+
+def on_rating_changed(review: ProductReview, old_rating: int) -> None:
+    if old_rating == review.rating:
+        return
+    _apply(review.product_id, 0, {old_rating: -1, review.rating: 1})
+
+
+def compute_stats(product_ids: Optional[Iterable[int]] = None) -> Dict[int, Dict[str, int]]:
+    """按有效评价重新聚合，返回 {product_id: {字段: 值}}（无评价的商品不出现）。"""
+    qs = ProductReview.objects.filter(is_deleted=False)
+    if product_ids is not None:
+        qs = qs.filter(product_id__in=list(product_ids))
+    stats: Dict[int, Dict[str, int]] = defaultdict(lambda: dict.fromkeys(STAT_FIELDS, 0))
+    for row in qs.values('product_id', 'rating').annotate(n=Count('id')).order_by():
+        s = stats[row['product_id']]
+        s['review_count'] += row['n']
+        s['rating_sum'] += row['rating'] * row['n']
+        s[f'rating_{row["rating"]}_count'] += row['n']
+    return stats
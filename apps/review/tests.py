@@ -1,3 +1,55 @@
-from django.test import TestCase
+from django.core.cache import cache
+from django.test import RequestFactory, TransactionTestCase
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from apps.order.services import create_order_direct
+from apps.product.models import Category, Product
+from apps.review import services
+from apps.review.models import ProductReview
+from apps.review.views import ProductReviewViewSet
+from apps.store.models import Store
+from apps.user.models import User
+from utils.jwt_auth import generate_token
+
+RECIPIENT = {'name': '张三', 'phone': '13800000000', 'address': '北京市'}
+
+
+class ReviewStatsTests(TransactionTestCase):
+    """改分/软删除同步商品评价聚合，增量按锁定读取的评价行计算。"""
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='u1', phone='13800000000', password='x')
+        store = Store.objects.create(store_name='s1', owner=self.user, status='active')
+        category = Category.objects.create(name='手机', parent_id=0)
+        self.product = Product.objects.create(name='商品', price='10.00', category=category, store=store, stock=10, status='on_sale')
+        order = create_order_direct(self.user.id, self.product.id, 1, RECIPIENT)
+        self.review = ProductReview.objects.create(
+            order=order, order_item=order.orderitem_set.get(), user=self.user, product=self.product,
+            store=store, content='好', rating=5,
+        )
+        services.on_review_created(self.review)
+        self.client = APIClient()
+        self.client.credentials(HTTP_TOKEN=generate_token(self.user.id, self.user.username))
+
+    def stats(self):
+        self.product.refresh_from_db()
+        return {field: getattr(self.product, field) for field in services.STAT_FIELDS if getattr(self.product, field)}
+
+    def test_rerate_moves_histogram(self):
+        response = self.client.patch(f'/review/{self.review.id}/', {'rating': 2}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.stats(), {'review_count': 1, 'rating_sum': 2, 'rating_2_count': 1})
+
+    def test_rerate_after_delete_is_rejected(self):
+        self.assertEqual(self.client.delete(f'/review/{self.review.id}/').status_code, 200)
+        self.assertEqual(self.stats(), {})
+        self.assertEqual(self.client.patch(f'/review/{self.review.id}/', {'rating': 2}, format='json').status_code, 404)
+        self.assertEqual(self.client.delete(f'/review/{self.review.id}/').status_code, 404)
+        self.assertEqual(self.stats(), {})
+
+    def test_write_actions_lock_the_review_row(self):
+        request = RequestFactory().patch('/')
+        for action, locked in (('partial_update', True), ('update', True), ('destroy', True), ('retrieve', False)):
+            view = ProductReviewViewSet(action=action, request=request, kwargs={})
+            self.assertEqual(view.get_queryset().query.select_for_update, locked, action)
@@ -4,15 +4,22 @@ Review 模块视图
 - 提供评论的增删改查接口以及按用户/商品/店铺的查询
 - 所有响应统一使用 CustomResponse 封装
 - destroy 为软删除（仅置位 is_deleted）
-- 列表接口支持分页（使用 DRF 默认分页器配置）
+- 创建/改分/软删除时在同一事务内同步商品上的评价聚合字段（见 services）；
+  改分/软删除在事务内锁定评价行后再读取原评分，并发改分或改分与删除交错时不会重复扣减同一星级
+- 列表接口支持分页（使用 DRF 默认分页器配置），传 ?cursor= 时改用游标分页
+- 读接口支持 ?fields= 裁剪返回字段
 """
 from typing import Any
+from django.db import transaction
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.decorators import action
+from . import services
 from .models import ProductReview
 from .serializers import ProductReviewSerializer
+from utils.pagination import CursorError, is_cursor_request, paginate_by_cursor, wants_total
 from utils.renderer import CustomResponse
 from utils.error_codes import Codes
+from utils.serializers import requested_fields
 
 
 class ProductReviewViewSet(ModelViewSet):
@@ -22,13 +29,46 @@ class ProductReviewViewSet(ModelViewSet):
     自定义动作：by_user/by_product/by_store（均支持分页）
     """
 
-    queryset = ProductReview.objects.filter(is_deleted=False)
+    queryset = ProductReview.objects.filter(is_deleted=False).select_related('user')
     serializer_class = ProductReviewSerializer
 
-    # 标准动作统一包装响应
-    def list(self, request, *args: Any, **kwargs: Any):
-        """获取评论列表，遵循分页配置。"""
-        queryset = self.filter_queryset(self.get_queryset())
+    CURSOR_PAGE_SIZE = 20
+    CURSOR_MAX_PAGE_SIZE = 100
+
+    LOCKING_ACTIONS = ('update', 'partial_update', 'destroy')
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in self.LOCKING_ACTIONS:
+            # 只锁评价行（不连带 user 行）；锁定读取拿到最新提交的数据，已被并发删除的评价在此即 404
+            queryset = queryset.select_related(None).select_for_update()
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        """读请求按 ?fields= 裁剪输出；写请求保持完整字段以便校验。"""
+        if self.request is not None and self.request.method == 'GET':
+            kwargs.setdefault('fields', requested_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
+
+    def _list_response(self, queryset):
+        """列表统一出口：?cursor= 时按 id 倒序游标分页，否则遵循分页配置。"""
+        if is_cursor_request(self.request):
+            try:
+                page_size = int(self.request.query_params.get('page_size', self.CURSOR_PAGE_SIZE))
+            except ValueError:
+                return CustomResponse(code=Codes.REVIEW_PARAM_ERROR, msg='page_size 必须为整数', errors={'page_size': 'invalid'}, status=400)
+            page_size = min(max(page_size, 1), self.CURSOR_MAX_PAGE_SIZE)
+            try:
+                cursor_page = paginate_by_cursor(queryset, ['-id'], self.request.query_params.get('cursor'), page_size)
+            except CursorError as e:
+                return CustomResponse(code=Codes.REVIEW_PARAM_ERROR, msg=str(e), errors={'cursor': 'invalid'}, status=400)
+            data = {
+                'results': self.get_serializer(cursor_page.items, many=True).data,
+                'next_cursor': cursor_page.next_cursor,
+                'has_next': cursor_page.has_next,
+                'count': queryset.count() if wants_total(self.request) else None,
+            }
+            return CustomResponse(code=Codes.REVIEW_LIST_OK, data=data)
         page = self.paginate_queryset(queryset)
         if page is not None:
             serializer = self.get_serializer(page, many=True)
@@ -37,6 +77,12 @@ class ProductReviewViewSet(ModelViewSet):
         serializer = self.get_serializer(queryset, many=True)
         return CustomResponse(code=Codes.REVIEW_LIST_OK, data=serializer.data)
 
+    # 标准动作统一包装响应
+    def list(self, request, *args: Any, **kwargs: Any):
+        """获取评论列表，遵循分页配置。"""
+        queryset = self.filter_queryset(self.get_queryset())
+        return self._list_response(queryset)
+
     def retrieve(self, request, *args: Any, **kwargs: Any):
         """获取单条评论详情。"""
         instance = self.get_object()
@@ -51,6 +97,7 @@ class ProductReviewViewSet(ModelViewSet):
         headers = self.get_success_headers(serializer.data)
         return CustomResponse(code=Codes.REVIEW_CREATED, data=serializer.data, status=201, headers=headers)
 
+    @transaction.atomic
     def update(self, request, *args: Any, **kwargs: Any):
         """更新评论（全量/部分）。"""
         partial = kwargs.pop('partial', False)
@@ -65,50 +112,48 @@ class ProductReviewViewSet(ModelViewSet):
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
 
+    @transaction.atomic
     def destroy(self, request, *args: Any, **kwargs: Any):
         """软删除评论（置 is_deleted=True）。"""
         instance = self.get_object()
         self.perform_destroy(instance)
         return CustomResponse(code=Codes.REVIEW_DELETED, msg="deleted")
 
+    @transaction.atomic
+    def perform_create(self, serializer) -> None:
+        """保存评论并累加商品评价聚合。"""
+        review = serializer.save()
+        services.on_review_created(review)
+
+    @transaction.atomic
+    def perform_update(self, serializer) -> None:
+        """保存评论；评分变化时调整商品评分直方图（instance 为 update() 事务内锁定读取的行）。"""
+        old_rating = serializer.instance.rating
+        review = serializer.save()
+        services.on_rating_changed(review, old_rating)
+
+    @transaction.atomic
     def perform_destroy(self, instance: ProductReview) -> None:
-        """软删除实现：仅更新 is_deleted 字段。"""
-        instance.is_deleted = True
-        instance.save(update_fields=["is_deleted"])
+        """软删除实现：仅更新 is_deleted 字段，并按锁定读取的评分扣减商品评价聚合。"""
+        updated = ProductReview.objects.filter(id=instance.id, is_deleted=False).update(is_deleted=True)
+        if updated:
+            services.on_review_deleted(instance)
 
     # 自定义动作统一包装响应，并支持分页
     @action(detail=False, methods=['get'], url_path='user/(?P<user_id>[^/.]+)')
     def by_user(self, request, user_id: str = None):
         """按用户查询评论，支持分页。"""
         queryset = self.filter_queryset(self.get_queryset().filter(user_id=user_id))
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            pagination = self.get_paginated_response(serializer.data).data
-            return CustomResponse(code=Codes.REVIEW_LIST_OK, data=pagination)
-        serializer = self.get_serializer(queryset, many=True)
-        return CustomResponse(code=Codes.REVIEW_LIST_OK, data=serializer.data)
+        return self._list_response(queryset)
 
     @action(detail=False, methods=['get'], url_path='product/(?P<product_id>[^/.]+)')
     def by_product(self, request, product_id: str = None):
         """按商品查询评论，支持分页。"""
         queryset = self.filter_queryset(self.get_queryset().filter(product_id=product_id))
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            pagination = self.get_paginated_response(serializer.data).data
-            return CustomResponse(code=Codes.REVIEW_LIST_OK, data=pagination)
-        serializer = self.get_serializer(queryset, many=True)
-        return CustomResponse(code=Codes.REVIEW_LIST_OK, data=serializer.data)
+        return self._list_response(queryset)
 
     @action(detail=False, methods=['get'], url_path='store/(?P<store_id>[^/.]+)')
     def by_store(self, request, store_id: str = None):
         """按店铺查询评论，支持分页。"""
         queryset = self.filter_queryset(self.get_queryset().filter(store_id=store_id))
-        page = self.paginate_queryset(queryset)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            pagination = self.get_paginated_response(serializer.data).data
-            return CustomResponse(code=Codes.REVIEW_LIST_OK, data=pagination)
-        serializer = self.get_serializer(queryset, many=True)
-        return CustomResponse(code=Codes.REVIEW_LIST_OK, data=serializer.data)
+        return self._list_response(queryset)
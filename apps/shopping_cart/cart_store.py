@@ -0,0 +1,338 @@
+"""
+购物车缓存存储（可选，SHOPPING_CART_STORE=cache 时启用）
+
+- 每个用户的购物车以紧凑元组列表常驻共享缓存：
+  [(id, product_id, quantity, selected, version, create_time, update_time, dirty), ...]
+  列表/全选等读取直接从缓存取条目，只按 id 批量查一次商品，不再查询 shopping_cart 表
+- 冷启动（缓存缺失/被淘汰）时在用户锁内从 shopping_cart 表加载并回填，数据库始终是持久化兜底；
+  锁被写入方占用时优先读缓存中已有的条目，仍缺失时直接读库、不回填，避免把旧数据回填到刚被丢弃的缓存
+- 写后回写（write-behind）：修改数量/选中只改缓存并标记 dirty，同时把用户记入共享缓存中的待写回集合；
+  各进程的后台守护线程每 SHOPPING_CART_FLUSH_INTERVAL 秒取该集合逐个写回（bulk_update），
+  某个进程来不及写回（被强杀）时由其它进程接手；写回成功后才移出集合，失败的留待下次重试
+- 含 dirty 条目的缓存不设过期时间，写回后恢复 SHOPPING_CART_CACHE_TIMEOUT；
+  若仍被淘汰（用户在待写回集合中而缓存已缺失），未写回的修改已无法恢复：记错误日志并抛出 CartStoreLost，
+  之后按数据库重新加载
+- 新增与删除条目仍同步写库（需要主键与唯一约束），在 write_through() 内进行：
+  持有用户锁，先写回该用户的 dirty 条目，块内写库，结束后丢弃缓存，下次读取时重新加载；
+  下单同样在 write_through() 内进行，订单服务从数据库读到的是最新数量与选中状态
+- 同一用户的读改写经共享缓存上的短锁串行化（同一线程可重入），等待超时抛出 CartBusy，请求失败而不是无锁继续；
+  缓存须为多进程共享（如 Redis），本地内存缓存只适合单进程调试。
+  锁的过期时间 LOCK_TIMEOUT 只用于兜底进程崩溃；持有期间由后台线程定期续期，
+  下单重试等较长的 write_through() 块不会中途失去锁
+  未启用缓存存储时不取该锁（locked() 为空操作），同一用户的写入由版本计数器的行锁串行化（见 versions）
+"""
+import atexit
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Iterable, List, Optional, Set
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from apps.product.models import Product
+from apps.shopping_cart.models import ShoppingCart
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = 'shopping_cart:store:'
+LOCK_PREFIX = 'shopping_cart:lock:'
+DIRTY_KEY = 'shopping_cart:dirty_users'
+DIRTY_LOCK_KEY = 'shopping_cart:lock:dirty_users'
+LOCK_TIMEOUT = 5
+LOCK_WAIT = 2.0
+# 元组下标
+ID, PRODUCT_ID, QUANTITY, SELECTED, VERSION, CREATE_TIME, UPDATE_TIME, DIRTY = range(8)
+
+_lock = threading.Lock()
+_held = threading.local()
+_flusher: Optional[threading.Thread] = None
+# 本进程持有的锁 {key: token}，由续期线程定期延长过期时间
+_owned: Dict[str, str] = {}
+_renewer: Optional[threading.Thread] = None
+_stop = threading.Event()
+
+
+class CartBusy(APIException):
+    """用户购物车锁等待超时。"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = '购物车正在被其它请求修改，请稍后重试'
+    default_code = 'cart_busy'
+
+
+class CartStoreLost(APIException):
+    """待写回的购物车缓存在写回前丢失，未写回的修改无法恢复。"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = '购物车最近的修改未能保存，请刷新后重试'
+    default_code = 'cart_store_lost'
+
+
+def enabled() -> bool:
+    return getattr(settings, 'SHOPPING_CART_STORE', 'db') == 'cache'
+
+
+def _key(user_id: int) -> str:
+    return f'{KEY_PREFIX}{user_id}'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'SHOPPING_CART_CACHE_TIMEOUT', 86400)
+
+
+def _interval() -> float:
+    return getattr(settings, 'SHOPPING_CART_FLUSH_INTERVAL', 5)
+
+
+@contextmanager
+def _cache_lock(key: str):
+    """共享缓存 add 实现的跨进程短锁，同一线程可重入；等待超时抛出 CartBusy。"""
+    held = _held.__dict__.setdefault('keys', set())
+    if key in held:
+        yield
+        return
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + LOCK_WAIT
+    acquired = cache.add(key, token, LOCK_TIMEOUT)
+    while not acquired and time.monotonic() < deadline:
+        time.sleep(0.01)
+        acquired = cache.add(key, token, LOCK_TIMEOUT)
+    if not acquired:
+        logger.warning('购物车锁等待超时: %s', key)
+        raise CartBusy()
+    held.add(key)
+    with _lock:
+        _owned[key] = token
+    _ensure_renewer()
+    try:
+        yield
+    finally:
+        held.discard(key)
+        with _lock:
+            _owned.pop(key, None)
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def _renew() -> None:
+    with _lock:
+        owned = list(_owned.items())
+    for key, token in owned:
+        if cache.get(key) == token:
+            cache.touch(key, LOCK_TIMEOUT)
+
+
+def _run_renewer() -> None:
+    while not _stop.wait(LOCK_TIMEOUT / 3):
+        try:
+            _renew()
+        except Exception:
+            logger.exception('购物车锁续期失败')
+
+
+def _ensure_renewer() -> None:
+    global _renewer
+    if _renewer is not None:
+        return
+    with _lock:
+        if _renewer is not None:
+            return
+        _renewer = threading.Thread(target=_run_renewer, name='shopping-cart-lock-renewer', daemon=True)
+        _renewer.start()
+
+
+def user_lock(user_id: int):
+    """同一用户购物车读改写的锁。"""
+    return _cache_lock(f'{LOCK_PREFIX}{user_id}')
+
+
+def locked(user_id: int):
+    """启用缓存存储时取用户锁，否则为空操作：数据库存储没有需要保护的缓存读改写。"""
+    return user_lock(user_id) if enabled() else nullcontext()
+
+
+def _dirty_users() -> Set[int]:
+    return cache.get(DIRTY_KEY) or set()
+
+
+def _set_dirty(user_id: int, dirty: bool) -> None:
+    # 调用方持有该用户的锁；集合本身的读改写另由全局锁串行化
+    if (user_id in _dirty_users()) == dirty:
+        return
+    with _cache_lock(DIRTY_LOCK_KEY):
+        users = _dirty_users()
+        if dirty:
+            users.add(user_id)
+        else:
+            users.discard(user_id)
+        cache.set(DIRTY_KEY, users, timeout=None)
+
+
+def _check_lost(user_id: int) -> None:
+    """缓存缺失时调用（持有用户锁）：用户仍在待写回集合中说明 dirty 条目被淘汰，按错误处理。"""
+    if user_id in _dirty_users():
+        logger.error('购物车缓存在写回前丢失，未写回的修改已无法恢复: user_id=%s', user_id)
+        _set_dirty(user_id, False)
+        raise CartStoreLost()
+
+
+def _row(item: ShoppingCart, dirty: bool = False) -> tuple:
+    return (item.id, item.product_id, item.quantity, item.selected, item.version, item.create_time, item.update_time, dirty)
+
+
+def _db_rows(user_id: int) -> List[tuple]:
+    return [_row(item) for item in ShoppingCart.objects.filter(user_id=user_id)]
+
+
+def _load_rows(user_id: int) -> List[tuple]:
+    rows = cache.get(_key(user_id))
+    if rows is not None:
+        return rows
+    with user_lock(user_id):
+        rows = cache.get(_key(user_id))
+        if rows is None:
+            _check_lost(user_id)
+            rows = _db_rows(user_id)
+            cache.set(_key(user_id), rows, _timeout())
+    return rows
+
+
+def _to_item(user_id: int, row: tuple) -> ShoppingCart:
+    return ShoppingCart(
+        id=row[ID], user_id=user_id, product_id=row[PRODUCT_ID], quantity=row[QUANTITY],
+        selected=row[SELECTED], version=row[VERSION], create_time=row[CREATE_TIME], update_time=row[UPDATE_TIME],
+    )
+
+
+def get_items(user_id: int, product_columns: Iterable[str] = ()) -> List[ShoppingCart]:
+    """返回用户购物车条目（按更新时间倒序，与模型默认排序一致），商品经一次 id__in 查询挂载。"""
+    try:
+        rows = _load_rows(user_id)
+    except CartBusy:
+        # 锁被占用：等待期间已有缓存（其它请求回填）时读缓存，仍缺失说明写入方（新增/删除/下单）
+        # 刚丢弃了缓存，直接读库
+        rows = cache.get(_key(user_id))
+        if rows is None:
+            rows = _db_rows(user_id)
+    _ensure_flusher()
+    items = [_to_item(user_id, row) for row in rows]
+    items.sort(key=lambda i: i.update_time, reverse=True)
+    if items:
+        columns = [c.split('__', 1)[1] for c in product_columns if c.startswith('product__')]
+        products = Product.objects.select_related('store')
+        if columns:
+            products = products.only(*columns)
+        by_id = products.in_bulk([i.product_id for i in items])
+        # 商品已被物理删除的条目由级联删除处理，这里直接跳过
+        items = [i for i in items if i.product_id in by_id]
+        for i in items:
+            i.product = by_id[i.product_id]
+    return items
+
+
+def update_items(user_id: int, items: Iterable[ShoppingCart]) -> None:
+    """把已修改数量/选中/版本的条目写入缓存并标记 dirty，由后台线程批量写回数据库。"""
+    changed = {i.id: i for i in items}
+    if not changed:
+        return
+    with user_lock(user_id):
+        rows = _load_rows(user_id)
+        rows = [_row(changed[row[ID]], dirty=True) if row[ID] in changed else row for row in rows]
+        # 含未写回修改的缓存不设过期，写回后恢复
+        cache.set(_key(user_id), rows, timeout=None)
+        _set_dirty(user_id, True)
+    _ensure_flusher()
+
+
+def flush_user(user_id: int) -> int:
+    """把该用户缓存中的 dirty 条目写回数据库，返回写回条数；失败时抛出异常，缓存保持 dirty。"""
+    if not enabled():
+        return 0
+    with user_lock(user_id):
+        rows = cache.get(_key(user_id))
+        if rows is None:
+            _check_lost(user_id)
+            return 0
+        dirty = [row for row in rows if row[DIRTY]]
+        if dirty:
+            ShoppingCart.objects.bulk_update(
+                [_to_item(user_id, row) for row in dirty], ['quantity', 'selected', 'version', 'update_time'],
+                batch_size=500,
+            )
+            cache.set(_key(user_id), [row[:DIRTY] + (False,) for row in rows], _timeout())
+        _set_dirty(user_id, False)
+    return len(dirty)
+
+
+def invalidate(user_id: int) -> None:
+    """写回 dirty 条目后丢弃缓存，下次读取时从数据库重新加载。"""
+    if not enabled():
+        return
+    with user_lock(user_id):
+        flush_user(user_id)
+        cache.delete(_key(user_id))
+
+
+@contextmanager
+def write_through(user_id: int):
+    """
+    同步写库（新增/删除/合并/清理/下单）的临界区：
+    持有用户锁，先写回 dirty 条目，块内写库，结束后丢弃缓存；期间其它请求的读改写等待锁，
+    不会写进随后被丢弃的缓存。未启用缓存存储时为空操作。
+    """
+    if not enabled():
+        yield
+        return
+    with user_lock(user_id):
+        flush_user(user_id)
+        try:
+            yield
+        finally:
+            cache.delete(_key(user_id))
+
+
+def flush() -> int:
+    """写回共享待写回集合中的全部用户（含其它进程记录的），返回写回条数。"""
+    written = 0
+    for user_id in _dirty_users():
+        try:
+            written += flush_user(user_id)
+        except (CartBusy, CartStoreLost):
+            # 锁被占用时下次再写；丢失已记错误日志
+            continue
+        except Exception:
+            logger.exception('购物车写回失败，稍后重试: user_id=%s', user_id)
+    return written
+
+
+def _ensure_flusher() -> None:
+    global _flusher
+    if _flusher is not None:
+        return
+    with _lock:
+        if _flusher is not None:
+            return
+        _flusher = threading.Thread(target=_run, name='shopping-cart-flusher', daemon=True)
+        _flusher.start()
+        atexit.register(shutdown)
+
+
+def _run() -> None:
+    while not _stop.wait(_interval()):
+        try:
+            flush()
+        except Exception:
+            logger.exception('购物车写回失败')
+        finally:
+            # 后台线程持有独立的数据库连接，用完即关，避免长连接超时
+            connection.close()
+
+
+def shutdown() -> None:
+    """停止后台线程并同步写回（进程退出时调用）。"""
+    _stop.set()
+    flush()
@@ -0,0 +1,148 @@
+"""
+游客购物车
+
+- 未登录用户以匿名令牌（请求头 Guest-Token，首次加购时由服务端签发）标识，
+  购物车整体存放在共享缓存：{product_id: (quantity, selected, 加入时间)}，
+  最多 MAX_LINES 个商品，SHOPPING_CART_GUEST_TIMEOUT 秒无操作后过期
+- 登录时 merge() 把游客购物车并入用户购物车：
+  一次商品查询（带出库存、状态与用户购物车中已有数量），
+  一次 bulk_create(update_conflicts=True) 批量 upsert，数量累加后按库存截断，
+  下架/缺货/不存在的商品跳过并在结果中列出；合并后删除游客购物车
+- 合并前以 cache.add 占用该令牌（CLAIM_PREFIX），同一游客购物车的并发/重复合并只有一个执行，
+  其余直接返回未合并，不会把数量累加两次；合并失败时释放占用，游客购物车保留可重试
+"""
+import re
+import secrets
+import time
+from datetime import datetime, timezone as dt_timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import OuterRef, Subquery
+from django.utils import timezone
+
+from apps.product.models import Product
+from apps.shopping_cart import cart_store, versions
+from apps.shopping_cart.models import ShoppingCart
+from apps.shopping_cart.services import OFF_SHELF_STATUSES
+
+KEY_PREFIX = 'shopping_cart:guest:'
+CLAIM_PREFIX = 'shopping_cart:guest_claim:'
+# 占用的过期时间只用于兜底进程崩溃，须覆盖一次合并
+CLAIM_TIMEOUT = 60
+TOKEN_HEADER = 'Guest-Token'
+TOKEN_RE = re.compile(r'^[A-Za-z0-9_-]{16,64}$')
+MAX_LINES = 100
+
+# product_id -> (quantity, selected, 加入时间戳)
+Lines = Dict[int, Tuple[int, bool, float]]
+
+
+def _key(token: str) -> str:
+    return f'{KEY_PREFIX}{token}'
+
+
+def _timeout() -> int:
+    return getattr(settings, 'SHOPPING_CART_GUEST_TIMEOUT', 7 * 86400)
+
+
+def new_token() -> str:
+    return secrets.token_urlsafe(24)
+
+
+def valid_token(token: Optional[str]) -> bool:
+    return bool(token) and TOKEN_RE.match(token) is not None
+
+
+def get_token(request) -> Optional[str]:
+    token = request.headers.get(TOKEN_HEADER)
+    return token if valid_token(token) else None
+
+
+def load(token: str) -> Lines:
+    return cache.get(_key(token)) or {}
+
+
+def save(token: str, lines: Lines) -> None:
+    if lines:
+        cache.set(_key(token), lines, _timeout())
+    else:
+        cache.delete(_key(token))
+
+
+def put(lines: Lines, product_id: int, quantity: int, selected: bool = True) -> None:
+    added_at = lines[product_id][2] if product_id in lines else time.time()
+    lines[product_id] = (quantity, selected, added_at)
+
+
+def get_items(lines: Lines, product_columns: Iterable[str] = ()) -> List[ShoppingCart]:
+    """游客条目转成未入库的 ShoppingCart（按加入时间倒序），商品经一次 id__in 查询挂载，可直接序列化与汇总。"""
+    columns = [c.split('__', 1)[1] for c in product_columns if c.startswith('product__')]
+    products = Product.objects.select_related('store').filter(is_deleted=False)
+    if columns:
+        products = products.only(*columns)
+    by_id = products.in_bulk(list(lines))
+    items = []
+    for product_id, (quantity, selected, added_at) in sorted(lines.items(), key=lambda kv: kv[1][2], reverse=True):
+        if product_id not in by_id:
+            continue
+        added = datetime.fromtimestamp(added_at, tz=dt_timezone.utc)
+        items.append(ShoppingCart(
+            product=by_id[product_id], quantity=quantity, selected=selected, create_time=added, update_time=added,
+        ))
+    return items
+
+
+def merge(token: Optional[str], user_id: int) -> Dict[str, object]:
+    """把游客购物车并入用户购物车，返回 {merged, skipped: [{product_id, reason}], version}。"""
+    nothing = {'merged': 0, 'skipped': [], 'version': None}
+    if not valid_token(token):
+        return nothing
+    claim = f'{CLAIM_PREFIX}{token}'
+    if not cache.add(claim, user_id, CLAIM_TIMEOUT):
+        # 另一个请求正在合并同一游客购物车
+        return nothing
+    try:
+        lines = load(token)
+        result = _merge(lines, user_id) if lines else nothing
+        # 先删游客购物车再释放占用：之后的合并读到空购物车
+        cache.delete(_key(token))
+    finally:
+        cache.delete(claim)
+    return result
+
+
+def _merge(lines: Lines, user_id: int) -> Dict[str, object]:
+    in_cart = ShoppingCart.objects.filter(user_id=user_id, product_id=OuterRef('id')).values('quantity')[:1]
+    products = (Product.objects
+                .filter(id__in=list(lines), is_deleted=False)
+                .annotate(in_cart=Subquery(in_cart))
+                .only('id', 'stock', 'status'))
+
+    with versions.change(user_id) as version, cart_store.write_through(user_id):
+        # 购物车中已有数量在变更内读取（计数器行锁 / 缓存存储的用户锁），与写入之间不会被其它写入改动
+        found = {p.id: p for p in products}
+        now = timezone.now()
+        rows, skipped = [], []
+        for product_id, (quantity, selected, _) in lines.items():
+            product = found.get(product_id)
+            if product is None:
+                skipped.append({'product_id': product_id, 'reason': 'not_found'})
+            elif product.status in OFF_SHELF_STATUSES or product.stock <= 0:
+                skipped.append({'product_id': product_id, 'reason': 'off_shelf'})
+            else:
+                rows.append(ShoppingCart(
+                    user_id=user_id, product_id=product_id,
+                    quantity=min((product.in_cart or 0) + quantity, product.stock),
+                    selected=selected, version=version, update_time=now,
+                ))
+        if rows:
+            # MySQL 的 ON DUPLICATE KEY UPDATE 不支持指定冲突列，由 (user, product) 唯一约束触发
+            unique_fields = ['user', 'product'] if connection.features.supports_update_conflicts_with_target else None
+            ShoppingCart.objects.bulk_create(
+                rows, update_conflicts=True, unique_fields=unique_fields,
+                update_fields=['quantity', 'selected', 'version', 'update_time'],
+            )
+    return {'merged': len(rows), 'skipped': skipped, 'version': version}
@@ -0,0 +1,42 @@
+"""
+分块清理购物车中的弃置条目与失效商品条目（见 apps.shopping_cart.pruning）
+
+用法：python manage.py prune_shopping_cart [--stale-days 90] [--chunk-size 1000] [--sleep 0.05] [--only stale,deleted,off_shelf] [--dry-run]
+建议由 cron 等每天低峰执行；每块独立提交，中途中断可直接重跑。
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.shopping_cart import pruning
+
+
+class Command(BaseCommand):
+    help = '清理购物车：删除长期未更新与商品已删除的条目，下架商品条目置为未选中'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--stale-days', type=int, default=None, help='超过该天数未更新的条目视为弃置（默认 SHOPPING_CART_STALE_DAYS）')
+        parser.add_argument('--chunk-size', type=int, default=pruning.DEFAULT_CHUNK_SIZE, help='每块处理的条目数')
+        parser.add_argument('--sleep', type=float, default=0, help='块间休眠秒数')
+        parser.add_argument('--only', default=','.join(pruning.SWEEPS), help='只执行指定清理项，逗号分隔')
+        parser.add_argument('--dry-run', action='store_true', help='只统计不修改')
+
+    def handle(self, *args, **options):
+        sweeps = [s.strip() for s in options['only'].split(',') if s.strip()]
+        unknown = [s for s in sweeps if s not in pruning.SWEEPS]
+        if unknown:
+            raise CommandError(f'未知清理项：{",".join(unknown)}（可选 {",".join(pruning.SWEEPS)}）')
+        if options['chunk_size'] <= 0:
+            raise CommandError('--chunk-size 必须大于0')
+
+        def progress(name, count):
+            if options['verbosity'] > 1:
+                self.stdout.write(f'  {name}: {count}')
+
+        report = pruning.prune(
+            stale_days=options['stale_days'], chunk_size=options['chunk_size'], sleep=options['sleep'],
+            dry_run=options['dry_run'], sweeps=sweeps, progress=progress,
+        )
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f"{prefix}购物车清理完成：弃置删除 {report.get('stale', 0)} 条，商品已删除 {report.get('deleted', 0)} 条，"
+            f"下架置为未选中 {report.get('off_shelf', 0)} 条，涉及用户 {report['users']} 个"
+        ))
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.1 on 2026-10-17 20:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("shopping_cart", "0003_add_db_constraints"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="shoppingcart",
+            name="version",
+            field=models.PositiveBigIntegerField(
+                default=0, verbose_name="最后变更时的购物车版本号"
+            ),
+        ),
+    ]
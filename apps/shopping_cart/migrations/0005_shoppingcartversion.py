@@ -0,0 +1,42 @@
+# Generated by Django 4.2.1 on 2026-10-17 21:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user", "0002_alter_user_avatar_url"),
+        ("shopping_cart", "0004_shoppingcart_version"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ShoppingCartVersion",
+            fields=[
+                (
+                    "user",
+                    models.OneToOneField(
+                        db_column="user_id",
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        serialize=False,
+                        to="user.user",
+                        verbose_name="用户ID",
+                    ),
+                ),
+                (
+                    "version",
+                    models.PositiveBigIntegerField(
+                        default=0, verbose_name="已分配的最大版本号"
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "购物车版本",
+                "verbose_name_plural": "购物车版本",
+                "db_table": "shopping_cart_version",
+            },
+        ),
+    ]
@@ -25,6 +25,10 @@ class ShoppingCart(models.Model):
         default=True,
         verbose_name='是否选中结算'
     )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='最后变更时的购物车版本号'
+    )
     create_time = models.DateTimeField(
         auto_now_add=True,
         verbose_name='加入时间'
@@ -43,3 +47,26 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f"{self.user} - {self.product} × {self.quantity}"
+
+
+class ShoppingCartVersion(models.Model):
+    """每个用户的购物车版本计数器：变更时在同一事务内递增，行锁串行化同一用户的写入。"""
+    user = models.OneToOneField(
+        'user.User',
+        on_delete=models.CASCADE,
+        primary_key=True,
+        db_column='user_id',
+        verbose_name='用户ID'
+    )
+    version = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='已分配的最大版本号'
+    )
+
+    class Meta:
+        db_table = 'shopping_cart_version'
+        verbose_name = '购物车版本'
+        verbose_name_plural = '购物车版本'
+
+    def __str__(self):
+        return f"{self.user_id} v{self.version}"
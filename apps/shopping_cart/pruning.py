@@ -0,0 +1,106 @@
+"""
+购物车清理（定时任务，python manage.py prune_shopping_cart）
+
+三类条目，各自按主键分块处理，每块一条短语句、自动提交，不开长事务、不持有长时间的行锁：
+- stale：update_time 早于 SHOPPING_CART_STALE_DAYS 天前的条目（弃置的购物车），删除
+- deleted：商品已被软删除（is_deleted）的条目，删除
+- off_shelf：商品下架/缺货且仍为选中的条目，置为未选中（保留条目，前端仍可展示“已下架”），
+  不修改 update_time，长期无人处理的最终按 stale 清理
+块内按用户分组，在 versions.change() 与 cart_store.write_through() 内（缓存存储下持有用户锁，先写回 dirty 条目，
+结束后丢弃缓存）按条件复核后写库，打上新版本并记入删除日志，客户端 ?since= 增量同步可以感知清理结果；
+缓存存储下用户锁被占用（该用户正在操作购物车）时跳过，留给下次运行。
+块之间可 sleep，高峰期运行时进一步降低对线上写入的影响。
+"""
+import time
+from collections import defaultdict
+from datetime import timedelta
+from typing import Callable, Dict, List, Optional
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from apps.shopping_cart import cart_store, versions
+from apps.shopping_cart.models import ShoppingCart
+from apps.shopping_cart.services import OFF_SHELF_STATUSES
+
+DEFAULT_CHUNK_SIZE = 1000
+SWEEPS = ('stale', 'deleted', 'off_shelf')
+
+
+def _stale_days() -> int:
+    return getattr(settings, 'SHOPPING_CART_STALE_DAYS', 90)
+
+
+def _conditions(stale_days: int) -> Dict[str, Q]:
+    cutoff = timezone.now() - timedelta(days=stale_days)
+    return {
+        'stale': Q(update_time__lt=cutoff),
+        'deleted': Q(product__is_deleted=True),
+        'off_shelf': Q(product__status__in=OFF_SHELF_STATUSES, selected=True),
+    }
+
+
+def _chunks(condition: Q, chunk_size: int):
+    """按主键 keyset 分块产出 {user_id: [条目 id]}，每块一次索引范围扫描。"""
+    last_id = 0
+    while True:
+        rows = list(ShoppingCart.objects
+                    .filter(condition, id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'user_id')[:chunk_size])
+        if not rows:
+            return
+        last_id = rows[-1][0]
+        by_user: Dict[int, List[int]] = defaultdict(list)
+        for item_id, user_id in rows:
+            by_user[user_id].append(item_id)
+        yield by_user
+
+
+def _remove(user_id: int, ids: List[int], condition: Q) -> int:
+    with versions.change(user_id) as version, cart_store.write_through(user_id):
+        # 复核条件：分块读取之后被用户改动过的条目不再删除
+        ids = list(ShoppingCart.objects.filter(condition, id__in=ids).values_list('id', flat=True))
+        if not ids:
+            return 0
+        deleted, _ = ShoppingCart.objects.filter(id__in=ids).delete()
+        versions.record_removed(user_id, ids, version)
+    return deleted
+
+
+def _unselect(user_id: int, ids: List[int], condition: Q) -> int:
+    with versions.change(user_id) as version, cart_store.write_through(user_id):
+        return ShoppingCart.objects.filter(condition, id__in=ids).update(selected=False, version=version)
+
+
+def prune(
+    stale_days: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    sleep: float = 0,
+    dry_run: bool = False,
+    sweeps=SWEEPS,
+    progress: Optional[Callable[[str, int], None]] = None,
+) -> Dict[str, int]:
+    """执行清理，返回 {sweep: 处理条数, 'users': 涉及用户数}；dry_run 时只统计不修改。"""
+    conditions = _conditions(_stale_days() if stale_days is None else stale_days)
+    report = {name: 0 for name in sweeps}
+    users = set()
+    for name in sweeps:
+        condition = conditions[name]
+        apply = _unselect if name == 'off_shelf' else _remove
+        for by_user in _chunks(condition, chunk_size):
+            for user_id, ids in by_user.items():
+                try:
+                    done = len(ids) if dry_run else apply(user_id, ids, condition)
+                except cart_store.CartBusy:
+                    continue
+                if done:
+                    users.add(user_id)
+                    report[name] += done
+            if progress is not None:
+                progress(name, report[name])
+            if sleep:
+                time.sleep(sleep)
+    report['users'] = len(users)
+    return report
@@ -1,11 +1,18 @@
 from rest_framework import serializers
-from django.conf import settings
 from apps.shopping_cart.models import ShoppingCart
+from utils import assets, image_variants
+from utils.serializers import SparseFieldsMixin
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """
     购物车序列化器：附加商品与店铺信息、金额、图片前缀
+    支持 fields 参数裁剪输出（见 utils.serializers）
     """
+    # 序列化所需的商品列，视图查询时配合 only() 使用
+    PRODUCT_COLUMNS = (
+        'product__name', 'product__thumbnail', 'product__price', 'product__original_price',
+        'product__stock', 'product__status', 'product__store_id', 'product__store__store_name',
+    )
     create_time = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S')
     update_time = serializers.DateTimeField(format='%Y-%m-%d %H:%M:%S')
 
@@ -14,12 +21,8 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
     def _add_prefix(self, path: str | None):
-        if not path:
-            return path
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = getattr(settings, 'IMAGE_URL', '') or ''
-        return base.rstrip('/') + '/' + path.lstrip('/')
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
 
     def to_representation(self, instance: ShoppingCart):
         p = instance.product
@@ -27,6 +30,7 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         rep.update({
             'product_name': p.name,
             'product_image': self._add_prefix(p.thumbnail),
+            'product_image_variants': image_variants.variant_urls(p.thumbnail),
             'unit_price': str(p.price),
             'original_price': str(p.original_price) if p.original_price is not None else None,
             'stock': p.stock,
@@ -35,4 +39,4 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
             'store_name': getattr(p.store, 'store_name', None),
             'amount': str(p.price * instance.quantity),
         })
-        return rep
+        return self.project(rep)
@@ -0,0 +1,74 @@
+"""
+购物车写入服务
+
+add_or_set_item()：加购 / 设定数量的原子 upsert，不再 select_for_update + exists + first + save
+1. 条件 UPDATE：WHERE (user_id, product_id) 命中且 EXISTS(商品可售且 stock >= 新数量)，
+   库存校验与写入在同一条语句内完成
+2. 未更新到行时 INSERT ... SELECT FROM product WHERE 可售且 stock >= 数量，
+   同样在一条语句内校验库存；并发下 (user, product) 唯一约束冲突说明行已被别的请求插入，回到第 1 步重试一次
+3. 两步都没有写入即库存不足（或商品刚被下架）
+全程不持有行锁/间隙锁，同一用户并发加购由唯一约束与单语句原子性保证结果正确。
+"""
+from typing import Optional, Tuple
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from apps.product.models import Product
+from apps.shopping_cart.models import ShoppingCart
+
+OFF_SHELF_STATUSES = ('off_sale', 'out_of_stock')
+
+
+def _sellable(stock_needed) -> Exists:
+    return Exists(
+        Product.objects
+        .filter(id=OuterRef('product_id'), stock__gte=stock_needed)
+        .exclude(status__in=OFF_SHELF_STATUSES)
+    )
+
+
+def _update(user_id: int, product_id: int, quantity: int, mode: str, version: int, now) -> bool:
+    new_quantity = OuterRef('quantity') + quantity if mode == 'add' else quantity
+    updated = (ShoppingCart.objects
+               .filter(user_id=user_id, product_id=product_id)
+               .filter(_sellable(new_quantity))
+               .update(quantity=F('quantity') + quantity if mode == 'add' else quantity, selected=True, version=version, update_time=now))
+    return updated > 0
+
+
+def _insert(user_id: int, product_id: int, quantity: int, version: int, now) -> bool:
+    qn = connection.ops.quote_name
+    cart, product = ShoppingCart._meta.db_table, Product._meta.db_table
+    when = connection.ops.adapt_datetimefield_value(now)
+    sql = (
+        f'INSERT INTO {qn(cart)} ({qn("user_id")}, {qn("product_id")}, {qn("quantity")}, {qn("selected")}, {qn("version")}, '
+        f'{qn("create_time")}, {qn("update_time")}) '
+        f'SELECT %s, {qn("id")}, %s, %s, %s, %s, %s FROM {qn(product)} '
+        f'WHERE {qn("id")} = %s AND {qn("stock")} >= %s AND {qn("status")} NOT IN (%s, %s)'
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [user_id, quantity, True, version, when, when, product_id, quantity, *OFF_SHELF_STATUSES])
+        return cursor.rowcount > 0
+
+
+def add_or_set_item(user_id: int, product_id: int, quantity: int, mode: str, version: int) -> Tuple[Optional[ShoppingCart], bool]:
+    """mode=add 在原数量上累加，mode=set 设为 quantity；均置为选中并记下购物车版本号 version。
+
+    返回 (条目, 是否新建)；库存不足或商品不可售时返回 (None, False)。
+    """
+    now = timezone.now()
+    created = False
+    if not _update(user_id, product_id, quantity, mode, version, now):
+        try:
+            with transaction.atomic():
+                created = _insert(user_id, product_id, quantity, version, now)
+        except IntegrityError:
+            # 并发请求已插入同一 (user, product)：按已有行再做一次条件更新
+            if not _update(user_id, product_id, quantity, mode, version, now):
+                return None, False
+        else:
+            if not created:
+                return None, False
+    return ShoppingCart.objects.get(user_id=user_id, product_id=product_id), created
@@ -1,3 +1,418 @@
-from django.test import TestCase
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from apps.product.models import Category, Product
+from apps.shopping_cart import cart_store, guest_cart, pruning, services, versions
+from apps.shopping_cart.models import ShoppingCart, ShoppingCartVersion
+from apps.store.models import Store
+from apps.user.models import User
+from utils.error_codes import Codes
+from utils.jwt_auth import generate_token
+
+
+class CartTestMixin:
+    """建用户、店铺与两件商品，self.client 带登录令牌。
+
+    版本号在事务提交后才发布（on_commit），因此用 TransactionTestCase。
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create(username='u1', phone='13800000000', password='x')
+        store = Store.objects.create(store_name='s1', owner=self.user, status='active')
+        category = Category.objects.create(name='手机', parent_id=0)
+        self.products = [
+            Product.objects.create(name=f'商品{i}', price='10.00', category=category, store=store, stock=10, status='on_sale')
+            for i in range(2)
+        ]
+        self.client = APIClient()
+        self.client.credentials(HTTP_TOKEN=generate_token(self.user.id, self.user.username))
+
+    def add(self, product, quantity=1, mode='add'):
+        return self.client.post('/shopping_cart/', {'product_id': product.id, 'quantity': quantity, 'mode': mode}, format='json')
+
+    def poll(self, since=None):
+        return self.client.get('/shopping_cart/', {} if since is None else {'since': since})
+
+
+class AddOrSetItemTests(CartTestMixin, TransactionTestCase):
+    """加购 / 设定数量的条件 upsert。"""
+
+    def test_add_rejects_over_stock(self):
+        response = self.add(self.products[0], 11)
+        self.assertEqual(response.json()['code'], Codes.STOCK_NOT_ENOUGH)
+        self.assertFalse(ShoppingCart.objects.exists())
+
+        self.add(self.products[0], 6)
+        response = self.add(self.products[0], 6)
+        self.assertEqual(response.json()['code'], Codes.STOCK_NOT_ENOUGH)
+        self.assertEqual(ShoppingCart.objects.get().quantity, 6)
+
+    def test_set_rejects_over_stock(self):
+        self.add(self.products[0], 2)
+        response = self.add(self.products[0], 11, mode='set')
+        self.assertEqual(response.json()['code'], Codes.STOCK_NOT_ENOUGH)
+        # 绕过视图预检，由条件 UPDATE 拒绝
+        self.assertEqual(services.add_or_set_item(self.user.id, self.products[0].id, 11, 'set', 99), (None, False))
+        self.assertEqual(ShoppingCart.objects.get().quantity, 2)
+
+    def test_add_then_set(self):
+        self.add(self.products[0], 2)
+        response = self.add(self.products[0], 3)
+        self.assertEqual(response.json()['code'], Codes.CART_ADD_OR_UPDATE_OK)
+        self.assertEqual(response.json()['data']['item']['quantity'], 5)
+        response = self.add(self.products[0], 4, mode='set')
+        self.assertEqual(response.json()['code'], Codes.CART_SET_OK)
+        self.assertEqual(ShoppingCart.objects.get().quantity, 4)
+
+    def test_insert_writes_version(self):
+        item, created = services.add_or_set_item(self.user.id, self.products[0].id, 2, 'add', 41)
+        self.assertTrue(created)
+        self.assertEqual((item.quantity, item.version), (2, 41))
+        response = self.add(self.products[1])
+        data = response.json()['data']
+        self.assertTrue(data['created'])
+        self.assertEqual(ShoppingCart.objects.get(id=data['item']['id']).version, data['version'])
+
+    def _racing_update(self):
+        """第一次条件 UPDATE 未命中（并发请求随后插入了同一行），之后按真实实现执行。"""
+        real, calls = services._update, []
+
+        def update(*args):
+            calls.append(args)
+            return False if len(calls) == 1 else real(*args)
+        return mock.patch.object(services, '_update', side_effect=update), calls
+
+    def test_integrity_error_retries_update(self):
+        ShoppingCart.objects.create(user=self.user, product=self.products[0], quantity=2, version=1)
+        patch, calls = self._racing_update()
+        with patch:
+            item, created = services.add_or_set_item(self.user.id, self.products[0].id, 3, 'add', 42)
+        self.assertEqual(len(calls), 2)
+        self.assertFalse(created)
+        self.assertEqual((item.quantity, item.version), (5, 42))
+
+    def test_integrity_error_retry_rejects_over_stock(self):
+        ShoppingCart.objects.create(user=self.user, product=self.products[0], quantity=8, version=1)
+        patch, _ = self._racing_update()
+        with patch:
+            self.assertEqual(services.add_or_set_item(self.user.id, self.products[0].id, 3, 'add', 42), (None, False))
+        self.assertEqual(ShoppingCart.objects.get().quantity, 8)
+
+
+class CartSinceTests(CartTestMixin, TransactionTestCase):
+    """GET /shopping_cart/?since= 增量同步。"""
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.add(p).json()['data']['item']['id'] for p in self.products]
+        self.version = self.poll().json()['data']['version']
+
+    def test_changed(self):
+        self.client.patch(f'/shopping_cart/item/{self.ids[0]}/', {'quantity': 3}, format='json')
+        data = self.poll(since=self.version).json()['data']
+        self.assertFalse(data['full'])
+        self.assertEqual([(i['id'], i['quantity']) for i in data['changed']], [(self.ids[0], 3)])
+        self.assertEqual(data['removed'], [])
+        self.assertGreater(data['version'], self.version)
+
+    def test_removed(self):
+        self.client.delete(f'/shopping_cart/item/{self.ids[1]}/')
+        data = self.poll(since=self.version).json()['data']
+        self.assertFalse(data['full'])
+        self.assertEqual(data['changed'], [])
+        self.assertEqual(data['removed'], [self.ids[1]])
+
+    def test_not_modified(self):
+        self.assertEqual(self.poll(since=self.version).status_code, 304)
+        self.client.patch(f'/shopping_cart/item/{self.ids[0]}/', {'selected': False}, format='json')
+        version = self.poll(since=self.version).json()['data']['version']
+        self.assertEqual(self.poll(since=version).status_code, 304)
+
+    def test_full_when_log_lost(self):
+        # 删除日志被淘汰：更早的 since 无法判断删除了什么，返回全量
+        cache.delete(f'{versions.REMOVED_PREFIX}{self.user.id}')
+        self.client.delete(f'/shopping_cart/item/{self.ids[1]}/')
+        data = self.poll(since=self.version).json()['data']
+        self.assertTrue(data['full'])
+        self.assertEqual([i['id'] for i in data['items']], [self.ids[0]])
+
+    def test_without_since(self):
+        data = self.poll().json()['data']
+        self.assertNotIn('full', data)
+        self.assertEqual(len(data['items']), 2)
+
+
+class CartConcurrencyTests(CartTestMixin, TransactionTestCase):
+    """数据库存储下写入不取共享缓存上的用户锁，同一用户的写入由版本计数器行锁串行化。"""
+
+    def hold_user_lock(self):
+        cache.add(f'{cart_store.LOCK_PREFIX}{self.user.id}', 'other', 60)
+
+    def test_db_store_ignores_user_lock(self):
+        self.hold_user_lock()
+        item_id = self.add(self.products[0]).json()['data']['item']['id']
+        self.assertEqual(self.add(self.products[0]).status_code, 200)
+        response = self.client.post('/shopping_cart/batch_update', {'items': [{'id': item_id, 'quantity': 3}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(f'/shopping_cart/item/{item_id}/').status_code, 200)
+        self.assertEqual(self.poll().status_code, 200)
+
+    @override_settings(SHOPPING_CART_STORE='cache', SHOPPING_CART_FLUSH_INTERVAL=3600)
+    def test_cache_store_waits_for_user_lock(self):
+        self.hold_user_lock()
+        with mock.patch.object(cart_store, 'LOCK_WAIT', 0.05):
+            self.assertEqual(self.add(self.products[0]).status_code, 409)
+
+    def test_versions_increase(self):
+        first = self.add(self.products[0]).json()['data']['version']
+        second = self.add(self.products[1]).json()['data']['version']
+        self.assertEqual(second, first + 1)
+        self.assertEqual(ShoppingCartVersion.objects.get(user=self.user).version, second)
+        self.assertEqual(self.poll().json()['data']['version'], second)
+
+    @skipUnlessDBFeature('has_select_for_update')
+    def test_concurrent_adds(self):
+        products = self.products + [
+            Product.objects.create(name=f'商品{i}', price='10.00', category=self.products[0].category,
+                                   store=self.products[0].store, stock=10, status='on_sale')
+            for i in range(2, 6)
+        ]
+        responses = []
+
+        def add(product):
+            try:
+                responses.append(self.add(product))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=add, args=(p,)) for p in products]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual([r.status_code for r in responses], [200] * len(products))
+        self.assertEqual(len({r.json()['data']['version'] for r in responses}), len(products))
+        self.assertEqual(ShoppingCart.objects.filter(user=self.user).count(), len(products))
+
+
+@override_settings(SHOPPING_CART_STORE='cache', SHOPPING_CART_FLUSH_INTERVAL=3600)
+class CartStoreLockTests(CartTestMixin, TransactionTestCase):
+    """缓存存储的用户锁：锁被占用时的读取与长时间持锁的续期。"""
+
+    def test_busy_read_prefers_cached_rows(self):
+        item_id = self.add(self.products[0]).json()['data']['item']['id']
+        self.client.patch(f'/shopping_cart/item/{item_id}/', {'quantity': 4}, format='json')
+        # 修改尚未写回数据库
+        self.assertEqual(ShoppingCart.objects.get().quantity, 1)
+        key = cart_store._key(self.user.id)
+        rows = cache.get(key)
+
+        def add(lock_key, *args, **kwargs):
+            # 等锁期间其它请求回填了缓存
+            cache.set(key, rows)
+            return False
+
+        cache.delete(key)
+        with mock.patch.object(cart_store, 'LOCK_WAIT', 0.05), mock.patch.object(cache, 'add', side_effect=add):
+            items = cart_store.get_items(self.user.id)
+        self.assertEqual([i.quantity for i in items], [4])
+
+    def test_lock_renewed_while_held(self):
+        key = f'{cart_store.LOCK_PREFIX}{self.user.id}'
+        with mock.patch.object(cart_store, 'LOCK_TIMEOUT', 0.3), cart_store.user_lock(self.user.id):
+            token = cache.get(key)
+            self.assertTrue(cart_store._renewer.is_alive())
+            # 续期线程的一轮：持有超过 LOCK_TIMEOUT 仍不失去锁
+            time.sleep(0.2)
+            cart_store._renew()
+            time.sleep(0.2)
+            self.assertEqual(cache.get(key), token)
+        self.assertIsNone(cache.get(key))
+
+
+class CartVersionInterleaveTests(CartTestMixin, TransactionTestCase):
+    """写入进行中插入读取：读取方拿到的版本不能超前于它看到的数据。"""
+
+    def _interleave(self, target, name):
+        item_id = self.add(self.products[0]).json()['data']['item']['id']
+        before = self.poll().json()['data']['version']
+        seen = {}
+        original = getattr(target, name)
+
+        def write(*args, **kwargs):
+            # 版本已分配、条目尚未写入时另一个请求读取购物车
+            seen['version'] = self.poll().json()['data']['version']
+            return original(*args, **kwargs)
+
+        with mock.patch.object(target, name, side_effect=write):
+            response = self.client.patch(f'/shopping_cart/item/{item_id}/', {'quantity': 3}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(seen['version'], before)
+
+        delta = self.poll(since=seen['version'])
+        self.assertEqual(delta.status_code, 200)
+        data = delta.json()['data']
+        self.assertEqual([(i['id'], i['quantity']) for i in data['changed']], [(item_id, 3)])
+        self.assertEqual(self.poll(since=data['version']).status_code, 304)
+
+    def test_db_store(self):
+        self._interleave(ShoppingCart.objects, 'bulk_update')
+
+    @override_settings(SHOPPING_CART_STORE='cache', SHOPPING_CART_FLUSH_INTERVAL=3600)
+    def test_cache_store(self):
+        self._interleave(cart_store, 'update_items')
+
+
+class GuestCartMergeTests(CartTestMixin, TransactionTestCase):
+    """游客购物车并入用户购物车：数量累加按库存截断，同一游客购物车只合并一次。"""
+
+    def setUp(self):
+        super().setUp()
+        self.guest = APIClient()
+        response = self.guest.post('/shopping_cart/guest/', {'product_id': self.products[0].id, 'quantity': 5}, format='json')
+        self.token = response.json()['data']['guest_token']
+        self.guest.post('/shopping_cart/guest/', {'product_id': self.products[1].id, 'quantity': 2}, format='json', HTTP_GUEST_TOKEN=self.token)
+
+    def cart(self):
+        return dict(ShoppingCart.objects.filter(user=self.user).values_list('product_id', 'quantity'))
+
+    def merge(self):
+        return self.client.post('/shopping_cart/guest/merge', {'guest_token': self.token}, format='json').json()['data']
+
+    def test_merge_caps_at_stock(self):
+        self.add(self.products[0], 8)
+        data = self.merge()
+        self.assertEqual((data['merged'], data['skipped']), (2, []))
+        self.assertEqual(self.cart(), {self.products[0].id: 10, self.products[1].id: 2})
+        self.assertEqual(guest_cart.load(self.token), {})
+        self.assertEqual(self.poll().json()['data']['version'], data['version'])
+
+    def test_skips_off_shelf(self):
+        Product.objects.filter(id=self.products[1].id).update(status='off_sale')
+        data = self.merge()
+        self.assertEqual(data['skipped'], [{'product_id': self.products[1].id, 'reason': 'off_shelf'}])
+        self.assertEqual(self.cart(), {self.products[0].id: 5})
+
+    def test_double_merge_adds_once(self):
+        self.merge()
+        data = self.merge()
+        self.assertEqual(data['merged'], 0)
+        self.assertEqual(self.cart(), {self.products[0].id: 5, self.products[1].id: 2})
+
+    def test_claimed_merge_is_skipped(self):
+        # 另一个请求正在合并
+        cache.add(f'{guest_cart.CLAIM_PREFIX}{self.token}', 0, 60)
+        self.assertEqual(guest_cart.merge(self.token, self.user.id)['merged'], 0)
+        self.assertEqual(self.cart(), {})
+        self.assertEqual(len(guest_cart.load(self.token)), 2)
+
+    def test_failed_merge_keeps_guest_cart(self):
+        with mock.patch.object(guest_cart, '_merge', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                guest_cart.merge(self.token, self.user.id)
+        self.assertEqual(len(guest_cart.load(self.token)), 2)
+        self.assertEqual(guest_cart.merge(self.token, self.user.id)['merged'], 2)
+
+
+class BatchUpdateTests(CartTestMixin, TransactionTestCase):
+    """批量修改数量/选中：整批校验，全部通过才以同一版本写入。"""
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.add(p).json()['data']['item']['id'] for p in self.products]
+        self.version = self.poll().json()['data']['version']
+
+    def batch(self, items):
+        return self.client.post('/shopping_cart/batch_update', {'items': items}, format='json')
+
+    def cart(self):
+        return dict(ShoppingCart.objects.values_list('id', 'quantity'))
+
+    def test_updates_in_one_version(self):
+        response = self.batch([{'id': self.ids[0], 'quantity': 3}, {'id': self.ids[1], 'selected': False}])
+        data = response.json()['data']
+        self.assertEqual((response.json()['code'], data['updated']), (Codes.CART_BATCH_UPDATE_OK, 2))
+        self.assertEqual(set(ShoppingCart.objects.values_list('version', flat=True)), {data['version']})
+        delta = self.poll(since=self.version).json()['data']
+        self.assertEqual(sorted((i['id'], i['quantity'], i['selected']) for i in delta['changed']),
+                         [(self.ids[0], 3, True), (self.ids[1], 1, False)])
+
+    def test_partial_failure_changes_nothing(self):
+        response = self.batch([{'id': self.ids[0], 'quantity': 3}, {'id': self.ids[1], 'quantity': 11}])
+        self.assertEqual(response.json()['code'], Codes.CART_PARTIAL_VALIDATE_FAILED)
+        self.assertEqual(response.json()['errors'][str(self.ids[1])]['code'], Codes.STOCK_NOT_ENOUGH)
+        self.assertEqual(self.cart(), {self.ids[0]: 1, self.ids[1]: 1})
+        # 校验失败回滚，不产生空版本
+        self.assertEqual(self.poll(since=self.version).status_code, 304)
+
+    def test_missing_and_duplicate_ids(self):
+        other = User.objects.create(username='u2', phone='13900000000', password='x')
+        foreign = ShoppingCart.objects.create(user=other, product=self.products[0], quantity=1)
+        response = self.batch([{'id': self.ids[0], 'quantity': 2}, {'id': foreign.id, 'quantity': 2}])
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json()['errors']['missing'], [foreign.id])
+        response = self.batch([{'id': self.ids[0], 'quantity': 2}, {'id': self.ids[0], 'selected': False}])
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.cart()[self.ids[0]], 1)
+
+    @override_settings(SHOPPING_CART_STORE='cache', SHOPPING_CART_FLUSH_INTERVAL=3600)
+    def test_cache_store_writes_behind(self):
+        self.assertEqual(self.batch([{'id': self.ids[0], 'quantity': 4}]).status_code, 200)
+        self.assertEqual(self.cart()[self.ids[0]], 1)
+        self.assertEqual(self.poll().json()['data']['items'][0]['quantity'], 4)
+        cart_store.flush_user(self.user.id)
+        self.assertEqual(self.cart()[self.ids[0]], 4)
+
+
+class PruningTests(CartTestMixin, TransactionTestCase):
+    """购物车清理：弃置与商品已删除的条目删除，下架条目取消选中，结果经 ?since= 可见。"""
+
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.add(p).json()['data']['item']['id'] for p in self.products]
+        self.version = self.poll().json()['data']['version']
+
+    def test_prune(self):
+        stale_id = self.add(self.products[1]).json()['data']['item']['id']
+        ShoppingCart.objects.filter(id=stale_id).update(update_time=timezone.now() - timedelta(days=100))
+        Product.objects.filter(id=self.products[0].id).update(status='off_sale')
+        report = pruning.prune(stale_days=90)
+        self.assertEqual(report, {'stale': 1, 'deleted': 0, 'off_shelf': 1, 'users': 1})
+        self.assertEqual(list(ShoppingCart.objects.values_list('id', 'selected')), [(self.ids[0], False)])
+        delta = self.poll(since=self.version).json()['data']
+        self.assertEqual(delta['removed'], [stale_id])
+        self.assertEqual([i['id'] for i in delta['changed']], [self.ids[0]])
+
+    def test_deleted_products(self):
+        Product.objects.filter(id=self.products[1].id).update(is_deleted=True)
+        self.assertEqual(pruning.prune(sweeps=('deleted',))['deleted'], 1)
+        self.assertEqual(list(ShoppingCart.objects.values_list('id', flat=True)), [self.ids[0]])
+
+    def test_dry_run(self):
+        Product.objects.update(is_deleted=True)
+        self.assertEqual(pruning.prune(dry_run=True, sweeps=('deleted',))['deleted'], 2)
+        self.assertEqual(ShoppingCart.objects.count(), 2)
+        self.assertEqual(self.poll(since=self.version).status_code, 304)
+
+    def test_rechecks_condition(self):
+        # 分块读取之后被用户改动过（不再弃置）的条目不删除
+        condition = pruning._conditions(90)['stale']
+        self.assertEqual(pruning._remove(self.user.id, self.ids, condition), 0)
+        self.assertEqual(ShoppingCart.objects.count(), 2)
+
+    @override_settings(SHOPPING_CART_STORE='cache', SHOPPING_CART_FLUSH_INTERVAL=3600)
+    def test_cache_store_skips_busy_user(self):
+        Product.objects.update(is_deleted=True)
+        cache.add(f'{cart_store.LOCK_PREFIX}{self.user.id}', 'other', 60)
+        with mock.patch.object(cart_store, 'LOCK_WAIT', 0.05):
+            self.assertEqual(pruning.prune(sweeps=('deleted',)), {'deleted': 0, 'users': 0})
+        self.assertEqual(ShoppingCart.objects.count(), 2)
@@ -2,14 +2,20 @@ from django.urls import path
 from .views import (
     ShoppingCartListCreateAPIView,
     ShoppingCartItemAPIView,
+    ShoppingCartBatchUpdateAPIView,
     ShoppingCartSelectAllAPIView,
     ShoppingCartClearAPIView,
+    GuestCartAPIView,
+    GuestCartMergeAPIView,
 )
 
 
 urlpatterns = [
     path("", ShoppingCartListCreateAPIView.as_view(), name="shopping_cart_list_create"),
     path("item/<int:pk>/", ShoppingCartItemAPIView.as_view(), name="shopping_cart_item"),
+    path("batch_update", ShoppingCartBatchUpdateAPIView.as_view(), name="shopping_cart_batch_update"),
     path("select_all", ShoppingCartSelectAllAPIView.as_view(), name="shopping_cart_select_all"),
     path("clear", ShoppingCartClearAPIView.as_view(), name="shopping_cart_clear"),
+    path("guest/", GuestCartAPIView.as_view(), name="shopping_cart_guest"),
+    path("guest/merge", GuestCartMergeAPIView.as_view(), name="shopping_cart_guest_merge"),
 ]
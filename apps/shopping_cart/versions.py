@@ -0,0 +1,117 @@
+"""
+购物车版本号与增量同步
+
+- 每个用户一个单调递增的购物车版本号，计数器存放在 shopping_cart_version 表；任何条目变更都在 change() 内进行：
+  在事务内递增计数器分配新版本，变更的条目把该版本写入自身的 version 字段，与计数器一同提交。
+  计数器行锁串行化同一用户的写入（等待行锁而非失败），数据库存储下不再经过共享缓存上的用户锁；
+  启用缓存存储时仍先取用户锁（见 cart_store.locked），保证加锁顺序一致
+- 分配的版本在写入提交后才发布为“已提交版本”，current() 与所有购物车接口的响应只返回已提交版本：
+  读取方拿到版本 v 时，版本不大于 v 的变更都已可见，不会出现“新版本号 + 旧数据”导致下一次 304 漏掉变更
+- 已提交版本缓存在共享缓存中，缺失时读计数器表（他人未提交的递增不可见）；
+  计数器首次创建时以毫秒时间戳起算（与分类树等缓存的版本号做法一致）
+- 删除的条目记入按用户的删除日志 [(版本, 条目 id), ...]，至多保留 MAX_REMOVED 条；
+  floor 以下的删除可能已丢失（日志截断或被淘汰），since 早于 floor 时客户端需全量刷新
+- GET /shopping_cart/?since=v：version > v 的条目为变更，日志中版本 > v 的 id 为删除；
+  since 等于已提交版本时返回 304
+"""
+import time
+from contextlib import contextmanager
+from typing import Iterable, List, Optional
+
+from django.core.cache import cache
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from apps.shopping_cart.cart_store import locked
+from apps.shopping_cart.models import ShoppingCartVersion
+
+COMMITTED_PREFIX = 'shopping_cart:committed:'
+REMOVED_PREFIX = 'shopping_cart:removed:'
+MAX_REMOVED = 500
+
+
+def _fresh_version() -> int:
+    return int(time.time() * 1000)
+
+
+def _counter(user_id: int) -> int:
+    return ShoppingCartVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def _allocate(user_id: int) -> int:
+    """递增并返回新版本号（调用方在事务内，行锁持有到提交）。"""
+    counters = ShoppingCartVersion.objects.filter(user_id=user_id)
+    if counters.update(version=F('version') + 1):
+        return _counter(user_id)
+    version = _fresh_version()
+    try:
+        with transaction.atomic():
+            ShoppingCartVersion.objects.create(user_id=user_id, version=version)
+    except IntegrityError:
+        # 并发的首次写入已建好计数器
+        return _allocate(user_id)
+    # 计数器起算时同时开一份空的删除日志：此前的删除都早于新版本，无需再记
+    cache.set(f'{REMOVED_PREFIX}{user_id}', {'floor': version, 'removed': []}, timeout=None)
+    return version
+
+
+def _publish(user_id: int, version: int) -> None:
+    # 并发提交的发布顺序不定，只前进不后退；极少数交错下发布了较小值也只是版本落后于数据，客户端多拉一次
+    key = f'{COMMITTED_PREFIX}{user_id}'
+    if (cache.get(key) or 0) < version:
+        cache.set(key, version, timeout=None)
+
+
+@contextmanager
+def change(user_id: int):
+    """
+    一次购物车变更：在事务内分配新版本号，块内写入；事务提交后才发布为已提交版本。
+    位于外层事务中时，计数器行锁持有到外层提交，发布也随之推迟。
+    """
+    with locked(user_id), transaction.atomic():
+        version = _allocate(user_id)
+        transaction.on_commit(lambda: _publish(user_id, version))
+        yield version
+
+
+def current(user_id: int) -> int:
+    """已提交版本；从未写入过的用户为 0。"""
+    key = f'{COMMITTED_PREFIX}{user_id}'
+    version = cache.get(key)
+    if version is None:
+        version = _counter(user_id)
+        cache.add(key, version, timeout=None)
+    return version
+
+
+def _load_log(user_id: int) -> dict:
+    key = f'{REMOVED_PREFIX}{user_id}'
+    log = cache.get(key)
+    if log is None:
+        # 日志被淘汰：之前的删除无从得知，以计数器当前值为下界，此前的 since 一律全量刷新
+        floor = _counter(user_id)
+        cache.add(key, {'floor': floor, 'removed': []}, timeout=None)
+        log = cache.get(key) or {'floor': floor, 'removed': []}
+    return log
+
+
+def record_removed(user_id: int, item_ids: Iterable[int], version: int) -> None:
+    """在 change() 块内调用：计数器行锁串行化同一用户日志的读改写。"""
+    item_ids = list(item_ids)
+    if not item_ids:
+        return
+    log = _load_log(user_id)
+    removed = log['removed'] + [(version, item_id) for item_id in item_ids]
+    if len(removed) > MAX_REMOVED:
+        dropped, removed = removed[:-MAX_REMOVED], removed[-MAX_REMOVED:]
+        log['floor'] = max(log['floor'], dropped[-1][0])
+    log['removed'] = removed
+    cache.set(f'{REMOVED_PREFIX}{user_id}', log, timeout=None)
+
+
+def removed_since(user_id: int, since: int) -> Optional[List[int]]:
+    """返回版本 since 之后删除的条目 id；since 早于日志下界时返回 None（需全量刷新）。"""
+    log = _load_log(user_id)
+    if since < log['floor']:
+        return None
+    return [item_id for version, item_id in log['removed'] if version > since]
@@ -3,39 +3,56 @@ Shopping Cart 模块视图（扩展版）
 
 接口一览：
 - GET    /shopping_cart/                     列表+汇总（基于 Token 用户）
+- GET    /shopping_cart/?since=<version>     增量：版本之后变更/删除的条目，未变化返回 304
 - POST   /shopping_cart/                     添加 / 增量 / 设定数量  mode=add|set
 - PATCH  /shopping_cart/item/<id>/           修改数量或选中状态
 - DELETE /shopping_cart/item/<id>/           删除条目
+- POST   /shopping_cart/batch_update         批量修改数量/选中 {items:[{id, quantity?, selected?}]}
 - POST   /shopping_cart/select_all           全选 / 全不选 {selected:bool}
 - POST   /shopping_cart/clear                清空购物车 {only_selected:bool}
+- GET    /shopping_cart/guest/               游客购物车列表+汇总（请求头 Guest-Token，无需登录）
+- POST   /shopping_cart/guest/               游客加购 / 设定数量，未带令牌时签发新令牌
+- DELETE /shopping_cart/guest/?product_id=   游客删除条目，不带 product_id 时清空
+- POST   /shopping_cart/guest/merge          已登录用户并入游客购物车（登录接口带 guest_token 时自动合并）
 
 注意：
 1. 已移除对 user_id 查询参数的依赖；若前端仍传，后端忽略，以 Token 解析为准。
 2. 认证：使用自定义 JWT 方案，在 request.auth 中读取 payload['user_id']；未携带 Token 返回 4101。
-3. 错误码：
+3. 所有响应带 version（用户购物车版本号，单调递增，见 versions）；客户端据此用 ?since= 增量同步。
+4. SHOPPING_CART_STORE=cache 时条目读写经共享缓存（见 cart_store），修改数量/选中异步批量写回数据库。
+5. 错误码：
    - 3000 列表成功
    - 3001 增量添加 / 更新成功
    - 3003 设定数量成功
    - 3002 条目被移除
    - 3004 清空成功
+   - 3005 批量更新成功
+   - 3006 游客购物车合并成功
    - 3400 参数错误
    - 3402 库存不足
    - 3404 商品已下架
+   - 3407 批量更新中部分条目校验失败（整批不生效）
    - 4101 未登录
 """
 
-from typing import Dict, Any, List
+from decimal import Decimal
+from typing import Dict, Any, List, Optional, Tuple
 from django.db import transaction
-from django.db.models import F, QuerySet
+from django.db.models import Count, DecimalField, F, QuerySet, Sum
 from rest_framework.views import APIView
 from rest_framework.request import Request
 from rest_framework.generics import GenericAPIView
-from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponseNotModified
+from django.utils import timezone
 from utils.renderer import CustomResponse
 from utils.error_codes import Codes
+from apps.shopping_cart import cart_store, guest_cart, services, versions
 from apps.shopping_cart.models import ShoppingCart
 from apps.shopping_cart.serializers import ShoppingCartSerializer
 from apps.product.models import Product
+from utils.serializers import requested_fields
+
+AMOUNT_FIELD = DecimalField(max_digits=14, decimal_places=2)
 
 
 # ====================== 工具函数 ======================
@@ -51,126 +68,235 @@ def _get_user_id(request: Request):
     return payload['user_id']
 
 
-def _build_summary(qs: QuerySet) -> Dict[str, Any]:
-    total_count = qs.count()
-    items = list(qs)
-    selected_items = [i for i in items if i.selected]
+def _cart_queryset(user_id) -> QuerySet:
+    """用户购物车查询：只取序列化与汇总用到的商品/店铺列。"""
+    cart_columns = [f.name for f in ShoppingCart._meta.concrete_fields]
+    return (
+        ShoppingCart.objects.filter(user_id=user_id)
+        .select_related('product', 'product__store')
+        .only(*cart_columns, *ShoppingCartSerializer.PRODUCT_COLUMNS)
+    )
 
-    def price(p: Product):
-        return p.price
 
-    selected_amount = sum(price(i.product) * i.quantity for i in selected_items)
-    total_amount = sum(price(i.product) * i.quantity for i in items)
-    # 按店铺分组（仅选中项）
-    per_store: Dict[int, Dict[str, Any]] = {}
-    for i in selected_items:
-        sid = i.product.store_id
-        if sid not in per_store:
-            per_store[sid] = {
-                'store_id': sid,
-                'store_name': getattr(i.product.store, 'store_name', None),
-                'selected_subtotal': 0
-            }
-        per_store[sid]['selected_subtotal'] += price(i.product) * i.quantity
-    # 转换格式与字符串化金额
-    def m(val):
-        return str(val)
+def _load_items(user_id) -> List[ShoppingCart]:
+    """用户全部条目（含商品/店铺）：缓存存储启用时读缓存，否则查库。"""
+    if cart_store.enabled():
+        return cart_store.get_items(user_id, ShoppingCartSerializer.PRODUCT_COLUMNS)
+    return list(_cart_queryset(user_id))
+
+
+def _find_items(user_id, ids) -> Dict[int, ShoppingCart]:
+    """按 id 取用户的若干条目（含商品），不属于该用户的 id 不返回。"""
+    if cart_store.enabled():
+        wanted = set(ids)
+        return {i.id: i for i in cart_store.get_items(user_id, ShoppingCartSerializer.PRODUCT_COLUMNS) if i.id in wanted}
+    return {i.id: i for i in _cart_queryset(user_id).filter(id__in=ids)}
+
+
+def _write_items(user_id, items: List[ShoppingCart], version: int) -> None:
+    """在 versions.change() 块内写入数量/选中的修改：缓存存储下写缓存并异步回写，否则一次 bulk_update。"""
+    # bulk_update 不触发 auto_now，手动刷新更新时间
+    now = timezone.now()
+    for i in items:
+        i.version = version
+        i.update_time = now
+    if cart_store.enabled():
+        cart_store.update_items(user_id, items)
+    else:
+        ShoppingCart.objects.bulk_update(items, ['quantity', 'selected', 'version', 'update_time'])
+
+
+def _save_items(user_id, items: List[ShoppingCart]) -> int:
+    """保存数量/选中的修改并打上新版本号，返回该版本。"""
+    with versions.change(user_id) as version:
+        _write_items(user_id, items, version)
+    return version
+
+
+def _remove_items(user_id, queryset: QuerySet) -> Tuple[int, int]:
+    """同步删除条目并记入删除日志，返回 (删除条数, 版本号)。"""
+    with cart_store.locked(user_id):
+        if not queryset.exists():
+            return 0, versions.current(user_id)
+        with versions.change(user_id) as version, cart_store.write_through(user_id):
+            # 在计数器行锁内取 id，与删除之间不会被同一用户的其它写入改动
+            ids = list(queryset.values_list('id', flat=True))
+            deleted, _ = ShoppingCart.objects.filter(id__in=ids).delete()
+            versions.record_removed(user_id, ids, version)
+    return deleted, version
+
+
+def _parse_add_request(data) -> Tuple[Optional[Product], int, str, Optional[CustomResponse]]:
+    """校验加购参数 {product_id, quantity, mode} 并取出商品，返回 (商品, 数量, mode, 错误响应)。"""
+    product_id = data.get('product_id')
+    quantity = data.get('quantity')
+    mode = (data.get('mode') or 'add').lower()
+    if product_id is None or quantity is None:
+        return None, 0, mode, CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='缺少参数', errors={'product_id': 'required', 'quantity': 'required'}, status=400)
+    try:
+        product_id = int(product_id)
+        quantity = int(quantity)
+    except (TypeError, ValueError):
+        return None, 0, mode, CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='参数格式错误', errors={'product_id': 'int', 'quantity': 'int'}, status=400)
+    if mode not in ('add', 'set'):
+        return None, quantity, mode, CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='mode 仅支持 add/set', errors={'mode': 'invalid'}, status=400)
+    if quantity <= 0:
+        return None, quantity, mode, CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='数量必须大于0', errors={'quantity': 'gt0'}, status=400)
+    # 获取商品
+    try:
+        product = Product.objects.select_related('store').get(id=product_id, is_deleted=False)
+    except Product.DoesNotExist:
+        return None, quantity, mode, CustomResponse(code=Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR, msg='商品不存在', status=404)
+    if product.status in ('off_sale', 'out_of_stock'):
+        return None, quantity, mode, CustomResponse(code=Codes.PRODUCT_OFF_SHELF, msg='商品已下架或缺货', status=400)
+    return product, quantity, mode, None
+
+
+MONEY = Decimal('0.01')
+
+
+def _money(val) -> str:
+    return str(Decimal(val or 0).quantize(MONEY))
+
+
+def _summary(total_count: int, total_amount, selected_count: int, selected_amount, per_store: Dict[int, Dict[str, Any]]) -> Dict[str, Any]:
     stores = [
         {
             'store_id': v['store_id'],
             'store_name': v['store_name'],
-            'selected_subtotal': m(v['selected_subtotal'])
-        } for v in per_store.values()
+            'selected_subtotal': _money(v['selected_subtotal'])
+        } for _, v in sorted(per_store.items())
     ]
     return {
         'total_count': total_count,
-        'selected_count': len(selected_items),
-        'total_amount': m(total_amount),
-        'selected_amount': m(selected_amount),
+        'selected_count': selected_count,
+        'total_amount': _money(total_amount),
+        'selected_amount': _money(selected_amount),
         'discount_amount': '0.00',  # 预留
-        'payable_amount': m(selected_amount),
+        'payable_amount': _money(selected_amount),
         'stores': stores
     }
 
 
+def _summarize_items(items: List[ShoppingCart]) -> Dict[str, Any]:
+    """由已加载（含商品/店铺）的条目一次遍历得出汇总，不再查询数据库。"""
+    total_amount = selected_amount = Decimal(0)
+    selected_count = 0
+    # 按店铺分组（仅选中项），输出按 store_id 排序，与聚合查询一致
+    per_store: Dict[int, Dict[str, Any]] = {}
+    for i in items:
+        amount = i.product.price * i.quantity
+        total_amount += amount
+        if not i.selected:
+            continue
+        selected_count += 1
+        selected_amount += amount
+        sid = i.product.store_id
+        if sid not in per_store:
+            per_store[sid] = {'store_id': sid, 'store_name': getattr(i.product.store, 'store_name', None), 'selected_subtotal': Decimal(0)}
+        per_store[sid]['selected_subtotal'] += amount
+    return _summary(len(items), total_amount, selected_count, selected_amount, per_store)
+
+
+def _build_summary(user_id) -> Dict[str, Any]:
+    """用一条按 (店铺, 选中) 分组的聚合查询计算汇总，开销与购物车条目数无关。"""
+    if cart_store.enabled():
+        return _summarize_items(_load_items(user_id))
+    rows = (
+        ShoppingCart.objects.filter(user_id=user_id)
+        .values('product__store_id', 'product__store__store_name', 'selected')
+        .annotate(lines=Count('id'), amount=Sum(F('quantity') * F('product__price'), output_field=AMOUNT_FIELD))
+        .order_by('product__store_id')
+    )
+    total_count = selected_count = 0
+    total_amount = selected_amount = Decimal(0)
+    per_store: Dict[int, Dict[str, Any]] = {}
+    for row in rows:
+        amount = row['amount'] or Decimal(0)
+        total_count += row['lines']
+        total_amount += amount
+        if not row['selected']:
+            continue
+        selected_count += row['lines']
+        selected_amount += amount
+        sid = row['product__store_id']
+        per_store[sid] = {'store_id': sid, 'store_name': row['product__store__store_name'], 'selected_subtotal': amount}
+    return _summary(total_count, total_amount, selected_count, selected_amount, per_store)
+
+
 # ====================== 视图 ======================
 
 class ShoppingCartListCreateAPIView(APIView):
-    """GET 列表 + 汇总；POST 添加/设定数量。"""
+    """GET 列表 + 汇总（支持 ?fields= 裁剪条目字段）；POST 添加/设定数量。
+
+    GET ?since=<version>：只返回该版本之后变更的条目（changed）与被删除的条目 id（removed），
+    版本未变化返回 304；since 过旧（删除日志已截断）时返回全量并置 full=true。
+    """
 
     def get(self, request: Request):
         user_id = _get_user_id(request)
         if not user_id:
             return _unauthorized()
-        qs = ShoppingCart.objects.filter(user_id=user_id).select_related('product', 'product__store')
-        serializer = ShoppingCartSerializer(qs, many=True)
-        summary = _build_summary(qs)
-        return CustomResponse(code=Codes.CART_LIST_OK, msg='获取购物车成功', data={'items': serializer.data, 'summary': summary}, status=200)
+        since = request.query_params.get('since')
+        if since is not None:
+            try:
+                since = int(since)
+            except ValueError:
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='since 必须为整数', errors={'since': 'int'}, status=400)
+        # 先取已提交版本再读条目：不大于该版本的变更此刻都已写入，读取期间提交的变更版本更大，
+        # 最多被下次增量重复返回，不会遗漏
+        version = versions.current(user_id)
+        if since is not None and since == version:
+            return HttpResponseNotModified()
+        removed = versions.removed_since(user_id, since) if since is not None and since < version else None
+        # 条目只加载一次，序列化与汇总共用
+        items = _load_items(user_id)
+        summary = _summarize_items(items)
+        fields = requested_fields(request)
+        if removed is not None:
+            changed = [i for i in items if i.version > since]
+            data = {
+                'version': version,
+                'full': False,
+                'changed': ShoppingCartSerializer(changed, many=True, fields=fields).data,
+                'removed': removed,
+                'summary': summary,
+            }
+        else:
+            data = {'version': version, 'items': ShoppingCartSerializer(items, many=True, fields=fields).data, 'summary': summary}
+            if since is not None:
+                data['full'] = True
+        return CustomResponse(code=Codes.CART_LIST_OK, msg='获取购物车成功', data=data, status=200)
 
-    @transaction.atomic
     def post(self, request: Request):
         user_id = _get_user_id(request)
         if not user_id:
             return _unauthorized()
-        data = request.data or {}
-        product_id = data.get('product_id')
-        quantity = data.get('quantity')
-        mode = (data.get('mode') or 'add').lower()
-        if product_id is None or quantity is None:
-            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='缺少参数', errors={'product_id': 'required', 'quantity': 'required'}, status=400)
-        try:
-            product_id = int(product_id)
-            quantity = int(quantity)
-        except (TypeError, ValueError):
-            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='参数格式错误', errors={'product_id': 'int', 'quantity': 'int'}, status=400)
-        if mode not in ('add', 'set'):
-            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='mode 仅支持 add/set', errors={'mode': 'invalid'}, status=400)
-        if quantity <= 0:
-            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='数量必须大于0', errors={'quantity': 'gt0'}, status=400)
-        # 获取商品
-        try:
-            product = Product.objects.select_related('store').get(id=product_id)
-        except Product.DoesNotExist:
-            return CustomResponse(code=Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR, msg='商品不存在', status=404)
-        if product.status in ('off_sale', 'out_of_stock'):
-            return CustomResponse(code=Codes.PRODUCT_OFF_SHELF, msg='商品已下架或缺货', status=400)
+        product, quantity, mode, error = _parse_add_request(request.data or {})
+        if error is not None:
+            return error
         if product.stock < quantity and mode == 'set':
             return CustomResponse(code=Codes.STOCK_NOT_ENOUGH, msg='库存不足', errors={'stock': product.stock}, status=400)
+        product_id = product.id
 
-        qs = ShoppingCart.objects.select_for_update().filter(user_id=user_id, product_id=product_id)
-        created = False
-        if qs.exists():
-            cart_item = qs.first()
-            if mode == 'add':
-                new_quantity = cart_item.quantity + quantity
-                if new_quantity > product.stock:
-                    return CustomResponse(code=Codes.STOCK_NOT_ENOUGH, msg='库存不足', errors={'stock': product.stock}, status=400)
-                cart_item.quantity = new_quantity
-                cart_item.selected = True  # 加入视为选中
-                cart_item.save(update_fields=['quantity', 'selected', 'update_time'])
-                code = Codes.CART_ADD_OR_UPDATE_OK
-                msg = '更新购物车成功'
-            else:  # set
-                if quantity > product.stock:
-                    return CustomResponse(code=Codes.STOCK_NOT_ENOUGH, msg='库存不足', errors={'stock': product.stock}, status=400)
-                cart_item.quantity = quantity
-                cart_item.selected = True
-                cart_item.save(update_fields=['quantity', 'selected', 'update_time'])
-                code = Codes.CART_SET_OK
-                msg = '设定数量成功'
+        # 条件 upsert：库存校验与写入在同一条语句内完成，不加行锁（见 services）
+        with versions.change(user_id) as version, cart_store.write_through(user_id):
+            cart_item, created = services.add_or_set_item(user_id, product_id, quantity, mode, version)
+        if cart_item is None:
+            product.refresh_from_db(fields=['stock'])
+            return CustomResponse(code=Codes.STOCK_NOT_ENOUGH, msg='库存不足', errors={'stock': product.stock}, status=400)
+        cart_item.product = product
+        if created:
+            code, msg = Codes.CART_ADD_OR_UPDATE_OK, '添加购物车成功'
+        elif mode == 'add':
+            code, msg = Codes.CART_ADD_OR_UPDATE_OK, '更新购物车成功'
         else:
-            if quantity > product.stock:
-                return CustomResponse(code=Codes.STOCK_NOT_ENOUGH, msg='库存不足', errors={'stock': product.stock}, status=400)
-            cart_item = ShoppingCart.objects.create(user_id=user_id, product_id=product_id, quantity=quantity, selected=True)
-            created = True
-            code = Codes.CART_ADD_OR_UPDATE_OK
-            msg = '添加购物车成功'
+            code, msg = Codes.CART_SET_OK, '设定数量成功'
 
         serializer = ShoppingCartSerializer(cart_item)
         # 附带最新 summary（可减少前端再次拉取）
-        user_qs = ShoppingCart.objects.filter(user_id=user_id).select_related('product', 'product__store')
-        summary = _build_summary(user_qs)
-        return CustomResponse(code=code, msg=msg, data={'item': serializer.data, 'summary': summary, 'created': created}, status=200)
+        summary = _build_summary(user_id)
+        return CustomResponse(code=code, msg=msg, data={'item': serializer.data, 'summary': summary, 'created': created, 'version': version}, status=200)
 
 
 class ShoppingCartItemAPIView(APIView):
@@ -184,7 +310,9 @@ class ShoppingCartItemAPIView(APIView):
         selected = data.get('selected')
         if quantity is None and selected is None:
             return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='至少提供 quantity 或 selected', status=400)
-        cart_item = get_object_or_404(ShoppingCart.objects.select_related('product', 'product__store'), pk=pk, user_id=user_id)
+        cart_item = _find_items(user_id, [pk]).get(pk)
+        if cart_item is None:
+            raise Http404
         product = cart_item.product
         if quantity is not None:
             try:
@@ -202,27 +330,94 @@ class ShoppingCartItemAPIView(APIView):
             if not isinstance(selected, bool):
                 return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='selected 应为布尔', errors={'selected': 'bool'}, status=400)
             cart_item.selected = selected
-        cart_item.save()
+        version = _save_items(user_id, [cart_item])
         serializer = ShoppingCartSerializer(cart_item)
-        user_qs = ShoppingCart.objects.filter(user_id=user_id).select_related('product', 'product__store')
-        summary = _build_summary(user_qs)
+        summary = _build_summary(user_id)
         # 返回数量设定成功 or 更新成功
         code = Codes.CART_SET_OK if quantity is not None else Codes.CART_ADD_OR_UPDATE_OK
-        return CustomResponse(code=code, msg='更新条目成功', data={'item': serializer.data, 'summary': summary}, status=200)
+        return CustomResponse(code=code, msg='更新条目成功', data={'item': serializer.data, 'summary': summary, 'version': version}, status=200)
 
     def delete(self, request: Request, pk: int):
         user_id = _get_user_id(request)
         if not user_id:
             return _unauthorized()
-        cart_item = get_object_or_404(ShoppingCart, pk=pk, user_id=user_id)
-        cart_item.delete()
-        user_qs = ShoppingCart.objects.filter(user_id=user_id).select_related('product', 'product__store')
-        summary = _build_summary(user_qs)
-        return CustomResponse(code=Codes.CART_ITEM_REMOVED, msg='条目已删除', data={'summary': summary}, status=200)
+        deleted, version = _remove_items(user_id, ShoppingCart.objects.filter(pk=pk, user_id=user_id))
+        if not deleted:
+            raise Http404
+        summary = _build_summary(user_id)
+        return CustomResponse(code=Codes.CART_ITEM_REMOVED, msg='条目已删除', data={'summary': summary, 'version': version}, status=200)
+
+
+class ShoppingCartBatchUpdateAPIView(APIView):
+    """批量修改条目 {items: [{id, quantity?, selected?}, ...]}
+
+    条目与商品一次联表查询取出并统一校验库存/上下架，全部通过后在一个事务内 bulk_update，
+    任一条目失败则整批不生效并在 errors 中按条目 id 返回原因；成功时只返回一份汇总。
+    """
+    MAX_ITEMS = 200
+
+    def post(self, request: Request):
+        user_id = _get_user_id(request)
+        if not user_id:
+            return _unauthorized()
+        entries = (request.data or {}).get('items')
+        if not isinstance(entries, list) or not entries:
+            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='items 应为非空数组', errors={'items': 'required'}, status=400)
+        if len(entries) > self.MAX_ITEMS:
+            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg=f'items 最多 {self.MAX_ITEMS} 条', errors={'items': 'too_many'}, status=400)
+
+        changes: Dict[int, Dict[str, Any]] = {}
+        for entry in entries:
+            if not isinstance(entry, dict) or isinstance(entry.get('id'), bool) or not isinstance(entry.get('id'), int):
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='每个条目须包含整数 id', errors={'id': 'int'}, status=400)
+            pk = entry['id']
+            quantity = entry.get('quantity')
+            selected = entry.get('selected')
+            if quantity is None and selected is None:
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='至少提供 quantity 或 selected', errors={str(pk): 'empty'}, status=400)
+            if quantity is not None and (isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0):
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='quantity 必须为大于0的整数', errors={str(pk): 'quantity'}, status=400)
+            if selected is not None and not isinstance(selected, bool):
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='selected 应为布尔', errors={str(pk): 'selected'}, status=400)
+            if pk in changes:
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='条目 id 重复', errors={str(pk): 'duplicate'}, status=400)
+            changes[pk] = {'quantity': quantity, 'selected': selected}
+
+        # 在同一次变更内读取、校验并写入：整批基于同一份购物车（计数器行锁 / 缓存存储的用户锁），
+        # 校验失败时回滚，不产生空版本
+        with versions.change(user_id) as version:
+            cart_items = _find_items(user_id, list(changes))
+            missing = [pk for pk in changes if pk not in cart_items]
+            if missing:
+                transaction.set_rollback(True)
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='部分条目不存在', errors={'missing': missing}, status=404)
+            errors: Dict[str, Any] = {}
+            for pk, change in changes.items():
+                cart_item, quantity = cart_items[pk], change['quantity']
+                if quantity is not None:
+                    product = cart_item.product
+                    if product.status in ('off_sale', 'out_of_stock'):
+                        errors[str(pk)] = {'code': Codes.PRODUCT_OFF_SHELF, 'msg': '商品已下架或缺货'}
+                        continue
+                    if quantity > product.stock:
+                        errors[str(pk)] = {'code': Codes.STOCK_NOT_ENOUGH, 'msg': '库存不足', 'stock': product.stock}
+                        continue
+                    cart_item.quantity = quantity
+                if change['selected'] is not None:
+                    cart_item.selected = change['selected']
+            if errors:
+                transaction.set_rollback(True)
+                return CustomResponse(code=Codes.CART_PARTIAL_VALIDATE_FAILED, msg='部分条目校验失败', errors=errors, status=400)
+            _write_items(user_id, list(cart_items.values()), version)
+        summary = _build_summary(user_id)
+        return CustomResponse(code=Codes.CART_BATCH_UPDATE_OK, msg='批量更新成功', data={'updated': len(cart_items), 'summary': summary, 'version': version}, status=200)
 
 
 class ShoppingCartSelectAllAPIView(APIView):
-    """全选 / 取消全选 {selected: true|false}"""
+    """全选 / 取消全选 {selected: true|false}
+
+    只写入选中状态实际变化的条目，响应中 changed 仅含这些条目（不再返回整车），配合 version 增量同步。
+    """
     def post(self, request: Request):
         user_id = _get_user_id(request)
         if not user_id:
@@ -230,11 +425,14 @@ class ShoppingCartSelectAllAPIView(APIView):
         selected = request.data.get('selected')
         if not isinstance(selected, bool):
             return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='selected 必须为布尔', errors={'selected': 'bool'}, status=400)
-        ShoppingCart.objects.filter(user_id=user_id).update(selected=selected)
-        qs = ShoppingCart.objects.filter(user_id=user_id).select_related('product', 'product__store')
-        serializer = ShoppingCartSerializer(qs, many=True)
-        summary = _build_summary(qs)
-        return CustomResponse(code=Codes.CART_ADD_OR_UPDATE_OK, msg='操作成功', data={'items': serializer.data, 'summary': summary}, status=200)
+        items = _load_items(user_id)
+        changed = [i for i in items if i.selected != selected]
+        for i in changed:
+            i.selected = selected
+        version = _save_items(user_id, changed) if changed else versions.current(user_id)
+        serializer = ShoppingCartSerializer(changed, many=True, fields=requested_fields(request))
+        summary = _summarize_items(items)
+        return CustomResponse(code=Codes.CART_ADD_OR_UPDATE_OK, msg='操作成功', data={'changed': serializer.data, 'summary': summary, 'version': version}, status=200)
 
 
 class ShoppingCartClearAPIView(APIView):
@@ -247,7 +445,77 @@ class ShoppingCartClearAPIView(APIView):
         base_qs = ShoppingCart.objects.filter(user_id=user_id)
         if only_selected:
             base_qs = base_qs.filter(selected=True)
-        deleted, _ = base_qs.delete()
-        qs = ShoppingCart.objects.filter(user_id=user_id)
-        summary = _build_summary(qs)
-        return CustomResponse(code=Codes.CART_CLEARED, msg='购物车已清空' if not only_selected else '已清空选中项', data={'deleted': deleted, 'summary': summary}, status=200)
+        deleted, version = _remove_items(user_id, base_qs)
+        summary = _build_summary(user_id)
+        return CustomResponse(code=Codes.CART_CLEARED, msg='购物车已清空' if not only_selected else '已清空选中项', data={'deleted': deleted, 'summary': summary, 'version': version}, status=200)
+
+
+class GuestCartAPIView(APIView):
+    """游客购物车（见 guest_cart）：条目存于共享缓存，以 Guest-Token 请求头标识，登录时并入用户购物车。
+
+    游客条目没有数据库行，库存只在加购时校验一次，合并时再按实际库存截断。
+    """
+    def get(self, request: Request):
+        token = guest_cart.get_token(request)
+        lines = guest_cart.load(token) if token else {}
+        items = guest_cart.get_items(lines, ShoppingCartSerializer.PRODUCT_COLUMNS) if lines else []
+        serializer = ShoppingCartSerializer(items, many=True, fields=requested_fields(request))
+        return CustomResponse(code=Codes.CART_LIST_OK, msg='获取购物车成功', data={'guest_token': token, 'items': serializer.data, 'summary': _summarize_items(items)}, status=200)
+
+    def post(self, request: Request):
+        product, quantity, mode, error = _parse_add_request(request.data or {})
+        if error is not None:
+            return error
+        token = guest_cart.get_token(request) or guest_cart.new_token()
+        lines = guest_cart.load(token)
+        if product.id not in lines and len(lines) >= guest_cart.MAX_LINES:
+            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg=f'游客购物车最多 {guest_cart.MAX_LINES} 种商品，请登录后继续', errors={'product_id': 'too_many'}, status=400)
+        created = product.id not in lines
+        if mode == 'add' and not created:
+            quantity += lines[product.id][0]
+        if quantity > product.stock:
+            return CustomResponse(code=Codes.STOCK_NOT_ENOUGH, msg='库存不足', errors={'stock': product.stock}, status=400)
+        guest_cart.put(lines, product.id, quantity)
+        guest_cart.save(token, lines)
+        items = guest_cart.get_items(lines, ShoppingCartSerializer.PRODUCT_COLUMNS)
+        item = next((i for i in items if i.product_id == product.id), None)
+        if item is None:
+            # 商品在校验之后被删除
+            return CustomResponse(code=Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR, msg='商品不存在', status=404)
+        code, msg = (Codes.CART_SET_OK, '设定数量成功') if mode == 'set' and not created else (Codes.CART_ADD_OR_UPDATE_OK, '添加购物车成功')
+        return CustomResponse(code=code, msg=msg, data={'guest_token': token, 'item': ShoppingCartSerializer(item).data, 'summary': _summarize_items(items), 'created': created}, status=200)
+
+    def delete(self, request: Request):
+        token = guest_cart.get_token(request)
+        if not token:
+            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='缺少 Guest-Token', errors={'guest_token': 'required'}, status=400)
+        lines = guest_cart.load(token)
+        product_id = request.query_params.get('product_id')
+        if product_id is None:
+            deleted, lines = len(lines), {}
+        else:
+            try:
+                product_id = int(product_id)
+            except ValueError:
+                return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='product_id 必须为整数', errors={'product_id': 'int'}, status=400)
+            if product_id not in lines:
+                raise Http404
+            del lines[product_id]
+            deleted = 1
+        guest_cart.save(token, lines)
+        items = guest_cart.get_items(lines, ShoppingCartSerializer.PRODUCT_COLUMNS) if lines else []
+        return CustomResponse(code=Codes.CART_ITEM_REMOVED, msg='条目已删除', data={'guest_token': token, 'deleted': deleted, 'summary': _summarize_items(items)}, status=200)
+
+
+class GuestCartMergeAPIView(APIView):
+    """已登录用户把游客购物车（Guest-Token 请求头或 body.guest_token）并入自己的购物车。"""
+    def post(self, request: Request):
+        user_id = _get_user_id(request)
+        if not user_id:
+            return _unauthorized()
+        token = guest_cart.get_token(request) or (request.data or {}).get('guest_token')
+        if not guest_cart.valid_token(token):
+            return CustomResponse(code=Codes.CART_OR_ORDER_PARAM_ERROR, msg='缺少或非法的 guest_token', errors={'guest_token': 'invalid'}, status=400)
+        result = guest_cart.merge(token, user_id)
+        summary = _build_summary(user_id)
+        return CustomResponse(code=Codes.CART_MERGE_OK, msg='合并购物车成功', data={**result, 'version': result['version'] or versions.current(user_id), 'summary': summary}, status=200)
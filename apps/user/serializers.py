@@ -3,7 +3,7 @@ from rest_framework.validators import UniqueValidator
 from apps.user.models import User, UserAddress
 from django.contrib.auth.hashers import make_password
 import re
-from django.conf import settings
+from utils import assets, image_variants
 
 
 class UserRegisterSerializer(serializers.ModelSerializer):
@@ -65,15 +65,12 @@ class UserMeSerializer(serializers.ModelSerializer):
         exclude = ['password', 'is_deleted', 'create_time', 'update_time', 'status']
 
     def _add_prefix(self, path: str | None):
-        if not path:
-            return path
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = getattr(settings, 'IMAGE_URL', '') or ''
-        return base.rstrip('/') + '/' + path.lstrip('/')
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
 
     def to_representation(self, instance):
         data = super().to_representation(instance)
+        data['avatar_variants'] = image_variants.variant_urls(data.get('avatar_url'))
         data['avatar_url'] = self._add_prefix(data.get('avatar_url'))
         return data
 
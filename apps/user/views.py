@@ -29,6 +29,8 @@ import os
 from django.conf import settings
 from django.core.files.uploadedfile import UploadedFile
 import imghdr
+from utils import assets, image_variants
+from apps.shopping_cart import guest_cart
 
 
 def _get_user_id_from_token(request: Request):
@@ -97,7 +99,15 @@ class UserLoginAPIView(GenericAPIView):
 
         token = generate_token(user_id=user.id, username=user.username)
         user_serializer = UserMeSerializer(instance=user)
-        return CustomResponse(code=Codes.USER_ACTION_OK, msg="登录成功", data={"token": token, "user": user_serializer.data}, status=200)
+        data = {"token": token, "user": user_serializer.data}
+        # 带游客令牌登录时把游客购物车并入用户购物车；合并失败不影响登录，游客购物车保留待下次合并
+        guest_token = request.data.get("guest_token") or guest_cart.get_token(request)
+        if guest_token:
+            try:
+                data["cart_merge"] = guest_cart.merge(guest_token, user.id)
+            except Exception:
+                logging.getLogger(__name__).exception('登录时合并游客购物车失败: user_id=%s', user.id)
+        return CustomResponse(code=Codes.USER_ACTION_OK, msg="登录成功", data=data, status=200)
 
 
 class UserLogoutAPIView(APIView):
@@ -390,7 +400,9 @@ class UserAvatarUploadAPIView(APIView):
       - 将图片保存到 static/user_avatar_images/<user_id>.<ext>
       - 若已存在旧文件，直接覆盖
       - 更新 user.avatar_url 为相对路径（如 static/user_avatar_images/3.png）
-    返回：{"avatar_url": "<完整URL>"}
+      - 按内容哈希发布一份不可变副本（见 utils.assets），返回的 URL 随内容变化，可长期缓存
+      - 提交到进程池异步生成多尺寸衍生图（见 utils.image_variants），完成前 avatar_variants 为 None
+    返回：{"avatar_url": "<完整URL（内容哈希地址）>"}
     规则：
       - 允许类型：jpg/jpeg/png/webp
       - 最大 2MB
@@ -404,12 +416,8 @@ class UserAvatarUploadAPIView(APIView):
     }
 
     def _add_prefix(self, path: str | None):
-        if not path:
-            return path
-        if path.startswith('http://') or path.startswith('https://'):
-            return path
-        base = getattr(settings, 'IMAGE_URL', '') or ''
-        return base.rstrip('/') + '/' + path.lstrip('/')
+        # 经静态资源清单解析为内容哈希地址（见 utils.assets）
+        return assets.add_prefix(path)
 
     def post(self, request: Request):
         uid = _get_user_id_from_token(request)
@@ -444,5 +452,7 @@ class UserAvatarUploadAPIView(APIView):
         user = get_object_or_404(User, id=uid, is_deleted=False)
         user.avatar_url = rel_path
         user.save(update_fields=['avatar_url'])
+        assets.publish(rel_path)
+        image_variants.schedule(rel_path)
         full_url = self._add_prefix(rel_path)
         return CustomResponse(code=Codes.USER_ACTION_OK, msg='上传成功', data={'avatar_url': full_url}, status=200)
@@ -62,13 +62,13 @@ CORS_ALLOW_CREDENTIALS = True
 # 显式允许自定义头（前端 Token 头/Authorization）
 CORS_ALLOW_HEADERS = [
     'accept', 'accept-encoding', 'authorization', 'content-type', 'dnt', 'origin', 'user-agent', 'x-csrftoken', 'x-requested-with',
-    'token', 'Token', 'Authorization'
+    'token', 'Token', 'Authorization', 'guest-token', 'Guest-Token'
 ]
 CORS_ALLOW_METHODS = [
     'GET', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS'
 ]
 # 可选暴露头（若前端需要读取）
-CORS_EXPOSE_HEADERS = ['Token', 'Authorization']
+CORS_EXPOSE_HEADERS = ['Token', 'Authorization', 'Guest-Token']
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
@@ -208,6 +208,8 @@ STATICFILES_DIRS = [
 ]
 # 图片访问地址
 IMAGE_URL = config('IMAGE_URL', default='http://localhost:8000/')
+# 上传图片异步生成衍生图的进程池大小（见 utils.image_variants）
+IMAGE_VARIANT_WORKERS = config('IMAGE_VARIANT_WORKERS', default=2, cast=int)
 # 生产环境静态文件收集目录
 STATIC_ROOT = config('STATIC_ROOT', default='')
 
@@ -240,6 +242,31 @@ CACHES = {
     }
 }
 
+# 商品详情缓存有效期（秒），商品变更时会主动失效
+PRODUCT_DETAIL_CACHE_TIMEOUT = config('PRODUCT_DETAIL_CACHE_TIMEOUT', default=600, cast=int)
+# 浏览量/销量计数缓冲的刷库间隔（秒）
+PRODUCT_COUNTER_FLUSH_INTERVAL = config('PRODUCT_COUNTER_FLUSH_INTERVAL', default=10, cast=int)
+# 标签商品物化列表的缓存时长（秒），兜底刷新销量排序
+PRODUCT_TAG_LISTING_TIMEOUT = config('PRODUCT_TAG_LISTING_TIMEOUT', default=300, cast=int)
+# 搜索分面计数的缓存时长（秒）
+PRODUCT_SEARCH_FACET_TIMEOUT = config('PRODUCT_SEARCH_FACET_TIMEOUT', default=120, cast=int)
+# 分面分组数上限，超过时不缓存、改为逐维度聚合查询
+PRODUCT_SEARCH_FACET_MAX_GROUPS = config('PRODUCT_SEARCH_FACET_MAX_GROUPS', default=5000, cast=int)
+# 进程内搜索结果缓存：最大条目数与过期时间（秒）
+PRODUCT_SEARCH_CACHE_SIZE = config('PRODUCT_SEARCH_CACHE_SIZE', default=512, cast=int)
+PRODUCT_SEARCH_CACHE_TIMEOUT = config('PRODUCT_SEARCH_CACHE_TIMEOUT', default=60, cast=int)
+# “买了还买”邻居列表的缓存时长（秒），重建推荐后自动换版本
+PRODUCT_ALSO_BOUGHT_CACHE_TIMEOUT = config('PRODUCT_ALSO_BOUGHT_CACHE_TIMEOUT', default=3600, cast=int)
+# 购物车存储：db（直接读写 shopping_cart 表）/ cache（常驻共享缓存，数量/选中修改异步批量写回，需 Redis 等共享缓存）
+SHOPPING_CART_STORE = config('SHOPPING_CART_STORE', default='db')
+# 缓存存储下购物车的缓存时长（秒）与写回间隔（秒）
+SHOPPING_CART_CACHE_TIMEOUT = config('SHOPPING_CART_CACHE_TIMEOUT', default=86400, cast=int)
+SHOPPING_CART_FLUSH_INTERVAL = config('SHOPPING_CART_FLUSH_INTERVAL', default=5, cast=int)
+# 游客购物车（匿名令牌，存于共享缓存）无操作后的保留时长（秒），登录时并入用户购物车
+SHOPPING_CART_GUEST_TIMEOUT = config('SHOPPING_CART_GUEST_TIMEOUT', default=7 * 86400, cast=int)
+# 超过该天数未更新的购物车条目由 prune_shopping_cart 定时清理
+SHOPPING_CART_STALE_DAYS = config('SHOPPING_CART_STALE_DAYS', default=90, cast=int)
+
 # =============================================================================
 # 安全配置
 # =============================================================================
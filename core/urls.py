@@ -18,6 +18,7 @@ core 项目的 URL 配置。
 from django.contrib import admin
 from django.urls import path, include
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView
+from utils.asset_views import serve_asset
 
 
 urlpatterns = [
@@ -28,6 +29,7 @@ urlpatterns = [
     path("order/", include("apps.order.urls")),
     path("review/", include("apps.review.urls")),
     path("payment/", include("apps.payment.urls")),  # 新增支付
+    path("assets/<path:path>", serve_asset, name="asset"),  # 内容哈希静态资源（immutable）
     # OpenAPI schema & docs
     path("api/schema/", SpectacularAPIView.as_view(), name="schema"),
     path("api/docs/", SpectacularSwaggerView.as_view(url_name="schema"), name="swagger-ui"),
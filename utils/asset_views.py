@@ -0,0 +1,101 @@
+"""
+内容哈希资源服务：GET/HEAD /assets/<哈希文件名>
+
+- 文件名含内容哈希，响应 Cache-Control: public, max-age=31536000, immutable，ETag 即哈希
+- If-None-Match 命中返回 304
+- 整文件经 FileResponse 输出，WSGI 服务器支持 wsgi.file_wrapper 时走 sendfile 零拷贝
+- Range（单段）请求以 mmap 分块读取返回 206，If-Range 不匹配时回退整文件；不可满足返回 416
+- 客户端接受 gzip 且存在 .gz 预压缩副本时直接返回副本（非 Range 请求）
+"""
+import mimetypes
+import mmap
+import os
+import re
+from typing import Iterator, Optional, Tuple
+
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import http_date, parse_etags
+from django.views.decorators.http import require_safe
+
+from utils import assets
+
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def _resolve(path: str) -> str:
+    root = os.path.realpath(assets.asset_root())
+    full = os.path.realpath(os.path.join(root, path))
+    if not full.startswith(root + os.sep) or full.endswith('.tmp') or not os.path.isfile(full):
+        raise Http404('资源不存在')
+    return full
+
+
+def _parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """解析单段 Range，返回闭区间 (start, end)；格式不支持返回 None，不可满足抛 ValueError。"""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise ValueError('empty suffix range')
+        return max(size - length, 0), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise ValueError('unsatisfiable range')
+    return start, end
+
+
+def _mmap_chunks(full: str, start: int, end: int) -> Iterator[bytes]:
+    with open(full, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        for offset in range(start, end + 1, CHUNK_SIZE):
+            yield mm[offset:min(offset + CHUNK_SIZE, end + 1)]
+
+
+def _finish(response: HttpResponse, etag: str, mtime: float) -> HttpResponse:
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(mtime)
+    response['Cache-Control'] = assets.CACHE_CONTROL
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@require_safe
+def serve_asset(request, path: str):
+    full = _resolve(path)
+    stat = os.stat(full)
+    match = assets.HASHED_NAME_RE.search(os.path.basename(full))
+    etag = f'"{match.group(1)}"' if match else f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+    if etag in parse_etags(request.headers.get('If-None-Match', '')):
+        return _finish(HttpResponseNotModified(), etag, stat.st_mtime)
+
+    content_type = mimetypes.guess_type(full)[0] or 'application/octet-stream'
+    range_header = request.headers.get('Range')
+    if_range = request.headers.get('If-Range')
+    if range_header and (not if_range or if_range == etag):
+        try:
+            byte_range = _parse_range(range_header, stat.st_size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+            return _finish(response, etag, stat.st_mtime)
+        if byte_range is not None:
+            start, end = byte_range
+            response = StreamingHttpResponse(_mmap_chunks(full, start, end), status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+            return _finish(response, etag, stat.st_mtime)
+
+    gz = f'{full}.gz'
+    has_gz = os.path.isfile(gz)
+    if has_gz and 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = FileResponse(open(gz, 'rb'), content_type=content_type)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = FileResponse(open(full, 'rb'), content_type=content_type)
+    if has_gz:
+        response['Vary'] = 'Accept-Encoding'
+    return _finish(response, etag, stat.st_mtime)
@@ -0,0 +1,154 @@
+"""
+内容哈希静态资源
+
+- publish()：把 static/ 下的文件按内容 md5 前 12 位复制为 static/assets/<原路径>.<hash>.<扩展名>，
+  并在清单 static/assets/manifest.json 中记录 原路径 -> 哈希文件名；文本类资源额外生成 .gz 预压缩副本
+- add_prefix()：各序列化器补全图片 URL 的统一入口。清单中有记录的返回 /assets/ 下的哈希地址，
+  内容变化即换 URL，可长期强缓存；没有记录的按原逻辑拼 IMAGE_URL
+- 数据库中仍保存原路径（如 static/user_avatar_images/3.png），覆盖上传后重新 publish 即可换新地址
+- 哈希文件由 utils.asset_views.serve_asset 提供服务（immutable 缓存、ETag、Range、.gz 协商）；
+  生产环境也可由 nginx 直接映射 static/assets 目录
+- 批量发布：python manage.py collect_assets
+"""
+import gzip
+import hashlib
+import os
+import re
+import shutil
+from typing import Iterable, Optional, Tuple
+
+from django.conf import settings
+
+from utils.json_index import JsonIndex
+
+STATIC_PREFIX = 'static/'
+ASSET_ROOT = 'static/assets'
+MANIFEST_PATH = f'{ASSET_ROOT}/manifest.json'
+URL_PREFIX = 'assets/'
+HASH_LEN = 12
+HASHED_NAME_RE = re.compile(r'\.([0-9a-f]{%d})(\.[^./]+)?$' % HASH_LEN)
+CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 值得预压缩的文本类资源；图片本身已压缩，不生成 .gz
+COMPRESSIBLE_EXTS = frozenset({'.svg', '.json', '.css', '.js', '.txt', '.html', '.xml'})
+# 不发布的文件（各类索引/清单本身）
+SKIP_NAMES = frozenset({'index.json', 'manifest.json'})
+
+_manifest: Optional[JsonIndex] = None
+
+
+def _abs(rel_path: str) -> str:
+    return os.path.join(str(settings.BASE_DIR), rel_path)
+
+
+def asset_root() -> str:
+    return _abs(ASSET_ROOT)
+
+
+def manifest() -> JsonIndex:
+    global _manifest
+    if _manifest is None:
+        _manifest = JsonIndex(_abs(MANIFEST_PATH))
+    return _manifest
+
+
+def normalize(path: Optional[str]) -> Optional[str]:
+    """规范为 static/ 开头的相对路径；外链、非 static 路径或哈希目录内的路径返回 None。"""
+    if not path or path.startswith(('http://', 'https://')):
+        return None
+    rel = path.lstrip('/')
+    if not rel.startswith(STATIC_PREFIX) or rel.startswith(ASSET_ROOT + '/'):
+        return None
+    return rel
+
+
+def _digest(abs_path: str) -> str:
+    h = hashlib.md5()
+    with open(abs_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            h.update(chunk)
+    return h.hexdigest()[:HASH_LEN]
+
+
+def hashed_name(rel_path: str, digest: str) -> str:
+    """static/a/b.png + digest -> a/b.<digest>.png（相对 ASSET_ROOT）。"""
+    stem, ext = os.path.splitext(rel_path[len(STATIC_PREFIX):])
+    return f'{stem}.{digest}{ext}'
+
+
+def _write(src_abs: str, rel_path: str) -> Tuple[str, bool]:
+    digest = _digest(src_abs)
+    name = hashed_name(rel_path, digest)
+    dst = os.path.join(asset_root(), name)
+    if os.path.exists(dst):
+        return name, False
+    os.makedirs(os.path.dirname(dst), exist_ok=True)
+    tmp = f'{dst}.{os.getpid()}.tmp'
+    shutil.copyfile(src_abs, tmp)
+    os.replace(tmp, dst)
+    if os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTS:
+        with open(dst, 'rb') as f:
+            raw = f.read()
+        packed = gzip.compress(raw, compresslevel=9, mtime=0)
+        if len(packed) < len(raw) * 0.9:
+            with open(tmp, 'wb') as f:
+                f.write(packed)
+            os.replace(tmp, f'{dst}.gz')
+    return name, True
+
+
+def publish_many(paths: Iterable[str]) -> Tuple[int, int]:
+    """发布多个文件并一次性写清单，返回 (新写入数, 内容未变数)。"""
+    entries = {}
+    written = unchanged = 0
+    for path in paths:
+        rel_path = normalize(path)
+        if rel_path is None or os.path.basename(rel_path) in SKIP_NAMES:
+            continue
+        src = _abs(rel_path)
+        if not os.path.isfile(src):
+            continue
+        name, created = _write(src, rel_path)
+        entries[rel_path] = name
+        if created:
+            written += 1
+        else:
+            unchanged += 1
+    current = manifest().load()
+    changed = {k: v for k, v in entries.items() if current.get(k) != v}
+    if changed:
+        manifest().update(changed)
+    return written, unchanged
+
+
+def publish(path: Optional[str]) -> Optional[str]:
+    """发布单个文件，返回其哈希文件名（相对 ASSET_ROOT）；不可发布时返回 None。"""
+    rel_path = normalize(path)
+    if rel_path is None:
+        return None
+    publish_many([rel_path])
+    return manifest().get(rel_path)
+
+
+def iter_files(root: str = 'static') -> Iterable[str]:
+    base = str(settings.BASE_DIR)
+    skip = os.path.normpath(asset_root())
+    for dirpath, dirnames, filenames in os.walk(_abs(root)):
+        dirnames[:] = [d for d in dirnames if os.path.normpath(os.path.join(dirpath, d)) != skip]
+        for filename in sorted(filenames):
+            if filename in SKIP_NAMES or filename.endswith('.tmp'):
+                continue
+            yield os.path.relpath(os.path.join(dirpath, filename), base).replace(os.sep, '/')
+
+
+def add_prefix(path: Optional[str]) -> Optional[str]:
+    """补全图片/资源 URL：优先返回哈希地址，未发布时回退 IMAGE_URL + 原路径。"""
+    if not path:
+        return path
+    if path.startswith('http://') or path.startswith('https://'):
+        return path
+    base = (getattr(settings, 'IMAGE_URL', '') or '').rstrip('/')
+    rel_path = normalize(path)
+    name = manifest().get(rel_path) if rel_path else None
+    if name:
+        return f'{base}/{URL_PREFIX}{name}'
+    return base + '/' + path.lstrip('/')
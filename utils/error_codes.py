@@ -22,11 +22,18 @@ class Codes(IntEnum):
     CATEGORY_MAIN_MENU_OK = 1000
     CATEGORY_SUB_MENU_OK = 1001
     CATEGORY_SUB_SUB_MENU_OK = 1002
+    CATEGORY_MENU_TREE_OK = 1003  # 新增：完整分类树
     CATEGORY_PARAM_ERROR = 1400
+    CATEGORY_NOT_FOUND = 1404  # 新增：分类不存在或已停用
 
     PRODUCT_TAG_LIST_OK = 2000
     PRODUCT_DETAIL_OK = 2001
     PRODUCT_SEARCH_OK = 2002  # 新增：商品搜索成功
+    PRODUCT_BATCH_OK = 2003  # 新增：批量商品卡片
+    PRODUCT_SUGGEST_OK = 2004  # 新增：搜索联想词
+    PRODUCT_SEARCH_CACHE_STATS_OK = 2005  # 新增：搜索缓存统计
+    PRODUCT_ALSO_BOUGHT_OK = 2006  # 新增：买了还买
+    PRODUCT_CATEGORY_LIST_OK = 2007  # 新增：分类商品列表
     PRODUCT_NOT_FOUND_OR_PARAM_ERROR = 2400
 
     # 购物车 / 订单（沿用）
@@ -39,6 +46,7 @@ class Codes(IntEnum):
     CART_SET_OK = 3003  # 新增：设定数量成功
     CART_CLEARED = 3004  # 新增：清空购物车成功
     CART_BATCH_UPDATE_OK = 3005  # 新增：批量更新成功
+    CART_MERGE_OK = 3006  # 游客购物车合并成功
     ORDER_EMPTY_CART = 3408  # 购物车为空
     ORDER_STOCK_NOT_ENOUGH = 3409  # 下单库存不足
     ORDER_PRODUCT_NOT_FOUND = 3410  # 下单商品不存在
@@ -83,10 +91,17 @@ ALIAS = {
     1000: Codes.CATEGORY_MAIN_MENU_OK,
     1001: Codes.CATEGORY_SUB_MENU_OK,
     1002: Codes.CATEGORY_SUB_SUB_MENU_OK,
+    1003: Codes.CATEGORY_MENU_TREE_OK,
     1400: Codes.CATEGORY_PARAM_ERROR,
+    1404: Codes.CATEGORY_NOT_FOUND,
     2000: Codes.PRODUCT_TAG_LIST_OK,
     2001: Codes.PRODUCT_DETAIL_OK,
     2002: Codes.PRODUCT_SEARCH_OK,
+    2003: Codes.PRODUCT_BATCH_OK,
+    2004: Codes.PRODUCT_SUGGEST_OK,
+    2005: Codes.PRODUCT_SEARCH_CACHE_STATS_OK,
+    2006: Codes.PRODUCT_ALSO_BOUGHT_OK,
+    2007: Codes.PRODUCT_CATEGORY_LIST_OK,
     2400: Codes.PRODUCT_NOT_FOUND_OR_PARAM_ERROR,
     3000: Codes.CART_LIST_OK,  # 或订单成功
     3001: Codes.CART_ADD_OR_UPDATE_OK,
@@ -94,6 +109,7 @@ ALIAS = {
     3003: Codes.CART_SET_OK,
     3004: Codes.CART_CLEARED,
     3005: Codes.CART_BATCH_UPDATE_OK,
+    3006: Codes.CART_MERGE_OK,
     3400: Codes.CART_OR_ORDER_PARAM_ERROR,
     3401: Codes.ORDER_CREATE_FAILED,
     3402: Codes.STOCK_NOT_ENOUGH,
@@ -0,0 +1,209 @@
+"""
+图片多尺寸衍生图（thumb / card / detail × WebP / JPEG）
+
+- 源图：static/ 下的 png/jpg/jpeg/webp（不含衍生图目录本身）
+- 产物：static/variants/<尺寸>/<源图相对 static 的路径去扩展名>.<webp|jpg>，
+  按最长边等比缩小（不放大），JPEG 对透明底补白
+- 索引：static/variants/index.json 记录 源图路径 -> {mtime, size, variants}，
+  批量生成时据此跳过未变化的源图；序列化器经 variant_urls() 读取索引输出各尺寸 URL，
+  索引中没有的图片返回 None，客户端回退原图
+- 生成在进程池中进行：管理命令 build_image_variants 批量生成；头像上传后经 schedule() 异步生成
+- 衍生图生成后即按内容哈希发布（见 utils.assets），输出的 URL 为哈希地址
+- Pillow 为可选依赖：未安装时生成为空操作，序列化器照常返回原图
+"""
+import logging
+import multiprocessing
+import os
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from django.conf import settings
+
+from utils import assets
+from utils.json_index import JsonIndex
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - 可选依赖
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# (名称, 最长边像素)
+VARIANTS: Tuple[Tuple[str, int], ...] = (('thumb', 240), ('card', 480), ('detail', 1200))
+# (扩展名, Pillow 格式, 保存参数)
+FORMATS: Tuple[Tuple[str, str, dict], ...] = (
+    ('webp', 'WEBP', {'quality': 80, 'method': 4}),
+    ('jpg', 'JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+SOURCE_EXTS = frozenset({'.png', '.jpg', '.jpeg', '.webp'})
+STATIC_PREFIX = 'static/'
+VARIANT_ROOT = 'static/variants'
+INDEX_PATH = f'{VARIANT_ROOT}/index.json'
+
+_index_file: Optional[JsonIndex] = None
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def available() -> bool:
+    return Image is not None
+
+
+def _abs(rel_path: str) -> str:
+    return os.path.join(str(settings.BASE_DIR), rel_path)
+
+
+def normalize(path: Optional[str]) -> Optional[str]:
+    """把库里存的图片路径规范为 static/ 开头的相对路径；外链或非 static 路径返回 None。"""
+    if not path or path.startswith(('http://', 'https://')):
+        return None
+    rel = path.lstrip('/')
+    return rel if rel.startswith(STATIC_PREFIX) else None
+
+
+def variant_path(rel_path: str, name: str, ext: str) -> str:
+    stem = os.path.splitext(rel_path[len(STATIC_PREFIX):])[0]
+    return f'{VARIANT_ROOT}/{name}/{stem}.{ext}'
+
+
+# ---------------------------------------------------------------- 生成（进程池内执行）
+
+def render(src_abs: str, outputs: List[Tuple[str, int, str, str, dict]]) -> None:
+    """打开源图一次，按 outputs [(目标绝对路径, 最长边, 扩展名, 格式, 参数)] 逐个写出。"""
+    with Image.open(src_abs) as im:
+        im.load()
+        if im.mode not in ('RGB', 'RGBA'):
+            im = im.convert('RGBA' if 'transparency' in im.info or im.mode in ('LA', 'P') else 'RGB')
+        for dst_abs, edge, ext, fmt, params in outputs:
+            resized = im.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+            if fmt == 'JPEG' and resized.mode != 'RGB':
+                background = Image.new('RGB', resized.size, (255, 255, 255))
+                background.paste(resized, mask=resized.getchannel('A') if resized.mode == 'RGBA' else None)
+                resized = background
+            os.makedirs(os.path.dirname(dst_abs), exist_ok=True)
+            tmp = f'{dst_abs}.tmp'
+            resized.save(tmp, fmt, **params)
+            os.replace(tmp, dst_abs)
+
+
+def _plan(rel_path: str) -> Tuple[List[Tuple[str, int, str, str, dict]], dict]:
+    outputs = []
+    variants: Dict[str, Dict[str, str]] = {}
+    for name, edge in VARIANTS:
+        for ext, fmt, params in FORMATS:
+            rel = variant_path(rel_path, name, ext)
+            outputs.append((_abs(rel), edge, ext, fmt, params))
+            variants.setdefault(name, {})[ext] = rel
+    return outputs, variants
+
+
+def _source_stat(rel_path: str) -> dict:
+    st = os.stat(_abs(rel_path))
+    return {'mtime': int(st.st_mtime), 'size': st.st_size}
+
+
+def _pool(workers: Optional[int] = None) -> ProcessPoolExecutor:
+    # spawn：不继承 web 进程中的线程与连接状态
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+
+def iter_sources(root: str = 'static') -> Iterable[str]:
+    base = str(settings.BASE_DIR)
+    skip = os.path.normpath(_abs(VARIANT_ROOT))
+    for dirpath, dirnames, filenames in os.walk(_abs(root)):
+        dirnames[:] = [d for d in dirnames if os.path.normpath(os.path.join(dirpath, d)) != skip]
+        for filename in sorted(filenames):
+            if os.path.splitext(filename)[1].lower() in SOURCE_EXTS:
+                yield os.path.relpath(os.path.join(dirpath, filename), base).replace(os.sep, '/')
+
+
+def generate(rel_paths: Iterable[str], workers: Optional[int] = None, force: bool = False) -> Tuple[int, int, List[str]]:
+    """批量生成衍生图并更新索引，返回 (生成数, 跳过数, 失败路径列表)。"""
+    if not available():
+        raise RuntimeError('未安装 Pillow，无法生成衍生图')
+    index = load_index()
+    todo = []
+    skipped = 0
+    for rel_path in rel_paths:
+        stat = _source_stat(rel_path)
+        entry = index.get(rel_path)
+        if not force and entry and entry.get('mtime') == stat['mtime'] and entry.get('size') == stat['size']:
+            skipped += 1
+            continue
+        todo.append((rel_path, stat))
+    built: Dict[str, dict] = {}
+    failed: List[str] = []
+    if todo:
+        with _pool(workers) as pool:
+            futures = {}
+            for rel_path, stat in todo:
+                outputs, variants = _plan(rel_path)
+                futures[pool.submit(render, _abs(rel_path), outputs)] = (rel_path, dict(stat, variants=variants))
+            for future in as_completed(futures):
+                rel_path, entry = futures[future]
+                try:
+                    future.result()
+                except Exception:
+                    logger.exception('衍生图生成失败: %s', rel_path)
+                    failed.append(rel_path)
+                else:
+                    built[rel_path] = entry
+    if built:
+        assets.publish_many(rel for entry in built.values() for formats in entry['variants'].values() for rel in formats.values())
+        update_index(built)
+    return len(built), skipped, failed
+
+
+def schedule(path: Optional[str]) -> Optional[Future]:
+    """上传后异步生成单张图片的衍生图（共享一个小进程池），完成后写入索引。"""
+    global _executor
+    rel_path = normalize(path)
+    if rel_path is None or not available():
+        return None
+    if _executor is None:
+        _executor = _pool(getattr(settings, 'IMAGE_VARIANT_WORKERS', 2))
+    stat = _source_stat(rel_path)
+    outputs, variants = _plan(rel_path)
+    future = _executor.submit(render, _abs(rel_path), outputs)
+
+    def done(f: Future) -> None:
+        if f.exception() is not None:
+            logger.error('衍生图生成失败: %s (%s)', rel_path, f.exception())
+            return
+        assets.publish_many(rel for formats in variants.values() for rel in formats.values())
+        update_index({rel_path: dict(stat, variants=variants)})
+
+    future.add_done_callback(done)
+    return future
+
+
+# ---------------------------------------------------------------- 索引
+
+def _index() -> JsonIndex:
+    global _index_file
+    if _index_file is None:
+        _index_file = JsonIndex(_abs(INDEX_PATH))
+    return _index_file
+
+
+def load_index() -> Dict[str, dict]:
+    return _index().load()
+
+
+def update_index(entries: Dict[str, dict]) -> None:
+    _index().update(entries)
+
+
+def variant_urls(path: Optional[str]) -> Optional[Dict[str, Dict[str, str]]]:
+    """返回 {thumb|card|detail: {webp: url, jpg: url}}；未生成衍生图时返回 None。"""
+    rel_path = normalize(path)
+    if rel_path is None:
+        return None
+    entry = load_index().get(rel_path)
+    if not entry:
+        return None
+    return {
+        name: {ext: assets.add_prefix(rel) for ext, rel in formats.items()}
+        for name, formats in entry['variants'].items()
+    }
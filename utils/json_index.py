@@ -0,0 +1,61 @@
+"""
+磁盘上的 JSON 索引文件（衍生图索引、静态资源清单共用）
+
+- 读：进程内缓存，至多每 check_interval 秒 stat 一次文件，mtime 变化时重新加载，
+  多进程部署下各进程都能看到其它进程写入的新条目
+- 写：读取最新内容合并后写临时文件再原子替换；并发写入方可能互相覆盖个别条目，
+  由对应的批量命令重建兜底
+"""
+import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class JsonIndex:
+    def __init__(self, path: str, check_interval: float = 1.0):
+        self.path = path
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._data: Dict[str, object] = {}
+        self._mtime: Optional[float] = None
+        self._checked_at = 0.0
+
+    def load(self) -> Dict[str, object]:
+        now = time.monotonic()
+        if now - self._checked_at < self.check_interval:
+            return self._data
+        self._checked_at = now
+        try:
+            mtime = os.path.getmtime(self.path)
+        except OSError:
+            self._data, self._mtime = {}, None
+            return self._data
+        if mtime != self._mtime:
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._data = json.load(f)
+                self._mtime = mtime
+            except (OSError, ValueError):
+                logger.warning('索引文件读取失败，暂按空索引处理: %s', self.path)
+        return self._data
+
+    def get(self, key: str, default=None):
+        return self.load().get(key, default)
+
+    def update(self, entries: Dict[str, object]) -> None:
+        """合并写入（临时文件 + 原子替换）。"""
+        with self._lock:
+            self._checked_at = 0.0
+            data = dict(self.load())
+            data.update(entries)
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            tmp = f'{self.path}.{os.getpid()}.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, sort_keys=True, separators=(',', ':'))
+            os.replace(tmp, self.path)
+            self._checked_at = 0.0
@@ -0,0 +1,99 @@
+"""
+游标（keyset）分页
+
+- 游标为 base64 编码的 JSON 数组：上一页最后一行的各排序键值（最后一个必须是 id），对客户端不透明
+- 翻页条件按排序方向展开为 (k1 < v1) OR (k1 = v1 AND k2 < v2) ... 的 OR 链，
+  配合排序字段上的索引，第 N 页与第 1 页开销一致，不再执行 COUNT / OFFSET
+- 总数可选：请求带 with_total=1 时才额外执行一次 COUNT
+
+使用方式（视图中）：
+    if is_cursor_request(request):
+        page = paginate_by_cursor(qs, ['-price', '-id'], request.query_params.get('cursor'), page_size)
+        # page.items / page.next_cursor / page.has_next
+注意：排序字段须为非空字段；解码后的值以字符串形式交给 ORM 过滤，由字段自行转换类型。
+"""
+import base64
+import json
+from dataclasses import dataclass
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, List, Optional, Sequence
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q, QuerySet
+from rest_framework.request import Request
+
+
+class CursorError(ValueError):
+    """游标无法解析或与排序不匹配。"""
+
+
+@dataclass
+class CursorPage:
+    items: List[Any]
+    next_cursor: Optional[str]
+
+    @property
+    def has_next(self) -> bool:
+        return self.next_cursor is not None
+
+
+def is_cursor_request(request: Request) -> bool:
+    """请求携带 cursor 参数（首页可传空值 cursor=）即启用游标分页。"""
+    return 'cursor' in request.query_params
+
+
+def wants_total(request: Request) -> bool:
+    return request.query_params.get('with_total', '').lower() in ('1', 'true', 'yes')
+
+
+def _jsonable(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return str(value)
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps([_jsonable(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise CursorError('cursor 无效')
+    if not isinstance(values, list) or len(values) != size:
+        raise CursorError('cursor 与排序方式不匹配')
+    return values
+
+
+def _keyset_filter(ordering: Sequence[str], values: Sequence[Any]) -> Q:
+    condition = Q()
+    equal = Q()
+    for key, value in zip(ordering, values):
+        field = key.lstrip('-')
+        lookup = 'lt' if key.startswith('-') else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def paginate_by_cursor(queryset: QuerySet, ordering: Sequence[str], cursor: Optional[str], page_size: int) -> CursorPage:
+    """按 ordering 做 keyset 分页；ordering 最后一项须为 'id' 或 '-id' 以保证唯一。"""
+    if cursor:
+        values = decode_cursor(cursor, len(ordering))
+        try:
+            queryset = queryset.filter(_keyset_filter(ordering, values))
+        except (ValidationError, ValueError, TypeError):
+            raise CursorError('cursor 与排序方式不匹配')
+    rows = list(queryset.order_by(*ordering)[:page_size + 1])
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_cursor = encode_cursor([getattr(last, key.lstrip('-')) for key in ordering])
+    return CursorPage(items=rows, next_cursor=next_cursor)
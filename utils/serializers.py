@@ -0,0 +1,68 @@
+"""
+稀疏字段集（?fields=）
+
+- requested_fields：解析请求 ?fields=a,b,c
+- SparseFieldsMixin：序列化器按构造参数 fields 裁剪输出字段（仅作用于顶层，嵌套序列化器不受影响）
+- sparse_queryset：按同一份字段列表收窄 SQL 列（QuerySet.only），减少查询与传输开销
+
+约定：
+- 未传 fields 时行为与原序列化器完全一致；视图显式传入 fields=requested_fields(request)
+- 写操作不要传 fields，以免裁掉需要校验的字段
+- 序列化器若在 to_representation 中追加了额外键，需在末尾调用 self.project(data)
+- 输出字段依赖的模型列（如 image_url 依赖 thumbnail）在 SPARSE_DEPENDS 中声明
+"""
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from django.db.models import QuerySet
+
+
+def requested_fields(request) -> Optional[List[str]]:
+    """解析请求中的 ?fields=a,b,c；未传或为空时返回 None。"""
+    if request is None:
+        return None
+    raw = getattr(request, 'query_params', request.GET).get('fields')
+    if not raw:
+        return None
+    fields = [f.strip() for f in raw.split(',') if f.strip()]
+    return fields or None
+
+
+class SparseFieldsMixin:
+    """按 fields 裁剪序列化输出。需放在 ModelSerializer / Serializer 之前。"""
+
+    # 输出字段 -> 所依赖的模型列（用于 sparse_queryset）
+    SPARSE_DEPENDS: Dict[str, Sequence[str]] = {}
+
+    def __init__(self, *args, fields: Optional[Iterable[str]] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.sparse_fields = set(fields) if fields else None
+        if self.sparse_fields is not None:
+            for name in set(self.fields) - self.sparse_fields:
+                self.fields.pop(name)
+
+    def project(self, data):
+        if self.sparse_fields is None:
+            return data
+        for key in [k for k in data if k not in self.sparse_fields]:
+            data.pop(key)
+        return data
+
+    def to_representation(self, instance):
+        return self.project(super().to_representation(instance))
+
+
+def sparse_queryset(queryset: QuerySet, serializer_class, fields: Optional[Iterable[str]]) -> QuerySet:
+    """按请求字段收窄查询列；fields 为空时原样返回。"""
+    if not fields:
+        return queryset
+    concrete = {f.name for f in queryset.model._meta.concrete_fields}
+    depends = getattr(serializer_class, 'SPARSE_DEPENDS', {})
+    columns = {queryset.model._meta.pk.name}
+    # select_related 的关联必须保留，否则 only() 与 select_related 冲突
+    if isinstance(queryset.query.select_related, dict):
+        columns.update(queryset.query.select_related)
+    for name in fields:
+        if name in concrete:
+            columns.add(name)
+        columns.update(depends.get(name, ()))
+    return queryset.only(*columns)